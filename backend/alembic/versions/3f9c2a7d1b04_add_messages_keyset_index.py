@@ -0,0 +1,33 @@
+"""Add (user_id, created_at, id) index for keyset pagination
+
+Revision ID: 3f9c2a7d1b04
+Revises: e75846600fb5
+Create Date: 2026-10-18 09:12:40.118372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a7d1b04'
+down_revision: Union[str, Sequence[str], None] = 'e75846600fb5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_messages_user_created_id',
+        'messages',
+        ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_messages_user_created_id', table_name='messages')
@@ -0,0 +1,40 @@
+"""Add per-user message_stats rollup
+
+Revision ID: 8d41e6b0c2f7
+Revises: 3f9c2a7d1b04
+Create Date: 2026-10-18 10:03:17.502114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41e6b0c2f7'
+down_revision: Union[str, Sequence[str], None] = '3f9c2a7d1b04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rows are built lazily by the API the first time a user's stats are needed
+    op.create_table(
+        'message_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('total_messages', sa.Integer(), nullable=False),
+        sa.Column('text_messages', sa.Integer(), nullable=False),
+        sa.Column('voice_messages', sa.Integer(), nullable=False),
+        sa.Column('focus_area_counts', sa.JSON(), nullable=False),
+        sa.Column('day_counts', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('message_stats')
@@ -0,0 +1,57 @@
+"""Index user_id in the SQLite full-text search table
+
+Revision ID: a1c7e5d3b9f2
+Revises: d7f3a9b2c5e8
+Create Date: 2026-10-18 21:04:37.218406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from search import ensure_search_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c7e5d3b9f2'
+down_revision: Union[str, Sequence[str], None] = 'd7f3a9b2c5e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rebuilds messages_fts with a user_id column when it lacks one;
+    # Postgres is unchanged
+    ensure_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for trigger in ('messages_fts_ai', 'messages_fts_ad', 'messages_fts_au'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS messages_fts')
+    op.execute(
+        "CREATE VIRTUAL TABLE messages_fts USING fts5("
+        "title, content, content='messages', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute(
+        "CREATE TRIGGER messages_fts_ai AFTER INSERT ON messages BEGIN "
+        "INSERT INTO messages_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END"
+    )
+    op.execute(
+        "CREATE TRIGGER messages_fts_ad AFTER DELETE ON messages BEGIN "
+        "INSERT INTO messages_fts(messages_fts, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); END"
+    )
+    op.execute(
+        "CREATE TRIGGER messages_fts_au AFTER UPDATE OF title, content ON messages BEGIN "
+        "INSERT INTO messages_fts(messages_fts, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); "
+        "INSERT INTO messages_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END"
+    )
+    op.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
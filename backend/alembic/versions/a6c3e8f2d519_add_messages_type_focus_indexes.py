@@ -0,0 +1,31 @@
+"""Add (user_id, message_type) and (user_id, focus_area) indexes on messages
+
+Revision ID: a6c3e8f2d519
+Revises: f82d4c6e1a97
+Create Date: 2026-10-18 15:21:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c3e8f2d519'
+down_revision: Union[str, Sequence[str], None] = 'f82d4c6e1a97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # (user_id, created_at DESC, id DESC) already exists: 3f9c2a7d1b04
+    op.create_index('ix_messages_user_type', 'messages', ['user_id', 'message_type'], unique=False)
+    op.create_index('ix_messages_user_focus_area', 'messages', ['user_id', 'focus_area'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_messages_user_focus_area', table_name='messages')
+    op.drop_index('ix_messages_user_type', table_name='messages')
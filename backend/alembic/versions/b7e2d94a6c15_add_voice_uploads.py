@@ -0,0 +1,43 @@
+"""Add voice_uploads for resumable uploads
+
+Revision ID: b7e2d94a6c15
+Revises: 8d41e6b0c2f7
+Create Date: 2026-10-18 11:26:05.843920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d94a6c15'
+down_revision: Union[str, Sequence[str], None] = '8d41e6b0c2f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'voice_uploads',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('upload_length', sa.Integer(), nullable=False),
+        sa.Column('file_extension', sa.String(length=10), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=True),
+        sa.Column('focus_area', sa.String(length=255), nullable=True),
+        sa.Column('message_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_voice_uploads_user_id'), 'voice_uploads', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_voice_uploads_user_id'), table_name='voice_uploads')
+    op.drop_table('voice_uploads')
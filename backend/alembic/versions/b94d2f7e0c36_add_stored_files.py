@@ -0,0 +1,35 @@
+"""Add stored_files reference counts for content-addressed voice storage
+
+Revision ID: b94d2f7e0c36
+Revises: a6c3e8f2d519
+Create Date: 2026-10-18 16:40:12.530671
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b94d2f7e0c36'
+down_revision: Union[str, Sequence[str], None] = 'a6c3e8f2d519'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing messages keep their plain file paths, which are not counted
+    op.create_table(
+        'stored_files',
+        sa.Column('key', sa.String(length=120), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.PrimaryKeyConstraint('key'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('stored_files')
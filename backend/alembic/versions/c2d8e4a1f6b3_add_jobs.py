@@ -0,0 +1,60 @@
+"""Add jobs table for the durable background job queue
+
+Revision ID: c2d8e4a1f6b3
+Revises: b94d2f7e0c36
+Create Date: 2026-10-18 19:05:41.208394
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d8e4a1f6b3'
+down_revision: Union[str, Sequence[str], None] = 'b94d2f7e0c36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    jobs = op.create_table(
+        'jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'FAILED', name='jobstatus'), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_after', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('locked_by', sa.String(length=100), nullable=True),
+        sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_jobs_status_kind_run_after', 'jobs', ['status', 'kind', 'run_after'], unique=False)
+
+    # Voice messages whose background task was lost before the queue existed
+    stuck = op.get_bind().execute(
+        sa.text("SELECT id FROM messages WHERE processing_status = 'PROCESSING'")
+    ).scalars().all()
+    if stuck:
+        now = datetime.now(timezone.utc)
+        op.bulk_insert(jobs, [
+            {
+                'kind': 'process_voice', 'payload': {'message_id': message_id}, 'status': 'QUEUED',
+                'attempts': 0, 'max_attempts': 5, 'run_after': now,
+            }
+            for message_id in stuck
+        ])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_status_kind_run_after', table_name='jobs')
+    op.drop_table('jobs')
+    sa.Enum(name='jobstatus').drop(op.get_bind(), checkfirst=True)
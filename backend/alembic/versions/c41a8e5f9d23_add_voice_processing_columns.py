@@ -0,0 +1,41 @@
+"""Add voice processing status and audio metadata to messages
+
+Revision ID: c41a8e5f9d23
+Revises: b7e2d94a6c15
+Create Date: 2026-10-18 12:40:51.207316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41a8e5f9d23'
+down_revision: Union[str, Sequence[str], None] = 'b7e2d94a6c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    processing_status = sa.Enum('PROCESSING', 'READY', 'FAILED', name='processingstatus')
+    processing_status.create(op.get_bind(), checkfirst=True)
+    op.add_column('messages', sa.Column('processing_status', processing_status, nullable=True))
+    op.add_column('messages', sa.Column('original_file_path', sa.String(length=500), nullable=True))
+    op.add_column('messages', sa.Column('duration_seconds', sa.Float(), nullable=True))
+    op.add_column('messages', sa.Column('bitrate', sa.Integer(), nullable=True))
+    op.add_column('messages', sa.Column('size_bytes', sa.Integer(), nullable=True))
+    # Voice notes uploaded before this stage existed are served as-is
+    op.execute("UPDATE messages SET processing_status = 'READY' WHERE voice_file_path IS NOT NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('messages', 'size_bytes')
+    op.drop_column('messages', 'bitrate')
+    op.drop_column('messages', 'duration_seconds')
+    op.drop_column('messages', 'original_file_path')
+    op.drop_column('messages', 'processing_status')
+    sa.Enum(name='processingstatus').drop(op.get_bind(), checkfirst=True)
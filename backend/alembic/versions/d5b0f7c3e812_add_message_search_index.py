@@ -0,0 +1,38 @@
+"""Add full-text search index over message title and content
+
+Revision ID: d5b0f7c3e812
+Revises: c41a8e5f9d23
+Create Date: 2026-10-18 13:22:09.664051
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from search import ensure_search_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5b0f7c3e812'
+down_revision: Union[str, Sequence[str], None] = 'c41a8e5f9d23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite: FTS5 table + sync triggers; Postgres: generated tsvector + GIN
+    ensure_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for trigger in ('messages_fts_ai', 'messages_fts_ad', 'messages_fts_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS messages_fts')
+    elif bind.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_messages_search_vector')
+        op.execute('ALTER TABLE messages DROP COLUMN IF EXISTS search_vector')
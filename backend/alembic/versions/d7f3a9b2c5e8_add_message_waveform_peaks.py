@@ -0,0 +1,51 @@
+"""Add waveform_peaks to messages and queue waveforms for existing voice messages
+
+Revision ID: d7f3a9b2c5e8
+Revises: c2d8e4a1f6b3
+Create Date: 2026-10-18 20:12:07.664310
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7f3a9b2c5e8'
+down_revision: Union[str, Sequence[str], None] = 'c2d8e4a1f6b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('messages', sa.Column('waveform_peaks', sa.LargeBinary(), nullable=True))
+
+    # Voice messages processed before this get their waveform from a job;
+    # those still PROCESSING get it from their process_voice job
+    ready = op.get_bind().execute(
+        sa.text("SELECT id FROM messages WHERE processing_status = 'READY'")
+    ).scalars().all()
+    if ready:
+        jobs = sa.table(
+            'jobs',
+            sa.column('kind', sa.String), sa.column('payload', sa.JSON), sa.column('status', sa.String),
+            sa.column('attempts', sa.Integer), sa.column('max_attempts', sa.Integer),
+            sa.column('run_after', sa.DateTime(timezone=True)),
+        )
+        now = datetime.now(timezone.utc)
+        op.bulk_insert(jobs, [
+            {
+                'kind': 'voice_waveform', 'payload': {'message_id': message_id}, 'status': 'QUEUED',
+                'attempts': 0, 'max_attempts': 5, 'run_after': now,
+            }
+            for message_id in ready
+        ])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM jobs WHERE kind = 'voice_waveform'")
+    op.drop_column('messages', 'waveform_peaks')
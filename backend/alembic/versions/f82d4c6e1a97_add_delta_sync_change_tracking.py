@@ -0,0 +1,68 @@
+"""Add change_seq, message_sync_state and message_tombstones for delta sync
+
+Revision ID: f82d4c6e1a97
+Revises: e3a9c17b5f40
+Create Date: 2026-10-18 14:48:12.530447
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f82d4c6e1a97'
+down_revision: Union[str, Sequence[str], None] = 'e3a9c17b5f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('messages', sa.Column('change_seq', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_messages_user_change_seq', 'messages', ['user_id', 'change_seq'], unique=False)
+
+    op.create_table(
+        'message_sync_state',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    op.create_table(
+        'message_tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('message_id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_message_tombstones_user_change_seq', 'message_tombstones', ['user_id', 'change_seq'], unique=False)
+
+    # Existing messages get 1..n per user in id order; counters start at n
+    op.execute(
+        """
+        UPDATE messages SET change_seq = (
+            SELECT COUNT(*) FROM messages AS earlier
+            WHERE earlier.user_id = messages.user_id AND earlier.id <= messages.id
+        )
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO message_sync_state (user_id, version)
+        SELECT user_id, MAX(change_seq) FROM messages GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_message_tombstones_user_change_seq', table_name='message_tombstones')
+    op.drop_table('message_tombstones')
+    op.drop_table('message_sync_state')
+    op.drop_index('ix_messages_user_change_seq', table_name='messages')
+    op.drop_column('messages', 'change_seq')
@@ -0,0 +1,193 @@
+# backend/auth_cache.py
+"""
+Caches used by get_current_user so authenticated requests skip the
+JWT decode and the users table lookup on the hot path.
+
+- tokens: raw bearer token -> user id (in-process only, bounded by token expiry)
+- users:  user id -> UserResponse snapshot (in-process, or Redis when
+  AUTH_CACHE_BACKEND=redis so every worker sees the same evictions)
+
+The user cache is async, so a Redis round trip never blocks the event
+loop. Evictions are noted by sync session hooks and sent from a task
+(run_in_background) once the commit has happened.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models import User
+from schemas import UserResponse
+
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))  # seconds, 0 disables caching
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+AUTH_CACHE_BACKEND = os.getenv("AUTH_CACHE_BACKEND", "memory")
+AUTH_CACHE_REDIS_URL = os.getenv("AUTH_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+
+class MemoryCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL."""
+
+    def __init__(self, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class AsyncMemoryCache:
+    """A MemoryCache behind the async interface of the Redis-backed caches."""
+
+    def __init__(self, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self._cache = MemoryCache(max_entries)
+
+    async def get(self, key) -> Optional[Any]:
+        return self._cache.get(key)
+
+    async def set(self, key, value, ttl: float) -> None:
+        self._cache.set(key, value, ttl)
+
+    async def delete(self, key) -> None:
+        self._cache.delete(key)
+
+    async def clear(self) -> None:
+        self._cache.clear()
+
+
+class RedisUserCache:
+    """User snapshot cache shared by all workers through Redis."""
+
+    def __init__(self, url: str = AUTH_CACHE_REDIS_URL, prefix: str = "onepercent:user:"):
+        import redis.asyncio as redis  # optional dependency, only needed for this backend
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, user_id: int) -> Optional[UserResponse]:
+        raw = await self._redis.get(f"{self._prefix}{user_id}")
+        return UserResponse.model_validate_json(raw) if raw else None
+
+    async def set(self, user_id: int, snapshot: UserResponse, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        await self._redis.set(f"{self._prefix}{user_id}", snapshot.model_dump_json(), ex=max(1, int(ttl)))
+
+    async def delete(self, user_id: int) -> None:
+        await self._redis.delete(f"{self._prefix}{user_id}")
+
+    async def clear(self) -> None:
+        async for key in self._redis.scan_iter(f"{self._prefix}*"):
+            await self._redis.delete(key)
+
+
+def _make_user_cache():
+    if AUTH_CACHE_BACKEND == "redis":
+        return RedisUserCache()
+    return AsyncMemoryCache()
+
+
+_pending: Set[asyncio.Task] = set()
+
+
+def run_in_background(coroutine) -> Optional[asyncio.Task]:
+    """
+    Run a cache update from a sync session hook as a task of the running
+    loop. Returns None, without running it, when there is no loop (a sync
+    session in a script); the entry then only expires with its TTL.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        coroutine.close()
+        return None
+    # A fresh context, so the update is not counted towards the request (metrics.py)
+    task = loop.create_task(coroutine, context=contextvars.Context())
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+    return task
+
+
+token_cache = MemoryCache()
+user_cache = _make_user_cache()
+
+
+def get_cached_user_id(token: str) -> Optional[int]:
+    return token_cache.get(token)
+
+
+def cache_token(token: str, user_id: int, expires_at: Optional[float]) -> None:
+    """Remember a decoded token until AUTH_CACHE_TTL or its own expiry, whichever is first."""
+    ttl = AUTH_CACHE_TTL
+    if expires_at is not None:
+        ttl = min(ttl, expires_at - time.time())
+    token_cache.set(token, user_id, ttl)
+
+
+async def get_cached_user(user_id: int) -> Optional[UserResponse]:
+    return await user_cache.get(user_id)
+
+
+async def cache_user(user: User) -> UserResponse:
+    snapshot = UserResponse.model_validate(user)
+    await user_cache.set(user.id, snapshot, AUTH_CACHE_TTL)
+    return snapshot
+
+
+async def invalidate_user(user_id: int) -> None:
+    await user_cache.delete(user_id)
+
+
+# Evict a user's snapshot once a change to is_active (or email) is committed,
+# so deactivations take effect on the next request instead of after the TTL.
+@event.listens_for(User, "after_update")
+def _track_user_change(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.is_active.history.has_changes() or state.attrs.email.history.has_changes():
+        session = state.session
+        if session is not None:
+            session.info.setdefault("auth_cache_evict", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_changed_users(session):
+    for user_id in session.info.pop("auth_cache_evict", ()):
+        run_in_background(invalidate_user(user_id))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_evictions(session):
+    session.info.pop("auth_cache_evict", None)
@@ -0,0 +1,184 @@
+# backend/batch.py
+"""
+Apply a batch of message operations from an offline client in one transaction.
+
+Each operation carries a client-generated idempotency key. Keys that were
+already applied are not applied again; they report their stored outcome
+with replayed=True, so a client can safely resend a whole queue after a
+timeout.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from fastapi import status
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import stats
+from models import IdempotencyKey, Message
+from schemas import (
+    BatchOperationType, MessageBatchOperation, MessageBatchResult,
+    MessageCreate, MessageResponse, MessageUpdate,
+)
+
+
+def _error(operation: MessageBatchOperation, status_code: int, error) -> MessageBatchResult:
+    return MessageBatchResult(
+        idempotency_key=operation.idempotency_key,
+        op=operation.op,
+        status=status_code,
+        id=operation.id,
+        error=error,
+    )
+
+
+async def apply_batch(
+    db: AsyncSession, user_id: int, operations: List[MessageBatchOperation]
+) -> List[MessageBatchResult]:
+    """
+    Apply operations in order and return one result per operation.
+
+    Queries are independent of the batch size: one for known idempotency
+    keys, one for the messages being updated/deleted, one bulk INSERT ...
+    RETURNING for all creates and one to reload the results. Per-operation
+    problems (bad data, unknown id) become error results and do not abort
+    the rest of the batch. The caller commits.
+    """
+    keys = {operation.idempotency_key for operation in operations}
+    seen: Dict[str, IdempotencyKey] = {
+        row.key: row
+        for row in await db.scalars(
+            select(IdempotencyKey).where(
+                IdempotencyKey.user_id == user_id, IdempotencyKey.key.in_(keys)
+            )
+        )
+    }
+
+    target_ids = {operation.id for operation in operations if operation.id is not None}
+    messages: Dict[int, Message] = {}
+    if target_ids:
+        messages = {
+            message.id: message
+            for message in await db.scalars(
+                select(Message).where(Message.user_id == user_id, Message.id.in_(target_ids))
+            )
+        }
+
+    results: List[Optional[MessageBatchResult]] = [None] * len(operations)
+    first_use: Dict[str, int] = {}  # key -> index of its first operation in this batch
+    pending_creates = []  # (result index, insert values)
+    added, removed = [], []
+    deleted_ids = set()
+    # The creates below are flushed before the rollup is adjusted; a rollup
+    # built after that would count them twice
+    await stats.ensure_stats(db, user_id)
+
+    for index, operation in enumerate(operations):
+        key = operation.idempotency_key
+        previous = seen.get(key)
+        if previous is not None:
+            results[index] = MessageBatchResult(
+                idempotency_key=key,
+                op=operation.op,
+                status=previous.status_code,
+                id=previous.message_id,
+                replayed=True,
+            )
+            continue
+        if key in first_use:
+            # Resolved below, once the first operation's outcome is known
+            continue
+        first_use[key] = index
+
+        try:
+            if operation.op == BatchOperationType.CREATE:
+                data = MessageCreate.model_validate(operation.data or {}).model_dump()
+                pending_creates.append((index, {
+                    "user_id": user_id,
+                    "title": data.get("title") or datetime.now(timezone.utc).strftime("%B %d, %Y"),
+                    "content": data["content"],
+                    "message_type": data["message_type"],
+                    "focus_area": data.get("focus_area") or None,
+                }))
+                continue
+
+            message = messages.get(operation.id)
+            if message is None or operation.id in deleted_ids:
+                results[index] = _error(operation, status.HTTP_404_NOT_FOUND, "Message not found")
+                continue
+
+            if operation.op == BatchOperationType.UPDATE:
+                changes = MessageUpdate.model_validate(operation.data or {}).model_dump(exclude_unset=True)
+                removed.append(stats.counted(message))
+                for field, value in changes.items():
+                    setattr(message, field, value)
+                added.append(stats.counted(message))
+                status_code = status.HTTP_200_OK
+            else:
+                removed.append(stats.counted(message))
+                await db.delete(message)
+                deleted_ids.add(message.id)
+                status_code = status.HTTP_204_NO_CONTENT
+            results[index] = MessageBatchResult(
+                idempotency_key=key, op=operation.op, status=status_code, id=message.id,
+            )
+        except ValidationError as e:
+            results[index] = _error(
+                operation, status.HTTP_422_UNPROCESSABLE_ENTITY,
+                e.errors(include_url=False, include_context=False),
+            )
+
+    if pending_creates:
+        # The unit of work sends these as one multi-row INSERT ... RETURNING
+        created = [Message(**values) for _, values in pending_creates]
+        added.extend(stats.counted(message) for message in created)
+        db.add_all(created)
+        await db.flush()
+        for (index, _), message in zip(pending_creates, created):
+            operation = operations[index]
+            results[index] = MessageBatchResult(
+                idempotency_key=operation.idempotency_key,
+                op=operation.op,
+                status=status.HTTP_201_CREATED,
+                id=message.id,
+            )
+
+    for index, operation in enumerate(operations):
+        if results[index] is None:
+            first = results[first_use[operation.idempotency_key]]
+            results[index] = first.model_copy(update={"op": operation.op, "replayed": True})
+
+    await stats.apply_changes(db, user_id, added=added, removed=removed)
+
+    # Remember successful outcomes; failed operations may be retried with the same key
+    db.add_all([
+        IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            operation=operations[index].op.value,
+            status_code=results[index].status,
+            message_id=results[index].id,
+        )
+        for key, index in first_use.items()
+        if results[index].error is None
+    ])
+    await db.flush()
+
+    # Reload created/updated rows in one query for the response (server-side
+    # defaults such as created_at/updated_at are not known until the flush)
+    live_ids = {result.id for result in results if result.id is not None} - deleted_ids
+    if live_ids:
+        fresh = {
+            message.id: message
+            for message in await db.scalars(
+                select(Message)
+                .where(Message.user_id == user_id, Message.id.in_(live_ids))
+                .execution_options(populate_existing=True)
+            )
+        }
+        for result in results:
+            if result.error is None and result.id in fresh:
+                result.message = MessageResponse.model_validate(fresh[result.id])
+    return results
+
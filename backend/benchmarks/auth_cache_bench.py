@@ -0,0 +1,61 @@
+# backend/benchmarks/auth_cache_bench.py
+"""
+Requests per second for GET /api/auth/me with and without the auth cache.
+
+Usage (from backend/, needs httpx for the test client):
+    python benchmarks/auth_cache_bench.py [requests]
+
+Runs against a throwaway SQLite database so it never touches onepercent.db.
+"""
+import os
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="onepercent-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORKDIR}/bench.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(WORKDIR)  # main.setup() creates the upload directories here
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import auth_cache  # noqa: E402
+import main  # noqa: E402
+
+
+def run(client: TestClient, headers: dict, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get("/api/auth/me", headers=headers)
+        assert response.status_code == 200, response.text
+    return requests / (time.perf_counter() - start)
+
+
+def main_bench(requests: int = 2000) -> None:
+    main.setup()
+    # One event loop for all requests (the Redis user cache's connections belong to it)
+    with TestClient(main.app) as client:
+        response = client.post(
+            "/api/auth/register",
+            json={"email": f"bench-{time.time_ns()}@example.com", "password": "benchmark-pass"},
+        )
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        ttl = auth_cache.AUTH_CACHE_TTL
+        auth_cache.AUTH_CACHE_TTL = 0
+        auth_cache.token_cache.clear()
+        client.portal.call(auth_cache.user_cache.clear)
+        run(client, headers, 100)  # warm up
+        uncached = run(client, headers, requests)
+
+        auth_cache.AUTH_CACHE_TTL = ttl or 60
+        run(client, headers, 100)
+        cached = run(client, headers, requests)
+
+    print(f"GET /api/auth/me x {requests}")
+    print(f"  without cache: {uncached:8.0f} req/s")
+    print(f"  with cache:    {cached:8.0f} req/s  ({cached / uncached:.2f}x)")
+
+
+if __name__ == "__main__":
+    main_bench(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,123 @@
+# backend/benchmarks/job_queue_bench.py
+"""
+Throughput of the job queue (jobs.py): enqueueing, and claiming, running
+and finishing jobs at several concurrency levels and worker process counts.
+
+Usage (from backend/):
+    python benchmarks/job_queue_bench.py [--jobs 2000] [--work-ms 5]
+                                         [--concurrency 1 4 16] [--processes 1 2]
+
+The handler sleeps for --work-ms, standing in for waiting on ffmpeg or
+storage. Runs against a throwaway SQLite database so it never touches
+onepercent.db; set DATABASE_URL to measure another database, and
+SQLITE_PROFILE=production for the write queue.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="onepercent-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORKDIR}/bench.db")
+os.environ.setdefault("JOB_POLL_SECONDS", "0.05")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(WORKDIR)  # main.setup() creates the upload directories here
+
+from sqlalchemy import delete, func, select  # noqa: E402
+
+import database  # noqa: E402
+import jobs  # noqa: E402
+import main  # noqa: E402
+from database import AsyncSessionLocal  # noqa: E402
+from models import Job  # noqa: E402
+from write_queue import write_queue  # noqa: E402
+
+WORK_SECONDS = 0.0
+
+
+@jobs.job("bench_noop", concurrency=1000)
+async def bench_noop(n: int) -> None:
+    if WORK_SECONDS:
+        await asyncio.sleep(WORK_SECONDS)
+
+
+async def enqueue(count: int, per_commit: int) -> float:
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        for n in range(count):
+            jobs.enqueue(db, "bench_noop", n=n)
+            if (n + 1) % per_commit == 0:
+                await db.commit()
+        await db.commit()
+    return time.perf_counter() - start
+
+
+async def drain(concurrency: int) -> None:
+    worker = jobs.Worker(concurrency=concurrency, kinds=["bench_noop"])
+    try:
+        await worker.run(drain=True)
+    finally:
+        await worker.close()
+        await write_queue.close()
+        await dispose_engines()
+
+
+async def dispose_engines() -> None:
+    await database.async_engine.dispose()
+    writer_engine = getattr(database, "writer_engine", None)  # SQLITE_PROFILE=production only
+    if writer_engine is not None:
+        await writer_engine.dispose()
+
+
+def drain_in_process(concurrency: int) -> None:
+    asyncio.run(drain(concurrency))
+
+
+async def remaining() -> int:
+    async with AsyncSessionLocal() as db:
+        count = await db.scalar(select(func.count(Job.id)))
+        await db.execute(delete(Job))
+        await db.commit()
+    return count
+
+
+def run(args) -> None:
+    global WORK_SECONDS
+    WORK_SECONDS = args.work_ms / 1000
+    main.setup()
+
+    print(f"Enqueue {args.jobs} jobs")
+    for per_commit in (1, 100):
+        seconds = asyncio.run(enqueue(args.jobs, per_commit))
+        asyncio.run(remaining())
+        print(f"  {per_commit:>4} per commit  {args.jobs / seconds:9.0f} jobs/s")
+
+    print(f"Process {args.jobs} jobs, {args.work_ms:g} ms of work each")
+    print(f"  {'processes':>9}  {'concurrency':>11}  {'jobs/s':>9}")
+    context = multiprocessing.get_context("fork")
+    for processes in args.processes:
+        for concurrency in args.concurrency:
+            asyncio.run(enqueue(args.jobs, 500))
+            asyncio.run(dispose_engines())  # forked workers must not share connections
+            start = time.perf_counter()
+            workers = [context.Process(target=drain_in_process, args=(concurrency,)) for _ in range(processes)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            seconds = time.perf_counter() - start
+            left = asyncio.run(remaining())
+            assert left == 0, f"{left} jobs were not finished"
+            print(f"  {processes:>9}  {concurrency:>11}  {args.jobs / seconds:9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--work-ms", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2])
+    run(parser.parse_args())
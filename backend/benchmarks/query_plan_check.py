@@ -0,0 +1,203 @@
+# backend/benchmarks/query_plan_check.py
+"""
+Query-plan regression check for the message read routes.
+
+Seeds a large dataset, calls the route functions directly, captures every
+SELECT they send and runs EXPLAIN on it. Exits with status 1 if any of them
+reads a whole table (SQLite "SCAN <table>", Postgres "Seq Scan"), so a
+missing or unusable index shows up before it shows up in production.
+
+Usage (from backend/):
+    python benchmarks/query_plan_check.py [--rows 1000000] [--users 1000]
+
+Runs against a throwaway SQLite database unless DATABASE_URL is set (use a
+scratch Postgres database for that: the check inserts the seed rows).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+WORKDIR = tempfile.mkdtemp(prefix="onepercent-plan-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORKDIR}/plan.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(WORKDIR)  # main.setup() creates the upload directories here
+
+from fastapi import Request, Response  # noqa: E402
+from sqlalchemy import delete, event, insert, text  # noqa: E402
+
+import main  # noqa: E402
+from database import AsyncSessionLocal, async_engine, engine  # noqa: E402
+from models import Message, MessageStats, MessageSyncState, MessageTombstone, User  # noqa: E402
+from schemas import UserResponse  # noqa: E402
+
+TABLES = {
+    "messages", "users", "message_stats", "message_tombstones",
+    "message_sync_state", "idempotency_keys", "voice_uploads",
+}
+FOCUS_AREAS = ["health", "work", "family", "learning", "money", "mind", None]
+WORDS = "walk gym read sleep meditation journal call budget plan focus run cook".split()
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+def seed(rows: int, users: int, batch: int = 50_000) -> None:
+    """Insert users and rows messages spread evenly over them."""
+    now = datetime.now(timezone.utc)
+    rng = random.Random(1)
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"id": user_id, "email": f"user{user_id}@example.com", "hashed_password": "x"}
+            for user_id in range(1, users + 1)
+        ])
+        sequence = {}
+        for start in range(0, rows, batch):
+            values = []
+            for n in range(start, min(start + batch, rows)):
+                user_id = n % users + 1
+                sequence[user_id] = sequence.get(user_id, 0) + 1
+                values.append({
+                    "user_id": user_id,
+                    "title": " ".join(rng.sample(WORDS, 2)),
+                    "content": " ".join(rng.sample(WORDS, 6)),
+                    "message_type": "VOICE" if n % 5 == 0 else "TEXT",
+                    "focus_area": rng.choice(FOCUS_AREAS),
+                    "created_at": now - timedelta(minutes=rows - n),
+                    "change_seq": sequence[user_id],
+                })
+            connection.execute(insert(Message.__table__), values)
+        connection.execute(insert(MessageSyncState), [
+            {"user_id": user_id, "version": version} for user_id, version in sequence.items()
+        ])
+        connection.execute(insert(MessageTombstone), [
+            {"user_id": user_id, "message_id": rows + user_id, "change_seq": version}
+            for user_id, version in sequence.items()
+        ])
+        connection.execute(text("ANALYZE"))
+
+
+def http(query: str = "") -> dict:
+    """The request/response arguments FastAPI would pass (no If-None-Match, so no 304)."""
+    request = Request({
+        "type": "http", "method": "GET", "scheme": "http", "server": ("plan-check", 80),
+        "path": "/api/messages", "root_path": "", "query_string": query.encode(), "headers": [],
+    })
+    return {"request": request, "response": Response()}
+
+
+async def route_calls(user: UserResponse, message_id: int):
+    """(name, coroutine factory) for every read route, called like FastAPI would."""
+    async def first_page(db):
+        return await main.list_messages(**http("limit=50"), limit=50, cursor=None, db=db, current_user=user)
+
+    async def next_page(db):
+        page = await first_page(db)
+        return await main.list_messages(
+            **http("cursor"), limit=50, cursor=page["next_cursor"], db=db, current_user=user
+        )
+
+    async def stats_rebuild(db):
+        await db.execute(delete(MessageStats).where(MessageStats.user_id == user.id))
+        return await main.get_message_stats(**http(), read_db=db, db=db, current_user=user)
+
+    return [
+        ("GET /api/messages (legacy list)",
+         lambda db: main.list_messages(**http(), limit=None, cursor=None, db=db, current_user=user)),
+        ("GET /api/messages?limit", first_page),
+        ("GET /api/messages?cursor", next_page),
+        ("GET /api/messages/stats (rebuild)", stats_rebuild),
+        ("GET /api/messages/search",
+         lambda db: main.search_user_messages(
+             q="medit", focus_area="health", date_from=None, date_to=None,
+             limit=20, cursor=None, db=db, current_user=user)),
+        ("GET /api/messages/changes",
+         lambda db: main.get_message_changes(since="10", limit=500, db=db, current_user=user)),
+        ("GET /api/messages/{id}",
+         lambda db: main.get_message(message_id=message_id, **http(), db=db, current_user=user)),
+    ]
+
+
+def full_scans(dialect: str, plan) -> list:
+    if dialect == "sqlite":
+        # Rows are (id, parent, notused, detail); FTS5 lookups show as VIRTUAL TABLE
+        return [
+            row[3] for row in plan
+            if (match := _SQLITE_SCAN.match(row[3])) and match.group(1) in TABLES
+            and "VIRTUAL TABLE" not in row[3]
+        ]
+    scans = []
+
+    def walk(node):
+        if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in TABLES:
+            scans.append(f"Seq Scan on {node['Relation Name']}")
+        for child in node.get("Plans", []):
+            walk(child)
+
+    document = plan[0][0]
+    walk((json.loads(document) if isinstance(document, str) else document)[0]["Plan"])
+    return scans
+
+
+async def check(user_id: int) -> int:
+    dialect = async_engine.dialect.name
+    explain = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN (FORMAT JSON) "
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    async with AsyncSessionLocal() as db:
+        user = UserResponse.model_validate(await db.get(User, user_id))
+        first = await main.list_messages(**http("limit=1"), limit=1, cursor=None, db=db, current_user=user)
+        message_id = first["items"][0].id
+
+    failures = 0
+    for name, call in await route_calls(user, message_id):
+        captured.clear()
+        async with AsyncSessionLocal() as db:
+            event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+            started = time.perf_counter()
+            try:
+                await call(db)
+            finally:
+                event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+            elapsed = (time.perf_counter() - started) * 1000
+            await db.rollback()
+
+            print(f"{name}  ({elapsed:.1f} ms, {len(captured)} queries)")
+            connection = await db.connection()
+            for statement, parameters in captured:
+                plan = (await connection.exec_driver_sql(explain + statement, parameters)).all()
+                scans = full_scans(dialect, plan)
+                status = "FULL SCAN" if scans else "ok"
+                print(f"  [{status}] {' '.join(statement.split())[:110]}")
+                for scan in scans:
+                    print(f"      {scan}")
+                failures += bool(scans)
+    return failures
+
+
+def main_check() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+    main.setup()
+
+    started = time.perf_counter()
+    seed(args.rows, args.users)
+    print(f"Seeded {args.rows} messages for {args.users} users in {time.perf_counter() - started:.0f}s\n")
+
+    failures = asyncio.run(check(user_id=1))
+    print(f"\n{failures} quer{'y' if failures == 1 else 'ies'} with full table scans")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main_check()
@@ -0,0 +1,83 @@
+# backend/benchmarks/serialization_bench.py
+"""
+GET /api/messages with the default serialization path vs FAST_JSON_RESPONSES.
+
+Usage (from backend/, needs httpx for the test client):
+    python benchmarks/serialization_bench.py [sizes...]   # default: 100 10000 100000
+
+For each size a user with that many messages is seeded, the full list is
+fetched through both paths, and the responses are checked to be identical.
+Runs against a throwaway SQLite database so it never touches onepercent.db.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+WORKDIR = tempfile.mkdtemp(prefix="onepercent-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORKDIR}/bench.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(WORKDIR)  # main.setup() creates the upload directories here
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+import main  # noqa: E402
+import serialization  # noqa: E402
+from database import engine  # noqa: E402
+from models import Message  # noqa: E402
+
+
+def seed(client: TestClient, size: int) -> dict:
+    response = client.post(
+        "/api/auth/register",
+        json={"email": f"bench-{size}-{time.time_ns()}@example.com", "password": "benchmark-pass"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    now = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        connection.execute(insert(Message.__table__), [
+            {
+                "user_id": user_id,
+                "title": f"Entry {n}",
+                "content": "Walked to work and read two chapters before lunch.",
+                "message_type": "TEXT",
+                "focus_area": "health" if n % 2 else None,
+                "created_at": now - timedelta(minutes=n),
+            }
+            for n in range(size)
+        ])
+    return headers
+
+
+def timed(client: TestClient, headers: dict, fast: bool, repeat: int):
+    main.FAST_JSON_RESPONSES = fast
+    best, body = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get("/api/messages", headers=headers)
+        best = min(best, time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+        body = response.content
+    return best, body
+
+
+def main_bench(sizes) -> None:
+    main.setup()
+    client = TestClient(main.app)
+    encoder = "orjson" if serialization.orjson is not None else "pydantic-core"
+    print(f"GET /api/messages (full list), best of runs, fast path encoder: {encoder}")
+    print(f"{'rows':>8}  {'default':>10}  {'fast':>10}  speedup")
+    for size in sizes:
+        headers = seed(client, size)
+        repeat = 20 if size <= 1000 else 5 if size <= 10000 else 3
+        default, default_body = timed(client, headers, False, repeat)
+        fast, fast_body = timed(client, headers, True, repeat)
+        assert default_body == fast_body, "fast path returned a different body"
+        print(f"{size:>8}  {default * 1000:8.1f}ms  {fast * 1000:8.1f}ms  {default / fast:6.2f}x")
+
+
+if __name__ == "__main__":
+    main_bench([int(size) for size in sys.argv[1:]] or [100, 10_000, 100_000])
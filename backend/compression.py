@@ -0,0 +1,196 @@
+# backend/compression.py
+"""
+Negotiated response compression: brotli when the client accepts it and the
+brotli package is installed, gzip otherwise.
+
+Written against the plain ASGI send interface, so it does not depend on
+the Starlette version. Sent as they are:
+- bodies under COMPRESSION_MINIMUM_SIZE
+- partial (206) responses
+- responses that already have a Content-Encoding
+- EXCLUDED_CONTENT_TYPES: already-compressed media (audio, video, images,
+  zip/gzip archives) and event streams, whose events must not wait in a
+  compressor's buffer
+Streamed bodies (the export) are compressed chunk by chunk.
+"""
+import os
+import zlib
+from typing import Dict, Optional
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli  # optional dependency, gzip only without it
+except ImportError:
+    brotli = None
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))  # 4-6 suits per-request compression
+
+# Chunks this large are compressed in a worker thread instead of on the event loop
+THREAD_MINIMUM_SIZE = 128 * 1024
+
+# "type/*" matches a whole top-level type
+EXCLUDED_CONTENT_TYPES = (
+    "audio/*",
+    "video/*",
+    "image/*",
+    "font/woff",
+    "font/woff2",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "text/event-stream",
+)
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Parse Accept-Encoding into {coding: q}."""
+    encodings = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[coding.strip().lower()] = q
+    return encodings
+
+
+def is_excluded(content_type: str, excluded=EXCLUDED_CONTENT_TYPES) -> bool:
+    media_type = content_type.partition(";")[0].strip().lower()
+    return media_type in excluded or media_type.partition("/")[0] + "/*" in excluded
+
+
+class GzipCompressor:
+    encoding = "gzip"
+
+    def __init__(self, level: int = GZIP_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        # A sync flush per chunk, so each streamed chunk reaches the client
+        flush = zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH
+        return self._compressor.compress(body) + self._compressor.flush(flush)
+
+
+class BrotliCompressor:
+    encoding = "br"
+
+    def __init__(self, quality: int = BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        if more_body:
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+
+class CompressionResponder:
+    """
+    One response: holds back the start message until the first body says
+    how to send it. Without a compressor (identity) it only adds Vary.
+    """
+
+    def __init__(self, app, compressor, minimum_size: int, excluded_content_types):
+        self.app = app
+        self.compressor = compressor
+        self.minimum_size = minimum_size
+        self.excluded_content_types = excluded_content_types
+        self.send = None
+        self.start_message: Optional[dict] = None
+        self.passthrough = False  # decided on the start message
+        self.compressing = False  # decided on the first body
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message: dict) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                message["status"] == 206
+                or "content-encoding" in headers
+                or is_excluded(headers.get("content-type", ""), self.excluded_content_types)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start_message = message
+            return
+        if message_type != "http.response.body" or self.passthrough:
+            if self.start_message is not None:  # e.g. pathsend: never compressed
+                await self.send(self.start_message)
+                self.start_message = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            # First body: compress unless the whole response is small
+            start, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            if more_body or len(body) >= self.minimum_size:
+                # Another Accept-Encoding would have got another encoding
+                headers.add_vary_header("Accept-Encoding")
+                self.compressing = self.compressor is not None
+            if self.compressing:
+                body = await self._compress(body, more_body)
+                headers["Content-Encoding"] = self.compressor.encoding
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+            await self.send(start)
+        elif self.compressing:
+            body = await self._compress(body, more_body)
+        message["body"] = body
+        await self.send(message)
+
+    async def _compress(self, body: bytes, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(self.compressor.compress, body, more_body)
+        return self.compressor.compress(body, more_body)
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        compresslevel: int = GZIP_LEVEL,
+        brotli_quality: int = BROTLI_QUALITY,
+        exclude_content_types=EXCLUDED_CONTENT_TYPES,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.brotli_quality = brotli_quality
+        self.exclude_content_types = tuple(exclude_content_types)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        br, gzip = encodings.get("br", 0), encodings.get("gzip", 0)
+        # Highest q wins; brotli on a tie since it compresses JSON better
+        compressor = None
+        if brotli is not None and br > 0 and br >= gzip:
+            compressor = BrotliCompressor(self.brotli_quality)
+        elif gzip > 0:
+            compressor = GzipCompressor(self.compresslevel)
+        responder = CompressionResponder(self.app, compressor, self.minimum_size, self.exclude_content_types)
+        await responder(scope, receive, send)
+
@@ -1,24 +1,156 @@
 # backend/database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from contextlib import contextmanager
+from typing import Optional
 import os
 
 # For dev: SQLite file inside backend folder
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./onepercent.db")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
+# Connection pool tuning (ignored for in-memory SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds, -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# SQLite production profile (SQLITE_PROFILE=production, set by server.py):
+# WAL so readers never wait for the writer, fsync at checkpoints instead of
+# on every commit, and writes from the message routes serialized through
+# write_queue.py. Ignored for other databases and in-memory SQLite.
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "default")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))  # wait this long for a lock before "database is locked"
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes of the file read through mmap
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # pages, or KiB when negative (64 MiB per connection)
+
+
+def to_async_url(url: str) -> str:
+    """
+    Map a sync DATABASE_URL onto its asyncio driver.
+
+    sqlite:///x.db        -> sqlite+aiosqlite:///x.db
+    postgresql://...      -> postgresql+asyncpg://...
+    """
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+
+def is_file_sqlite(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and not url.rstrip("/").endswith("sqlite:")
+
+
+def sqlite_production(url: str) -> bool:
+    return SQLITE_PROFILE == "production" and is_file_sqlite(url)
+
+
+def _use_sqlite_profile(engine, begin: Optional[str] = None) -> None:
+    """
+    Set the production pragmas on every new connection.
+
+    With begin, SQLAlchemy rather than the sqlite3 module starts transactions
+    and starts them with that statement: SAVEPOINT then works, and BEGIN
+    IMMEDIATE takes the write lock up front. Other connections keep the
+    module's lazy BEGIN before the first write, so their reads never hold a
+    snapshot that a later write would have to upgrade.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        if begin:
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.close()
+
+    if begin:
+        @event.listens_for(sync_engine, "begin")
+        def _begin(connection):
+            connection.exec_driver_sql(begin)
+
+
+def _engine_options(url: str) -> dict:
+    options = {}
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+        if sqlite_production(url):
+            options["connect_args"]["timeout"] = SQLITE_BUSY_TIMEOUT_MS / 1000
+        if not is_file_sqlite(url):
+            return options
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    return options
+
+
+# Sync engine: migrations, create_all and maintenance scripts
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine: used by the API routes so DB waits never block the event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL))
+
+# expire_on_commit=False: attributes stay readable after commit without
+# an implicit (and, under asyncio, illegal) lazy reload
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# The write queue's own connection (see write_queue.py): one connection that
+# takes the write lock when its transaction starts, so a group of writes never
+# has to upgrade a read lock halfway through and fail with "database is locked"
+WriterSessionLocal = None
+if sqlite_production(DATABASE_URL):
+    _use_sqlite_profile(engine)
+if sqlite_production(ASYNC_DATABASE_URL):
+    _use_sqlite_profile(async_engine)
+    writer_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        **{**_engine_options(ASYNC_DATABASE_URL), "pool_size": 1, "max_overflow": 0},
+    )
+    _use_sqlite_profile(writer_engine, begin="BEGIN IMMEDIATE")
+    WriterSessionLocal = async_sessionmaker(writer_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Read replicas for the read-only routes, comma separated (see replicas.py).
+# Empty: everything reads from the primary.
+DATABASE_READ_URLS = [url.strip() for url in os.getenv("DATABASE_READ_URLS", "").split(",") if url.strip()]
+
+def _read_engine(url: str):
+    url = to_async_url(url)
+    read_engine = create_async_engine(url, **_engine_options(url))
+    if sqlite_production(url):
+        _use_sqlite_profile(read_engine)
+    return read_engine
+
+
+read_engines = [_read_engine(url) for url in DATABASE_READ_URLS]
+
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,310 @@
+# backend/events.py
+"""
+Live updates: message changes and stats deltas pushed to a user's open
+connections (WebSocket /api/messages/ws or SSE /api/messages/events), so
+the app no longer re-polls the list and the stats after every save, and
+other devices see new entries as they are written.
+
+1. A Session after_flush hook notes which of a user's messages were
+   created, updated or deleted. It runs on every write path: routes, batch,
+   the write queue and background transcoding. after_commit publishes one
+   small notice per user, holding only ids and the sync version. A rollback
+   drops the notices.
+2. The broker carries notices to every worker: in-process by default
+   (EVENTS_BROKER=memory), or over a Redis channel (EVENTS_BROKER=redis)
+   when the app runs with several workers.
+3. A worker that holds connections for the user loads the changed messages
+   and the stats rollup once, and queues the events on each connection.
+   Workers without any connection for the user do no work.
+
+Events (JSON):
+    {"type": "hello", "version": "12", "stats": {...}}            on connect
+    {"type": "message.created" | "message.updated", "version": "13", "message": {...}}
+    {"type": "message.deleted", "version": "14", "id": 5}
+    {"type": "stats", "changes": {"total_messages": 8, ...}}       changed fields only
+    {"type": "resync"}   the connection fell too far behind and is closed;
+                         reload and reconnect
+"version" is a GET /api/messages/changes token, so a client that was
+offline catches up with delta sync from the last version it saw.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import weakref
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from database import AsyncSessionLocal
+from models import Message, MessageStats, MessageTombstone
+import stats
+from serialization import MESSAGE_COLUMNS, dumps, message_rows
+from sync import current_version, encode_token
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "memory")
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", "redis://localhost:6379/0")
+EVENTS_REDIS_CHANNEL = os.getenv("EVENTS_REDIS_CHANNEL", "onepercent:message-events")
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))  # per connection
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "25"))  # below proxies' idle timeouts
+
+
+def _spawn(coroutine) -> asyncio.Task:
+    # A fresh context, so the work is not counted towards whichever request
+    # triggered it (metrics.py)
+    return asyncio.get_running_loop().create_task(coroutine, context=contextvars.Context())
+
+
+class Subscription:
+    """One open connection's queue of events."""
+
+    def __init__(self, user_id: int, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.user_id = user_id
+        self.stats: Optional[dict] = None  # last stats sent, for deltas
+        self._queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.closed = False
+
+    def send(self, event: dict) -> None:
+        if self.closed:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled client: drop what is queued and ask it to reload
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait({"type": "resync"})
+            self.closed = True
+
+    def send_stats(self, payload: Optional[dict]) -> None:
+        if payload is None:
+            return
+        previous, self.stats = self.stats, payload
+        if previous is None:
+            self.send({"type": "stats", "changes": payload})
+            return
+        changes = {key: value for key, value in payload.items() if previous.get(key) != value}
+        if changes:
+            self.send({"type": "stats", "changes": changes})
+
+    async def events(self, heartbeat: float = EVENTS_HEARTBEAT_SECONDS) -> AsyncIterator[Optional[dict]]:
+        """Queued events as they come; None after heartbeat idle seconds. Ends after a resync."""
+        while True:
+            try:
+                event = await asyncio.wait_for(self._queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            yield event
+            if event["type"] == "resync":
+                return
+
+
+class Hub:
+    """This worker's connections, by user."""
+
+    def __init__(self):
+        self._subscriptions: Dict[int, Set[Subscription]] = defaultdict(set)
+        # One delivery at a time per user keeps that user's events in order
+        self._locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def has_subscribers(self, user_id: int) -> bool:
+        return user_id in self._subscriptions
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[Subscription]:
+        subscription = Subscription(user_id)
+        self._subscriptions[user_id].add(subscription)
+        try:
+            await broker.start()
+            async with AsyncSessionLocal() as db:
+                version = await current_version(db, user_id)
+                rollup = await db.get(MessageStats, user_id)
+            payload = stats.stats_payload(rollup) if rollup is not None else None
+            subscription.stats = payload
+            subscription.send({"type": "hello", "version": encode_token(version), "stats": payload})
+            yield subscription
+        finally:
+            subscribers = self._subscriptions.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[user_id]
+
+    def dispatch(self, notice: dict) -> None:
+        """Called by the broker for every notice, from any worker."""
+        if self.has_subscribers(notice["user_id"]):
+            _spawn(self._deliver(notice))
+
+    async def _deliver(self, notice: dict) -> None:
+        user_id = notice["user_id"]
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        async with lock:
+            if not self.has_subscribers(user_id):
+                return
+            try:
+                events, payload = await _load_events(notice)
+            except Exception:
+                logger.exception("Loading live events for user %s failed", user_id)
+                events, payload = [{"type": "resync"}], None
+            for subscription in list(self._subscriptions.get(user_id, ())):
+                for event in events:
+                    subscription.send(event)
+                subscription.send_stats(payload)
+
+
+async def _load_events(notice: dict):
+    """The events for a notice, and the user's stats now."""
+    user_id = notice["user_id"]
+    version = encode_token(notice["version"])
+    changed = [*notice["created"], *notice["updated"]]
+    async with AsyncSessionLocal() as db:
+        messages = {}
+        if changed:
+            rows = message_rows((await db.execute(
+                select(*MESSAGE_COLUMNS).where(Message.user_id == user_id, Message.id.in_(changed))
+            )).all())
+            messages = {row["id"]: row for row in rows}
+        rollup = await db.get(MessageStats, user_id)
+    events = []
+    for kind in ("created", "updated"):
+        for message_id in notice[kind]:
+            # Gone already: its delete notice follows
+            if message_id in messages:
+                events.append({"type": f"message.{kind}", "version": version, "message": messages[message_id]})
+    for message_id in notice["deleted"]:
+        events.append({"type": "message.deleted", "version": version, "id": message_id})
+    return events, stats.stats_payload(rollup) if rollup is not None else None
+
+
+def sse_message(event: Optional[dict]) -> bytes:
+    """An event in text/event-stream framing; None is a heartbeat comment."""
+    if event is None:
+        return b": ping\n\n"
+    return b"event: " + event["type"].encode() + b"\ndata: " + dumps(event) + b"\n\n"
+
+
+class MemoryBroker:
+    """Single worker: notices go straight to this worker's hub."""
+
+    def publish(self, notice: dict) -> None:
+        hub.dispatch(notice)
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBroker:
+    """Several workers: notices go through a Redis pub/sub channel to all of them."""
+
+    def __init__(self, url: str = EVENTS_REDIS_URL, channel: str = EVENTS_REDIS_CHANNEL):
+        import redis.asyncio as redis  # optional dependency, only needed for this broker
+
+        self._redis = redis.Redis.from_url(url)
+        self.channel = channel
+        self._listener: Optional[asyncio.Task] = None
+        self._pending: Set[asyncio.Task] = set()
+
+    def publish(self, notice: dict) -> None:
+        task = _spawn(self._redis.publish(self.channel, json.dumps(notice)))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def start(self) -> None:
+        # Listen from the first connection on; a worker without any has nothing to deliver
+        if self._listener is None or self._listener.done():
+            self._listener = _spawn(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            hub.dispatch(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Live events channel failed, reconnecting")
+                await asyncio.sleep(1)
+
+
+def _make_broker():
+    if EVENTS_BROKER == "redis":
+        return RedisBroker()
+    return MemoryBroker()
+
+
+hub = Hub()
+broker = _make_broker()
+subscribe = hub.subscribe
+
+
+def _notices(changes: Iterable[tuple]) -> List[dict]:
+    by_user: Dict[int, dict] = {}
+    for user_id, kind, message_id, change_seq in sorted(changes, key=lambda change: change[3] or 0):
+        notice = by_user.setdefault(
+            user_id, {"user_id": user_id, "version": 0, "created": [], "updated": [], "deleted": []}
+        )
+        notice["version"] = max(notice["version"], change_seq or 0)
+        if message_id not in notice[kind]:
+            notice[kind].append(message_id)
+    for notice in by_user.values():
+        # Created and changed again before the commit is still just "created"
+        notice["updated"] = [message_id for message_id in notice["updated"] if message_id not in notice["created"]]
+        notice["created"] = [message_id for message_id in notice["created"] if message_id not in notice["deleted"]]
+        notice["updated"] = [message_id for message_id in notice["updated"] if message_id not in notice["deleted"]]
+    return list(by_user.values())
+
+
+# Same shape as auth_cache's eviction hooks: note what a flush changed,
+# publish once the transaction has committed, forget it on rollback.
+# A set of flat tuples, so the write queue can snapshot it per write.
+@event.listens_for(Session, "after_flush")
+def _note_message_changes(session, flush_context):
+    changes = session.info.setdefault("message_events", set())
+    for obj in session.new:
+        if isinstance(obj, Message):
+            changes.add((obj.user_id, "created", obj.id, obj.change_seq))
+    for obj in session.dirty:
+        if isinstance(obj, Message) and session.is_modified(obj, include_collections=False):
+            changes.add((obj.user_id, "updated", obj.id, obj.change_seq))
+    # sync.py stamps deletes on the tombstone it adds, not on the message
+    tombstones = {obj.message_id: obj.change_seq for obj in session.new if isinstance(obj, MessageTombstone)}
+    for obj in session.deleted:
+        if isinstance(obj, Message):
+            changes.add((obj.user_id, "deleted", obj.id, tombstones.get(obj.id)))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_message_changes(session):
+    changes = session.info.pop("message_events", None)
+    if not changes:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return  # a sync session (scripts, migrations): no connections in this process
+    for notice in _notices(changes):
+        broker.publish(notice)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_message_changes(session):
+    session.info.pop("message_events", None)
@@ -0,0 +1,164 @@
+# backend/export.py
+"""
+Streaming export of a user's journal (GET /api/messages/export).
+
+Rows come from a server-side cursor in fixed-size batches (yield_per) and
+are encoded and sent batch by batch, so memory stays flat however long the
+journal is. Rows are newest first, like GET /api/messages, and every row
+carries the pagination cursor pointing at it: to resume an interrupted
+export, pass the cursor of the last complete row and the export continues
+with the row after it.
+
+Formats:
+- ndjson: one JSON message per line
+- csv: header row, then one message per row
+- zip: messages.ndjson plus voice/<id>.<ext> with each voice note's
+  original recording, written as a streamed (data-descriptor) zip
+"""
+import csv
+import io
+import time
+import zipfile
+from datetime import datetime
+from enum import Enum
+from pathlib import PurePath
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import select
+
+from database import AsyncSessionLocal
+from models import Message
+from pagination import encode_cursor
+from serialization import MESSAGE_COLUMNS, MESSAGE_FIELDS, dumps, message_rows
+from storage import resolve
+
+EXPORT_BATCH_SIZE = 500
+
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "zip": "application/zip",
+}
+
+
+def _export_query(user_id: int, keyset):
+    query = select(*MESSAGE_COLUMNS).where(Message.user_id == user_id)
+    if keyset is not None:
+        query = query.where(keyset)
+    return query.order_by(Message.created_at.desc(), Message.id.desc())
+
+
+async def _message_batches(user_id: int, keyset) -> AsyncIterator[list]:
+    """Validated message dicts, EXPORT_BATCH_SIZE at a time, each with its cursor."""
+    # A session of its own: the response body is sent after the route returns
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            _export_query(user_id, keyset).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for partition in result.partitions():
+            rows = message_rows(partition)
+            for row in rows:
+                row["cursor"] = encode_cursor(row["created_at"], row["id"])
+            yield rows
+
+
+async def ndjson_stream(user_id: int, keyset=None) -> AsyncIterator[bytes]:
+    async for rows in _message_batches(user_id, keyset):
+        yield b"".join(dumps(row) + b"\n" for row in rows)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def csv_stream(user_id: int, keyset=None) -> AsyncIterator[bytes]:
+    fields = MESSAGE_FIELDS + ("cursor",)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue().encode()
+    async for rows in _message_batches(user_id, keyset):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(row[field]) for field in fields] for row in rows)
+        yield buffer.getvalue().encode()
+
+
+class _ZipSink:
+    """Write-only, unseekable file object; zipfile then streams with data descriptors."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def _voice_source(original_file_path: Optional[str], voice_file_path: Optional[str]):
+    """The original recording if it is still around, else the playback file: (reference, StoredObject)."""
+    for candidate in (original_file_path, voice_file_path):
+        if candidate:
+            backend, key = resolve(candidate)
+            stored = await backend.stat(key)
+            if stored is not None:
+                return candidate, stored
+    return None, None
+
+
+async def zip_stream(user_id: int, keyset=None) -> AsyncIterator[bytes]:
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        # Pass 1: all rows into messages.ndjson (one archive member can be
+        # open at a time, so voice files follow in a second pass)
+        with archive.open("messages.ndjson", "w", force_zip64=True) as member:
+            async for rows in _message_batches(user_id, keyset):
+                member.write(b"".join(dumps(row) + b"\n" for row in rows))
+                yield sink.take()
+
+        # Pass 2: voice notes, stored as-is (audio does not deflate)
+        query = (
+            _export_query(user_id, keyset)
+            .with_only_columns(Message.id, Message.original_file_path, Message.voice_file_path)
+            .where(Message.voice_file_path.is_not(None))
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query)
+            async for message_id, original_file_path, voice_file_path in result:
+                source, stored = await _voice_source(original_file_path, voice_file_path)
+                if source is None:
+                    continue
+                info = zipfile.ZipInfo(
+                    f"voice/{message_id}{PurePath(source).suffix.lower()}",
+                    date_time=time.localtime(stored.mtime)[:6],
+                )
+                info.compress_type = zipfile.ZIP_STORED
+                backend, key = resolve(source)
+                with archive.open(info, "w") as member:
+                    async for chunk in backend.iter_bytes(key):
+                        member.write(chunk)
+                        yield sink.take()
+    # Central directory
+    yield sink.take()
+
+
+STREAMS = {
+    "ndjson": ndjson_stream,
+    "csv": csv_stream,
+    "zip": zip_stream,
+}
@@ -0,0 +1,315 @@
+# backend/file_gc.py
+"""
+Garbage collection of voice files that nothing refers to any more.
+
+Files become garbage in two ways:
+- a message is deleted: its references are released, and once the delete
+  has committed release_files removes the files nobody else uses
+- a request or worker dies between writing a file and committing the row
+  that points at it, leaving a stray file
+
+collect() reconciles storage with the database to catch whatever the first
+path missed and all of the second:
+
+1. each storage tier is listed in key order, in batches, and every batch is
+   looked up in stored_files; files with a zero count, or with no row and no
+   message pointing at them, are deleted
+2. plain-path files from before content addressing are compared against
+   the paths in the messages table, read in id order in batches
+3. leftovers in the partial upload directory (unfinished multipart writes,
+   transcoding scratch files, resumable uploads whose record is gone)
+
+Only files older than the grace period are touched, so an upload that is
+still between writing its file and committing is left alone. Deletes can be
+rate limited so a large cleanup does not compete with playback for disk or
+bucket I/O, and a dry run only reports what would go.
+
+Usage (from backend/):
+    python file_gc.py [--dry-run] [--grace-hours 24] [--max-deletes-per-second 50]
+
+With FILE_GC_INTERVAL_SECONDS set, the app also runs collect() in the
+background on that interval.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Iterable, List, Optional, Set
+
+import anyio
+from sqlalchemy import func, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from database import AsyncSessionLocal
+from models import Message, StoredFile, VoiceUpload
+from storage import (
+    COLD_STORAGE_DIR, COLD_TIER, HOT_TIER, delete_unreferenced, get_storage,
+    is_storage_key, legacy_files, list_directory,
+)
+from uploads import PARTIAL_UPLOAD_DIR, UPLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+FILE_GC_GRACE_SECONDS = int(os.getenv("FILE_GC_GRACE_SECONDS", str(24 * 3600)))
+FILE_GC_BATCH_SIZE = int(os.getenv("FILE_GC_BATCH_SIZE", "1000"))
+FILE_GC_MAX_DELETES_PER_SECOND = float(os.getenv("FILE_GC_MAX_DELETES_PER_SECOND", "50"))  # 0: no limit
+FILE_GC_INTERVAL_SECONDS = int(os.getenv("FILE_GC_INTERVAL_SECONDS", "0"))  # 0: only run by hand
+
+# Where plain-path uploads were written before content addressing
+LEGACY_DIRS = (UPLOAD_DIR, UPLOAD_DIR / "compact", COLD_STORAGE_DIR)
+
+
+class RateLimiter:
+    """Spaces calls to wait() at least 1/rate seconds apart."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            await anyio.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval
+
+
+async def release_files(references: Iterable[str]) -> None:
+    """
+    Remove files released by a committed delete (storage.released_files).
+    Never raises: whatever is left behind is picked up by collect().
+    """
+    references = sorted(references)
+    try:
+        await delete_unreferenced([reference for reference in references if is_storage_key(reference)])
+        for reference in references:
+            if not is_storage_key(reference):
+                await legacy_files.delete(reference)
+    except Exception:
+        logger.exception("Deleting released voice files failed")
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)  # SQLite hands back naive UTC
+    return value.timestamp()
+
+
+async def _batches(items: AsyncIterator, size: int) -> AsyncIterator[list]:
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _message_references(db, key: str) -> int:
+    return await db.scalar(
+        select(func.count(Message.id)).where(
+            or_(Message.voice_file_path == key, Message.original_file_path == key)
+        )
+    )
+
+
+async def _delete_stray(storage, key: str, report: Counter) -> bool:
+    """Delete a stored file that has no stored_files row, unless it turns out to be in use."""
+    async with AsyncSessionLocal() as db:
+        # Claiming the row first makes a concurrent upload of the same bytes
+        # wait until the file is gone, as in storage.delete_unreferenced
+        row = StoredFile(key=key, ref_count=0)
+        db.add(row)
+        try:
+            await db.flush()
+        except IntegrityError:
+            await db.rollback()
+            return False
+        references = await _message_references(db, key)
+        if references:
+            # Counts out of step with the messages table: repair, keep the file
+            logger.warning("Voice file %s had no reference count, %d messages use it", key, references)
+            row.ref_count = references
+            await db.commit()
+            report["counts_repaired"] += 1
+            return False
+        try:
+            await storage.delete(key)
+        except Exception:
+            await db.rollback()
+            raise
+        await db.delete(row)
+        await db.commit()
+    return True
+
+
+async def _collect_tier(storage, tier: str, cutoff: float, options: dict, report: Counter) -> None:
+    async for batch in _batches(storage.iter_keys(tier), options["batch_size"]):
+        async with AsyncSessionLocal() as db:
+            rows = {
+                key: (ref_count, updated_at)
+                for key, ref_count, updated_at in await db.execute(
+                    select(StoredFile.key, StoredFile.ref_count, StoredFile.updated_at)
+                    .where(StoredFile.key.in_([key for key, _, _ in batch]))
+                )
+            }
+        for key, size, mtime in batch:
+            report["files_scanned"] += 1
+            row = rows.get(key)
+            if row is not None and (row[0] > 0 or _timestamp(row[1]) > cutoff):
+                continue
+            if mtime > cutoff:
+                continue
+            if options["dry_run"]:
+                if row is None:
+                    async with AsyncSessionLocal() as db:
+                        if await _message_references(db, key):
+                            report["counts_repaired"] += 1
+                            continue
+                logger.info("Would delete unreferenced voice file %s (%d bytes)", key, size)
+            else:
+                await options["limiter"].wait()
+                if row is not None:
+                    deleted = bool(await delete_unreferenced([key]))
+                else:
+                    deleted = await _delete_stray(storage, key, report)
+                if not deleted:
+                    continue
+            report["files_deleted"] += 1
+            report["bytes_freed"] += size
+
+
+async def _referenced_legacy_paths(batch_size: int) -> Set[str]:
+    """Plain paths still in the messages table (content-addressed keys excluded)."""
+    paths = set()
+    last_id = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            rows = (await db.execute(
+                select(Message.id, Message.voice_file_path, Message.original_file_path)
+                .where(
+                    Message.id > last_id,
+                    or_(Message.voice_file_path.is_not(None), Message.original_file_path.is_not(None)),
+                )
+                .order_by(Message.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                return paths
+            last_id = rows[-1].id
+            for _, voice_file_path, original_file_path in rows:
+                for path in (voice_file_path, original_file_path):
+                    if path and not is_storage_key(path):
+                        paths.add(path)
+
+
+async def _delete_local(path: Path, size: int, options: dict, report: Counter) -> None:
+    if options["dry_run"]:
+        logger.info("Would delete unreferenced file %s (%d bytes)", path, size)
+    else:
+        await options["limiter"].wait()
+        await anyio.Path(path).unlink(missing_ok=True)
+    report["files_deleted"] += 1
+    report["bytes_freed"] += size
+
+
+async def _collect_legacy(cutoff: float, options: dict, report: Counter) -> None:
+    referenced = None
+    for directory in LEGACY_DIRS:
+        for name, size, mtime, is_dir in await anyio.to_thread.run_sync(list_directory, directory):
+            if is_dir:
+                continue
+            report["files_scanned"] += 1
+            if mtime > cutoff:
+                continue
+            if referenced is None:
+                # Only read once there is a candidate: new installs have no legacy files
+                referenced = await _referenced_legacy_paths(options["batch_size"])
+            path = directory / name
+            if str(path) not in referenced:
+                await _delete_local(path, size, options, report)
+
+
+async def _collect_partial(cutoff: float, options: dict, report: Counter) -> None:
+    listing = [
+        entry for entry in await anyio.to_thread.run_sync(list_directory, PARTIAL_UPLOAD_DIR)
+        if not entry[3] and entry[2] <= cutoff
+    ]
+    report["files_scanned"] += len(listing)
+    for start in range(0, len(listing), options["batch_size"]):
+        batch = listing[start:start + options["batch_size"]]
+        # <upload id>.part belongs to a resumable upload for as long as its record exists
+        upload_ids = [name[:-len(".part")] for name, *_ in batch if name.endswith(".part")]
+        async with AsyncSessionLocal() as db:
+            live = set(await db.scalars(select(VoiceUpload.id).where(VoiceUpload.id.in_(upload_ids))))
+        for name, size, _, _ in batch:
+            if name.endswith(".part") and name[:-len(".part")] in live:
+                continue
+            await _delete_local(PARTIAL_UPLOAD_DIR / name, size, options, report)
+
+
+async def collect(
+    dry_run: bool = False,
+    grace_seconds: int = FILE_GC_GRACE_SECONDS,
+    max_deletes_per_second: float = FILE_GC_MAX_DELETES_PER_SECOND,
+    batch_size: int = FILE_GC_BATCH_SIZE,
+) -> dict:
+    """
+    One reconciliation pass over storage (see module docstring).
+
+    Returns:
+        {"files_scanned", "files_deleted", "bytes_freed", "counts_repaired",
+        "dry_run", "seconds"}; with dry_run the deleted figures are what
+        would have been deleted
+    """
+    started = time.monotonic()
+    cutoff = time.time() - grace_seconds
+    options = {"dry_run": dry_run, "batch_size": batch_size, "limiter": RateLimiter(max_deletes_per_second)}
+    report = Counter(files_scanned=0, files_deleted=0, bytes_freed=0, counts_repaired=0)
+    storage = get_storage()
+    for tier in (HOT_TIER, COLD_TIER):
+        await _collect_tier(storage, tier, cutoff, options, report)
+    await _collect_legacy(cutoff, options, report)
+    await _collect_partial(cutoff, options, report)
+    return {**report, "dry_run": dry_run, "seconds": round(time.monotonic() - started, 3)}
+
+
+async def run_periodically(interval: int = FILE_GC_INTERVAL_SECONDS) -> None:
+    """Background loop started by the app when FILE_GC_INTERVAL_SECONDS is set."""
+    while True:
+        await anyio.sleep(interval)
+        try:
+            logger.info("Voice file GC: %s", await collect())
+        except Exception:
+            logger.exception("Voice file GC run failed")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Delete voice files nothing refers to")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be deleted")
+    parser.add_argument("--grace-hours", type=float, default=FILE_GC_GRACE_SECONDS / 3600)
+    parser.add_argument("--max-deletes-per-second", type=float, default=FILE_GC_MAX_DELETES_PER_SECOND)
+    parser.add_argument("--batch-size", type=int, default=FILE_GC_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    report = asyncio.run(collect(
+        dry_run=args.dry_run,
+        grace_seconds=int(args.grace_hours * 3600),
+        max_deletes_per_second=args.max_deletes_per_second,
+        batch_size=args.batch_size,
+    ))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
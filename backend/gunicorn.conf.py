@@ -0,0 +1,41 @@
+# backend/gunicorn.conf.py
+"""
+gunicorn settings for production (see server.py for the uvicorn-only launcher).
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The app is imported once in the master (preload_app) and workers are forked
+from it, so they share its imported code and start without re-importing.
+One-time setup runs in the master before the fork.
+"""
+import logging
+import os
+
+from server import BACKLOG, HOST, KEEPALIVE_TIMEOUT, LOG_LEVEL, PORT, WEB_CONCURRENCY
+
+bind = f"{HOST}:{PORT}"
+workers = WEB_CONCURRENCY
+worker_class = "uvicorn_worker.UvicornWorker"  # uvicorn-worker package; uses uvloop/httptools when installed
+preload_app = True
+keepalive = KEEPALIVE_TIMEOUT
+backlog = BACKLOG
+loglevel = LOG_LEVEL
+graceful_timeout = 30
+timeout = 60
+
+# The app's own loggers (slow requests, cold start, GC); workers inherit this
+logging.basicConfig(level=LOG_LEVEL.upper(), format="[%(process)d] %(levelname)s %(name)s: %(message)s")
+
+
+def on_starting(server):
+    import main
+
+    main.setup()
+    # Inherited by the workers, whose lifespan then skips setup()
+    os.environ[main.SETUP_DONE_ENV] = "1"
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,36 @@
+# backend/http_cache.py
+"""
+Weak ETags for per-user API responses.
+
+Message responses are tagged with the user's change counter (see sync.py),
+which moves on every write to their messages. Checking If-None-Match costs
+one primary-key read, and a match returns 304 before anything is loaded or
+serialized. The tags are weak because the bytes differ per Content-Encoding.
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Request, status
+from fastapi.responses import Response
+
+from media import etag_matches
+
+# Per-user data: keep it out of shared caches and always revalidate
+API_CACHE_CONTROL = "private, no-cache"
+
+
+def weak_etag(*parts) -> str:
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=12)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": API_CACHE_CONTROL, "Vary": "Authorization"}
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if the client's If-None-Match has this tag, else None."""
+    header = request.headers.get("if-none-match")
+    if header is not None and etag_matches(header, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
+    return None
@@ -0,0 +1,426 @@
+# backend/jobs.py
+"""
+Durable background jobs, queued in the jobs table.
+
+Slow work after a request (transcoding and probing uploads today, and
+later things like transcription) is enqueued in the same transaction as the
+row it is about. The request only pays for the INSERT, and the job survives
+a crash or a deploy in between. Workers claim jobs with an UPDATE ...
+RETURNING (FOR UPDATE SKIP LOCKED on Postgres), so any number of worker
+processes can share the table.
+
+- a handler is an async function registered with @job("kind"); the job's
+  payload is passed as keyword arguments
+- a handler that raises is retried with exponential backoff (and jitter)
+  until max_attempts, then the job is FAILED and on_failure runs
+- each kind has its own concurrency limit on top of the worker's total
+- finished jobs are deleted; failed ones stay for inspection
+- a worker renews the lease (locked_at) of its RUNNING jobs every
+  JOB_LEASE_SECONDS / 4; a job whose lease expires, because its worker
+  died (e.g. ffmpeg took the process down), is requeued, or FAILED if that
+  was its last attempt
+
+By default the app runs a worker in each web process (JOB_WORKER_IN_APP).
+To keep heavy work off the web processes, set it to false and run workers
+on their own (from backend/):
+    python jobs.py [--concurrency 4] [--kind process_voice] [--drain]
+    python jobs.py --status     # jobs per kind and status
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import case, event, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import metrics
+from database import AsyncSessionLocal
+from models import Job, JobStatus
+from write_queue import write_queue
+
+logger = logging.getLogger(__name__)
+
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))  # jobs at once per worker
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))  # 10s, 20s, 40s, ...
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))  # for jobs enqueued by other processes
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))  # renewed while the job runs
+JOB_WORKER_IN_APP = os.getenv("JOB_WORKER_IN_APP", "true").lower() in ("1", "true", "yes")
+
+
+@dataclass
+class JobType:
+    kind: str
+    handler: Callable[..., Awaitable[None]]
+    concurrency: int
+    max_attempts: int
+    on_failure: Optional[Callable[..., Awaitable[None]]] = None
+
+
+job_types: Dict[str, JobType] = {}
+
+
+def job(
+    kind: str,
+    concurrency: int = JOB_CONCURRENCY,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+    on_failure: Optional[Callable[..., Awaitable[None]]] = None,
+):
+    """
+    Register a handler for a kind of job.
+
+    on_failure is called with the same payload once the last attempt has
+    failed (e.g. to mark the message FAILED).
+    """
+    def register(handler):
+        job_types[kind] = JobType(kind, handler, concurrency, max_attempts, on_failure)
+        return handler
+    return register
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue(db: AsyncSession, kind: str, delay: float = 0, **payload) -> Job:
+    """Add a job to the session; it is queued when the caller commits."""
+    job_type = job_types.get(kind)
+    queued = Job(
+        kind=kind,
+        payload=payload,
+        status=JobStatus.QUEUED,
+        attempts=0,
+        max_attempts=job_type.max_attempts if job_type else JOB_MAX_ATTEMPTS,
+        run_after=_now() + timedelta(seconds=delay),
+    )
+    db.add(queued)
+    return queued
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before attempt number attempts + 1: doubling, capped, with jitter."""
+    delay = min(JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), JOB_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def _write(work):
+    async with AsyncSessionLocal() as db:
+        return await write_queue.run(db, work)
+
+
+@dataclass
+class _Claimed:
+    id: int
+    kind: str
+    payload: dict
+    attempts: int
+    max_attempts: int
+
+
+class Worker:
+    """Runs jobs from the queue, at most concurrency at a time."""
+
+    def __init__(
+        self,
+        concurrency: int = JOB_CONCURRENCY,
+        kinds: Optional[Iterable[str]] = None,
+        poll_seconds: float = JOB_POLL_SECONDS,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+    ):
+        self.concurrency = concurrency
+        self.kinds = list(kinds) if kinds else None
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running: Dict[int, asyncio.Task] = {}
+        self._running_kinds: Counter = Counter()
+        self._wake: Optional[asyncio.Event] = None
+        self._loop = None
+        self._stopping = False
+
+    def wake(self) -> None:
+        """Look for jobs now rather than at the next poll (new job, free slot)."""
+        if self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def run(self, drain: bool = False) -> None:
+        """Work until close(); with drain, return once nothing is queued or running."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        _workers.add(self)
+        next_lease_check = 0.0
+        try:
+            while not self._stopping:
+                self._wake.clear()
+                if time.monotonic() >= next_lease_check:
+                    await self._renew_leases()
+                    await requeue_lost_jobs(self.lease_seconds)
+                    next_lease_check = time.monotonic() + self.lease_seconds / 4
+                claimed = await self._claim_free_slots()
+                if drain and not claimed and not self._running:
+                    if not await _queued_count(self._kinds()):
+                        return
+                if not claimed:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            _workers.discard(self)
+
+    async def close(self) -> None:
+        """Stop claiming; interrupted jobs go back to the queue without using up an attempt."""
+        self._stopping = True
+        self.wake()
+        interrupted = list(self._running)
+        for task in self._running.values():
+            task.cancel()
+        await asyncio.gather(*self._running.values(), return_exceptions=True)
+        if interrupted:
+            async def release(db):
+                await db.execute(
+                    update(Job)
+                    .where(Job.id.in_(interrupted), Job.status == JobStatus.RUNNING, Job.locked_by == self.name)
+                    .values(status=JobStatus.QUEUED, attempts=Job.attempts - 1, locked_by=None, locked_at=None)
+                    .execution_options(synchronize_session=False)
+                )
+            await _write(release)
+
+    async def _renew_leases(self) -> None:
+        running = list(self._running)
+        if not running:
+            return
+
+        async def renew(db):
+            await db.execute(
+                update(Job)
+                .where(Job.id.in_(running), Job.status == JobStatus.RUNNING, Job.locked_by == self.name)
+                .values(locked_at=_now())
+                .execution_options(synchronize_session=False)
+            )
+        await _write(renew)
+
+    def _kinds(self) -> List[str]:
+        return [kind for kind in job_types if self.kinds is None or kind in self.kinds]
+
+    async def _claim_free_slots(self) -> int:
+        claimed = 0
+        for kind in self._kinds():
+            free = min(
+                self.concurrency - len(self._running),
+                job_types[kind].concurrency - self._running_kinds[kind],
+            )
+            if free <= 0:
+                continue
+            for row in await self._claim(kind, free):
+                claimed += 1
+                self._start(row)
+        return claimed
+
+    async def _claim(self, kind: str, limit: int) -> List[_Claimed]:
+        async def claim(db):
+            now = _now()
+            candidates = (
+                select(Job.id)
+                .where(Job.status == JobStatus.QUEUED, Job.kind == kind, Job.run_after <= now)
+                .order_by(Job.run_after, Job.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            result = await db.execute(
+                update(Job)
+                .where(Job.id.in_(candidates), Job.status == JobStatus.QUEUED)
+                .values(status=JobStatus.RUNNING, locked_by=self.name, locked_at=now, attempts=Job.attempts + 1)
+                .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+                .execution_options(synchronize_session=False)
+            )
+            return [_Claimed(*row) for row in result.all()]
+        return await _write(claim)
+
+    def _start(self, claimed: _Claimed) -> None:
+        self._running_kinds[claimed.kind] += 1
+        task = asyncio.create_task(self._execute(claimed))
+        self._running[claimed.id] = task
+
+        def done(_):
+            self._running.pop(claimed.id, None)
+            self._running_kinds[claimed.kind] -= 1
+            self.wake()
+        task.add_done_callback(done)
+
+    async def _execute(self, claimed: _Claimed) -> None:
+        job_type = job_types[claimed.kind]
+        started = time.perf_counter()
+        try:
+            await job_type.handler(**claimed.payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics.observe_job(claimed.kind, "error", time.perf_counter() - started)
+            await self._failed(claimed, job_type, e)
+            return
+        metrics.observe_job(claimed.kind, "done", time.perf_counter() - started)
+
+        async def finish(db):
+            await db.execute(
+                Job.__table__.delete().where(Job.id == claimed.id, Job.locked_by == self.name)
+            )
+        await _write(finish)
+
+    async def _failed(self, claimed: _Claimed, job_type: JobType, error: Exception) -> None:
+        final = claimed.attempts >= claimed.max_attempts
+        logger.warning(
+            "Job %s %s failed (attempt %d of %d): %r",
+            claimed.kind, claimed.id, claimed.attempts, claimed.max_attempts, error,
+            exc_info=final,
+        )
+        values = {"locked_by": None, "locked_at": None, "last_error": repr(error)[:2000]}
+        if final:
+            values["status"] = JobStatus.FAILED
+        else:
+            values["status"] = JobStatus.QUEUED
+            values["run_after"] = _now() + timedelta(seconds=retry_delay(claimed.attempts))
+
+        async def record(db):
+            await db.execute(
+                update(Job).where(Job.id == claimed.id, Job.locked_by == self.name).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        await _write(record)
+        if final:
+            await _run_on_failure(claimed.id, claimed.kind, claimed.payload)
+
+
+async def _run_on_failure(job_id: int, kind: str, payload: dict) -> None:
+    job_type = job_types.get(kind)
+    if job_type is None or job_type.on_failure is None:
+        return
+    try:
+        await job_type.on_failure(**payload)
+    except Exception:
+        logger.exception("on_failure of job %s %s failed", kind, job_id)
+
+
+async def requeue_lost_jobs(lease_seconds: float = JOB_LEASE_SECONDS) -> int:
+    """
+    Put RUNNING jobs whose lease expired (their worker stopped renewing it)
+    back in the queue, or mark them FAILED and run on_failure if they were
+    on their last attempt. Returns how many jobs were requeued or failed.
+    """
+    async def requeue(db):
+        final = Job.attempts >= Job.max_attempts
+        result = await db.execute(
+            update(Job)
+            .where(Job.status == JobStatus.RUNNING, Job.locked_at < _now() - timedelta(seconds=lease_seconds))
+            .values(
+                status=case(
+                    (final, literal(JobStatus.FAILED, Job.status.type)),
+                    else_=literal(JobStatus.QUEUED, Job.status.type),
+                ),
+                last_error=case((final, "Worker lost while running the job"), else_=Job.last_error),
+                locked_by=None,
+                locked_at=None,
+                run_after=_now(),
+            )
+            .returning(Job.id, Job.kind, Job.payload, Job.status)
+            .execution_options(synchronize_session=False)
+        )
+        return result.all()
+    lost = await _write(requeue)
+    failed = [(job_id, kind, payload) for job_id, kind, payload, status in lost if status == JobStatus.FAILED]
+    if len(lost) > len(failed):
+        logger.warning("Requeued %d jobs whose worker was lost", len(lost) - len(failed))
+    for job_id, kind, payload in failed:
+        logger.error("Job %s %s failed: its worker was lost on the last attempt", kind, job_id)
+        await _run_on_failure(job_id, kind, payload)
+    return len(lost)
+
+
+async def _queued_count(kinds: List[str]) -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(
+            select(func.count(Job.id)).where(
+                Job.kind.in_(kinds), Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+            )
+        )
+
+
+async def queue_status() -> Dict[str, Dict[str, int]]:
+    """{kind: {status: count}} over the whole table."""
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(select(Job.kind, Job.status, func.count(Job.id)).group_by(Job.kind, Job.status))
+        status: Dict[str, Dict[str, int]] = {}
+        for kind, job_status, count in rows:
+            status.setdefault(kind, {})[job_status.value] = count
+        return status
+
+
+# Workers in this process, woken when a transaction that enqueued jobs commits
+_workers: Set[Worker] = set()
+
+
+@event.listens_for(Session, "after_flush")
+def _note_enqueued_jobs(session, flush_context):
+    if _workers and any(isinstance(obj, Job) for obj in session.new):
+        session.info["jobs_enqueued"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_workers(session):
+    if session.info.pop("jobs_enqueued", False):
+        for worker in list(_workers):
+            worker.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_enqueued_jobs(session):
+    session.info.pop("jobs_enqueued", None)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run background jobs")
+    parser.add_argument("--concurrency", type=int, default=JOB_CONCURRENCY)
+    parser.add_argument("--kind", action="append", help="only these kinds (repeatable)")
+    parser.add_argument("--drain", action="store_true", help="exit once the queue is empty")
+    parser.add_argument("--status", action="store_true", help="print job counts and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(process)d] %(levelname)s %(name)s: %(message)s")
+    import transcode  # noqa: F401  registers its jobs
+
+    if args.status:
+        print(json.dumps(asyncio.run(queue_status()), indent=2))
+        return
+
+    async def work():
+        worker = Worker(concurrency=args.concurrency, kinds=args.kind)
+        logger.info("Job worker %s running %s", worker.name, ", ".join(worker._kinds()))
+        try:
+            await worker.run(drain=args.drain)
+        finally:
+            await worker.close()
+            await write_queue.close()
+
+    try:
+        asyncio.run(work())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    # Through the imported module: handlers register themselves with
+    # `import jobs`, which is not this __main__ copy
+    import jobs
+    jobs.main()
@@ -1,37 +1,130 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+# Cold-start timing (see lifespan): everything below counts as import time
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Depends, HTTPException, status, Request, UploadFile, File, Form, Query, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import hashlib
 import os 
+import uuid
+import weakref
+import anyio
+from starlette.requests import ClientDisconnect
 from pathlib import Path
-from fastapi.staticfiles import StaticFiles
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import timedelta, datetime, timezone
+from contextlib import asynccontextmanager
 
-from database import Base, engine, get_db
-from models import Message, User
+from database import AsyncSessionLocal, Base, engine, get_async_db
+from models import Message, MessageStats, ProcessingStatus, User, VoiceUpload
 from schemas import (
-    MessageCreate, MessageUpdate, MessageResponse,
-    UserCreate, UserResponse, Token, TokenData, MessageType,
+    MessageCreate, MessageUpdate, MessageResponse, MessagePage,
+    MessageBatchRequest, MessageBatchResponse, MessageChanges,
+    UserCreate, UserResponse, Token, TokenData, MessageType, ExportFormat,
+    MessageWaveform,
 )
 from security import (
-    verify_password, get_password_hash,
-    create_access_token, decode_access_token,
-    ACCESS_TOKEN_EXPIRE_MINUTES
+    get_password_hash_async, verify_password_async,
+    create_access_token, decode_access_token, shutdown_hash_pool,
+    HashingPoolBusy, ACCESS_TOKEN_EXPIRE_MINUTES, PASSWORD_HASH_RETRY_AFTER
+)
+import auth_cache
+from export import CONTENT_TYPES as EXPORT_CONTENT_TYPES, STREAMS as EXPORT_STREAMS
+from batch import apply_batch
+from media import voice_file_response
+import stats
+import jobs
+import transcode  # noqa: F401  registers the process_voice job
+from search import ensure_search_index, search_messages
+from storage import HOT_TIER, content_key, file_digest, get_storage, released_files
+from write_queue import write_queue
+import replicas
+from replicas import ReadYourWritesMiddleware, read_session
+import events
+import file_gc
+from serialization import FAST_JSON_RESPONSES, MESSAGE_COLUMNS, dumps, json_response, message_rows
+from sync import (
+    DEFAULT_CHANGES_LIMIT, MAX_CHANGES_LIMIT, InvalidChangeToken,
+    current_version, decode_token, encode_token, get_changes,
+)
+from http_cache import cache_headers, not_modified, weak_etag
+from compression import CompressionMiddleware
+import metrics
+from metrics import MetricsMiddleware, count_upload_bytes
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor,
+    after_cursor, encode_cursor,
+)
+from uploads import (
+    UPLOAD_DIR, PARTIAL_UPLOAD_DIR, MAX_FILE_SIZE, MULTIPART_OVERHEAD,
+    AUDIO_EXTENSIONS, TUS_VERSION, UploadSizeLimitMiddleware,
+    audio_extension, file_too_large_exception, iter_upload_file,
+    parse_upload_metadata, upload_length_exceeded_exception, write_stream,
 )
+from waveform import peaks_list
+
+# Set by server.py / gunicorn.conf.py once setup() has run in the parent process
+SETUP_DONE_ENV = "ONEPERCENT_SETUP_DONE"
+
+
+def setup() -> None:
+    """
+    One-time preparation: upload directories, tables and the search index.
 
-# Create uploads directory if it doesn't exist
-UPLOAD_DIR = Path("uploads/voice")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    Idempotent. Runs at startup rather than on import, so importing the app
+    (gunicorn preload, scripts, tests) has no side effects; the production
+    launchers run it once before forking workers instead of once per worker.
+    """
+    # Create uploads directories if they don't exist
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    PARTIAL_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        ensure_search_index(connection)
+    # Forked workers must not inherit the pooled connection
+    engine.dispose()
 
-Base.metadata.create_all(bind=engine)
+# Older app builds expect GET /api/messages to return the whole list.
+# While this is on, requests without limit/cursor keep getting that shape.
+MESSAGES_LEGACY_LIST = os.getenv("MESSAGES_LEGACY_LIST", "true").lower() in ("1", "true", "yes")
 
 # OAuth2 scheme for token extraction
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
-app = FastAPI(title="OnePercent", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup_started = time.perf_counter()
+    if not os.getenv(SETUP_DONE_ENV):
+        await anyio.to_thread.run_sync(setup)
+    file_gc_task = None
+    if file_gc.FILE_GC_INTERVAL_SECONDS:
+        file_gc_task = asyncio.create_task(file_gc.run_periodically())
+    job_worker = job_worker_task = None
+    if jobs.JOB_WORKER_IN_APP:
+        job_worker = jobs.Worker()
+        job_worker_task = asyncio.create_task(job_worker.run())
+    # Preloaded apps (gunicorn --preload) were imported once, in the master
+    import_seconds = _import_seconds if os.getpid() == _IMPORT_PID else 0.0
+    metrics.observe_cold_start(import_seconds, time.perf_counter() - startup_started)
+    yield
+    if file_gc_task is not None:
+        file_gc_task.cancel()
+    if job_worker is not None:
+        await job_worker.close()
+        await job_worker_task
+    await write_queue.close()
+    await events.broker.close()
+    shutdown_hash_pool()
+
+app = FastAPI(title="OnePercent", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware - allow requests from mobile app
 app.add_middleware(
@@ -42,7 +135,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.mount("/uploads", StaticFiles(directory="backend/uploads"), name="uploads")
+# Stop oversized voice uploads while they are still being received
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    paths={"/api/messages/upload-voice": MAX_FILE_SIZE + MULTIPART_OVERHEAD},
+)
+
+# brotli/gzip per Accept-Encoding for bodies over COMPRESSION_MINIMUM_SIZE
+app.add_middleware(CompressionMiddleware)
+
+# Responses to writes go out only once the user's read-your-writes pin is stored
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Outermost: latency and DB time per request, for /metrics and the slow log
+app.add_middleware(MetricsMiddleware)
+
+def hashing_busy_exception() -> HTTPException:
+    # Too many bcrypt jobs queued: ask the client to back off instead of piling on
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please retry shortly",
+        headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (see metrics.py)."""
+    if metrics.prometheus_client is None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Metrics need the prometheus_client package"
+        )
+    body, content_type = metrics.metrics_response_body()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/")
 async def root():
@@ -56,17 +181,17 @@ async def root():
 # Get current user from token
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_async_db)
+) -> UserResponse:
     """
     Dependency that extracts and verifies JWT token.
     Used in protected routes.
     
     Steps:
     1. Extract token from Authorization header
-    2. Decode token
-    3. Get user from database
-    4. Return user (or raise error if invalid)
+    2. Decode token (skipped if this token was seen recently)
+    3. Get user from cache, falling back to the database
+    4. Return user snapshot (or raise error if invalid)
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -74,35 +199,67 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    # Decode token
-    payload = decode_access_token(token)
-    if payload is None:
-        raise credentials_exception
-    
-    # Extract user ID from token
-    user_id: str = payload.get("sub")
+    user_id = auth_cache.get_cached_user_id(token)
     if user_id is None:
-        raise credentials_exception
+        # Decode token
+        payload = decode_access_token(token)
+        if payload is None:
+            raise credentials_exception
+        
+        # Extract user ID from token
+        sub: str = payload.get("sub")
+        if sub is None:
+            raise credentials_exception
+        try:
+            user_id = int(sub)
+        except ValueError:
+            raise credentials_exception
+        auth_cache.cache_token(token, user_id, payload.get("exp"))
+
+    cached_user = await auth_cache.get_cached_user(user_id)
+    if cached_user is not None:
+        return cached_user
     
-    # Get user from database
+    # Get user from database (a read replica unless this user just wrote)
     try:
-        user = db.query(User).filter(User.id == int(user_id)).first()
-        if user is None:
-            raise credentials_exception
-        return user
+        async with read_session(user_id) as read_db:
+            user = await read_db.get(User, user_id)
+        if user is None and replicas.replica_set is not None:
+            # Registered moments ago on another worker, not replicated yet
+            user = await db.get(User, user_id)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database error: {str(e)}"
         )
+    if user is None:
+        raise credentials_exception
+    return await auth_cache.cache_user(user)
+
+
+async def get_read_db(current_user: UserResponse = Depends(get_current_user)):
+    """
+    Session for the read-only routes: a read replica when DATABASE_READ_URLS
+    is set, or the primary for a few seconds after this user wrote
+    (replicas.py). Never write through it.
+    """
+    async with read_session(current_user.id) as db:
+        yield db
 
 ############################# MESSAGES ############################
 
+async def _get_user_message(db: AsyncSession, message_id: int, user_id: int) -> Optional[Message]:
+    result = await db.scalars(
+        select(Message).where(Message.id == message_id, Message.user_id == user_id)
+    )
+    return result.first()
+
+
 @app.post("/api/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-def create_message(
+async def create_message(
     message: MessageCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user)
 ):
     try:
 
@@ -112,34 +269,135 @@ def create_message(
         else:
             title = data["title"]
         focus_area = data.get("focus_area") or None
-        db_message = Message(
-            user_id=current_user.id, 
-            title=title, content=data["content"], 
-            message_type=data["message_type"], 
-            focus_area=focus_area
-            )
-        db.add(db_message)
-        db.commit()
-        db.refresh(db_message)
-        return db_message
+
+        async def create(db: AsyncSession) -> Message:
+            db_message = Message(
+                user_id=current_user.id, 
+                title=title, content=data["content"], 
+                message_type=data["message_type"], 
+                focus_area=focus_area
+                )
+            db.add(db_message)
+            await stats.add_message(db, db_message)
+            await db.flush()
+            await db.refresh(db_message)
+            return db_message
+
+        return await write_queue.run(db, create)
     except Exception as e:
-        db.rollback()  
+        await db.rollback()  
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create message: {str(e)}"
         )
 
 
-@app.get("/api/messages", response_model=List[MessageResponse])
-def list_messages(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)  
+@app.post("/api/messages/batch", response_model=MessageBatchResponse)
+async def batch_messages(
+    batch: MessageBatchRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Apply up to 100 creates/updates/deletes in one request and one transaction.
+
+    Meant for syncing an offline queue: each operation has an idempotency key,
+    and resending operations that were already applied returns their original
+    outcome (replayed=true) instead of applying them again.
+    """
+    try:
+        async def apply(db: AsyncSession):
+            results = await apply_batch(db, current_user.id, batch.operations)
+            await db.flush()
+            return results, released_files(db)
+
+        results, released = await write_queue.run(db, apply)
+        background_tasks.add_task(file_gc.release_files, released)
+        return MessageBatchResponse(results=results)
+    except IntegrityError:
+        # Another request committed one of these keys first
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Batch is already being applied, retry it"
+        )
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to apply batch: {str(e)}"
+        )
+
+
+@app.get("/api/messages", response_model=Union[MessagePage, List[MessageResponse]])
+async def list_messages(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserResponse = Depends(get_current_user)  
 ):
+    """
+    List the user's messages, newest first.
+
+    Pass `limit` (and the `next_cursor` of the previous page as `cursor`)
+    to page through the journal. Each page is a range scan on
+    ix_messages_user_created_id, so its cost does not grow with history size.
+    With FAST_JSON_RESPONSES on, rows skip the ORM and response_model (see
+    serialization.py). Carries a weak ETag; If-None-Match gives 304.
+    """
     try:
-        messages = db.query(Message).filter(
+        version = await current_version(db, current_user.id)
+        etag = weak_etag("messages", current_user.id, version, request.url.query)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        headers = cache_headers(etag)
+
+        fast = FAST_JSON_RESPONSES
+        query = select(*MESSAGE_COLUMNS) if fast else select(Message)
+        query = query.where(
             Message.user_id == current_user.id  
-        ).order_by(Message.created_at.desc()).all()
-        return messages
+        ).order_by(Message.created_at.desc(), Message.id.desc())
+
+        async def fetch(statement):
+            if fast:
+                return message_rows((await db.execute(statement)).all())
+            return (await db.scalars(statement)).all()
+
+        def respond(content):
+            if fast:
+                return json_response(content, headers=headers)
+            response.headers.update(headers)
+            return content
+
+        if MESSAGES_LEGACY_LIST and limit is None and cursor is None:
+            return respond(await fetch(query))
+
+        keyset = await after_cursor(db, current_user.id, cursor)
+        if keyset is not None:
+            query = query.where(keyset)
+
+        page_size = limit or DEFAULT_PAGE_SIZE
+        # Fetch one extra row to know whether another page exists
+        messages = await fetch(query.limit(page_size + 1))
+        next_cursor = None
+        if len(messages) > page_size:
+            messages = messages[:page_size]
+            last = messages[-1]
+            if fast:
+                next_cursor = encode_cursor(last["created_at"], last["id"])
+            else:
+                next_cursor = encode_cursor(last.created_at, last.id)
+
+        return respond({"items": messages, "next_cursor": next_cursor})
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -147,62 +405,243 @@ def list_messages(
         )
 
 
-# TODO: Update/Review this function to list of message
 @app.get("/api/messages/stats")
-def get_message_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_message_stats(
+    request: Request,
+    response: Response,
+    read_db: AsyncSession = Depends(get_read_db),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user)
 ):
     """
     Get statistics about user's messages.
-    Returns: total count, by type (text/voice), etc.
+    Returns: total count, by type (text/voice), per focus area,
+    current streak and today / this week / this month counts.
+
+    Served from the per-user rollup in message_stats, which the
+    write routes keep up to date, so this never scans messages.
+    Read from a replica; only a missing rollup is rebuilt on the primary.
     """
     try:
-        from sqlalchemy import func
+        version = await current_version(read_db, current_user.id)
+        # today / this week / streak also move when the UTC date does
+        today = datetime.now(timezone.utc).date()
+        etag = weak_etag("stats", current_user.id, version, today)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        response.headers.update(cache_headers(etag))
 
-        
-        now = datetime.now(timezone.utc)
-        
-        # Total messages
-        total = db.query(Message).filter(
-            Message.user_id == current_user.id
-        ).count()
-        # Messages by type
-        text_count = db.query(Message).filter(
-            Message.user_id == current_user.id,
-            Message.message_type == "text"
-        ).count()
-        
-        voice_count = db.query(Message).filter(
-            Message.user_id == current_user.id,
-            Message.message_type == "voice"
-        ).count()
-        
+        rollup = await read_db.get(MessageStats, current_user.id)
+        if rollup is None:
+            # Not replicated yet, or never built
+            rollup = await stats.get_stats(db, current_user.id)
+            await db.commit()
+        return stats.stats_payload(rollup)
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch statistics: {str(e)}"
+        )
+
+
+@app.get("/api/messages/search", response_model=MessagePage)
+async def search_user_messages(
+    q: str = Query(..., min_length=1, max_length=200),
+    focus_area: Optional[str] = Query(None),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Full-text search over the user's titles and content, best match first.
+
+    Every word in q must match as a prefix ("medit" finds "meditation").
+    Dates without a timezone are UTC. Pass next_cursor back as cursor for
+    the next page.
+    """
+    try:
+        messages, next_cursor = await search_messages(
+            db, current_user.id, q,
+            focus_area=focus_area, date_from=date_from, date_to=date_to,
+            limit=limit, cursor=cursor,
+        )
+        return {"items": messages, "next_cursor": next_cursor}
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search messages: {str(e)}"
+        )
+
+
+@app.get("/api/messages/export")
+async def export_messages(
+    format: ExportFormat = Query(ExportFormat.NDJSON),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Download the whole journal as NDJSON, CSV or a zip with the voice notes.
+
+    The body is streamed from a server-side cursor, so memory use does not
+    depend on journal size. Every row has a cursor field; if the download
+    breaks off, request again with cursor set to the last complete row's.
+    """
+    try:
+        keyset = await after_cursor(db, current_user.id, cursor)
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    filename = f"onepercent-{datetime.now(timezone.utc):%Y-%m-%d}.{format.value}"
+    return StreamingResponse(
+        EXPORT_STREAMS[format.value](current_user.id, keyset),
+        media_type=EXPORT_CONTENT_TYPES[format.value],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/api/messages/changes", response_model=MessageChanges)
+async def get_message_changes(
+    since: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_CHANGES_LIMIT, ge=1, le=MAX_CHANGES_LIMIT),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Messages created/updated and ids deleted since a change token.
+
+    Call without since for a full initial sync, then keep the returned
+    next_token and pass it as since to receive only what changed. A 410
+    means the token is unknown here and the client should sync from scratch.
+    """
+    try:
+        since_version = decode_token(since)
+        messages, deleted, next_version, has_more = await get_changes(
+            db, current_user.id, since_version, limit
+        )
         return {
-            "total_messages": total,
-            "text_messages": text_count,
-            "voice_messages": voice_count
+            "messages": messages,
+            "deleted": deleted,
+            "next_token": encode_token(next_version),
+            "has_more": has_more,
         }
+    except InvalidChangeToken:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Change token is no longer valid, sync from scratch"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch statistics: {str(e)}"
+            detail=f"Failed to fetch changes: {str(e)}"
         )
 
 
+############################# LIVE UPDATES ############################
+# Message changes and stats deltas pushed as they are committed (events.py),
+# so clients stop re-polling after each save and other devices stay current.
+
+@app.get("/api/messages/events")
+async def message_events(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Server-sent events stream of the user's message changes (see events.py
+    for the event types), with a comment line as heartbeat when idle.
+    """
+    # Authenticated; don't hold a pooled connection for the life of the stream
+    await db.close()
+
+    async def stream():
+        async with events.subscribe(current_user.id) as subscription:
+            async for event in subscription.events():
+                yield events.sse_message(event)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/api/messages/ws")
+async def message_events_ws(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """
+    The same events over a WebSocket, one JSON object per text frame, and
+    {"type": "ping"} as heartbeat. Authenticate with the Authorization
+    header, or ?token= where the client cannot set headers. Messages from
+    the client are ignored.
+    """
+    authorization = websocket.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[len("bearer "):]
+    try:
+        if not token:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+        async with AsyncSessionLocal() as db:
+            current_user = await get_current_user(token=token, db=db)
+    except HTTPException:
+        await websocket.close(code=1008)  # policy violation
+        return
+
+    await websocket.accept()
+    client_closed = False
+    try:
+        async with events.subscribe(current_user.id) as subscription:
+            async with anyio.create_task_group() as tasks:
+                async def watch_for_close():
+                    # Reading is how a close from the client is noticed
+                    nonlocal client_closed
+                    try:
+                        while True:
+                            await websocket.receive_text()
+                    except WebSocketDisconnect:
+                        client_closed = True
+                        tasks.cancel_scope.cancel()
+
+                tasks.start_soon(watch_for_close)
+                async for event in subscription.events():
+                    await websocket.send_text(dumps(event or {"type": "ping"}).decode())
+                # Resync: the client reloads and reconnects
+                tasks.cancel_scope.cancel()
+    except WebSocketDisconnect:
+        client_closed = True
+    if not client_closed:
+        await websocket.close()
+
+
 @app.get("/api/messages/{message_id}", response_model=MessageResponse)
-def get_message(
+async def get_message(
     message_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)  
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserResponse = Depends(get_current_user)  
 ):
     try:
-        message = db.query(Message).filter(
-            Message.id == message_id,
-            Message.user_id == current_user.id  
-        ).first()
+        version = await current_version(db, current_user.id)
+        etag = weak_etag("message", current_user.id, version, message_id)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+
+        message = await _get_user_message(db, message_id, current_user.id)
         if not message:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
+        response.headers.update(cache_headers(etag))
         return message
     except HTTPException:
         raise
@@ -214,23 +653,28 @@ def get_message(
 
 
 @app.put("/api/messages/{message_id}", response_model=MessageResponse)
-def update_message(message_id: int, update_data: MessageUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    try:
-        message = db.query(Message).filter(Message.id == message_id, Message.user_id == current_user.id).first()
+async def update_message(message_id: int, update_data: MessageUpdate, db: AsyncSession = Depends(get_async_db), current_user: UserResponse = Depends(get_current_user)):
+    async def update(db: AsyncSession) -> Message:
+        message = await _get_user_message(db, message_id, current_user.id)
         if not message:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
 
         # exclude_unset=True during updates avoids overwriting missing fields.
+        await stats.remove_message(db, message)
         for field, value in update_data.model_dump(exclude_unset=True).items():
             setattr(message, field, value)
+        await stats.add_message(db, message)
 
-        db.commit()
-        db.refresh(message)
+        await db.flush()
+        await db.refresh(message)
         return message
+
+    try:
+        return await write_queue.run(db, update)
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update message: {str(e)}"
@@ -238,41 +682,87 @@ def update_message(message_id: int, update_data: MessageUpdate, db: Session = De
 
 
 @app.delete("/api/messages/{message_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_message(message_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    try:
-        message = db.query(Message).filter(Message.id == message_id, Message.user_id == current_user.id).first()
+async def delete_message(message_id: int, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db), current_user: UserResponse = Depends(get_current_user)):
+    async def delete(db: AsyncSession):
+        message = await _get_user_message(db, message_id, current_user.id)
         if not message:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
 
-        db.delete(message)
-        db.commit()
+        await stats.remove_message(db, message)
+        await db.delete(message)
+        await db.flush()
+        return released_files(db)
+
+    try:
+        released = await write_queue.run(db, delete)
+        # Voice files go after the response; ones still used by other messages stay
+        background_tasks.add_task(file_gc.release_files, released)
         return None
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete message: {str(e)}"
         )
 
 
+async def _create_voice_message(
+    db: AsyncSession,
+    user_id: int,
+    voice_key: str,
+    title: Optional[str],
+    focus_area: Optional[str],
+) -> Message:
+    """
+    Shared by the one-shot and the resumable upload, inside write_queue.run:
+    voice_key is the content address (storage.py) of the received file,
+    already put into storage by the caller so that no file I/O holds up the
+    writer. The flush bumps the key's reference count; until then
+    delete_unreferenced leaves the freshly stored file alone. Its
+    processing job is queued in the same transaction.
+    """
+    if not title:
+        title = datetime.now(timezone.utc).strftime("%B %d, %Y")
+    
+    if not focus_area:
+        focus_area = None
+
+    db_message = Message(
+        title=title,
+        focus_area = focus_area,
+        message_type=MessageType.VOICE,
+        voice_file_path=voice_key,
+        processing_status=ProcessingStatus.PROCESSING,
+        user_id=user_id
+    )
+    db.add(db_message)
+    await stats.add_message(db, db_message)
+    await db.flush()
+    jobs.enqueue(db, "process_voice", message_id=db_message.id)
+    return db_message
+
+
 @app.post("/api/messages/upload-voice", response_model=MessageResponse)
 async def upload_voice_message(
     file: UploadFile = File(...),  # The audio file
     title: Optional[str] = Form(None),  # Title from form data
     focus_area: Optional[str] = Form(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user)
 ):
     """
     Upload a voice message (audio file).
     
     Steps:
     1. Validate file type (should be audio)
-    2. Save file to disk
-    3. Create message record in database
-    4. Return message with file URL
+    2. Stream file to disk in chunks, hashing as it goes (oversized bodies
+       are already rejected by UploadSizeLimitMiddleware while being received)
+    3. Move the file into storage under its content hash (a repeated upload
+       reuses the stored copy), then create the message record in database
+    4. Return message with file URL (processing_status "processing")
+    5. A queued job transcodes and probes it (transcode.py, jobs.py)
     """
     try:
         # Check both content-type and file extension
@@ -283,49 +773,35 @@ async def upload_voice_message(
         if file.filename:
             # Get file extension (lowercase for consistency)
             file_extension = file.filename.split(".")[-1].lower() if "." in file.filename else "mp3"
-            audio_extensions = {"mp3", "wav", "m4a", "aac", "ogg", "flac"}
-            is_audio_extension = file_extension in audio_extensions
+            is_audio_extension = file_extension in AUDIO_EXTENSIONS
 
         if not (is_audio_content_type or is_audio_extension):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="File must be an audio file (audio/* content-type or .mp3/.wav/.m4a extension)"
             )
-        
-        # Reuse file_extension variable (already lowercase)
-        import uuid
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = UPLOAD_DIR / unique_filename
-        MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
-        
-        with open(file_path, "wb") as buffer:
-            content = await file.read()  
-            if len(content) > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="File too large. Maximum size is 10MB"
-                )
-            buffer.write(content) 
 
+        if file.size is not None and file.size > MAX_FILE_SIZE:
+            raise file_too_large_exception()
         
-        # Step 4: Create message in database
-        if not title:
-            title = datetime.now(timezone.utc).strftime("%B %d, %Y")
-        
-        if not focus_area:
-            focus_area = None
-
-        db_message = Message(
-            title=title,
-            focus_area = focus_area,
-            message_type=MessageType.VOICE,
-            voice_file_path=str(file_path),  
-            user_id=current_user.id
-        )
-        db.add(db_message)
-        db.commit()
-        db.refresh(db_message)
-        
+        # Received into the partial directory, then stored under its hash
+        file_path = PARTIAL_UPLOAD_DIR / f"{uuid.uuid4()}.{file_extension}"
+        digest = hashlib.sha256()
+        size = await write_stream(iter_upload_file(file), file_path, MAX_FILE_SIZE, digest=digest)
+        count_upload_bytes("multipart", size)
+
+        voice_key = content_key(HOT_TIER, digest.hexdigest(), file_extension)
+        await get_storage().put(file_path, voice_key)
+
+        async def create(db: AsyncSession) -> Message:
+            db_message = await _create_voice_message(
+                db, current_user.id, voice_key, title, focus_area
+            )
+            await db.refresh(db_message)
+            return db_message
+
+        db_message = await write_queue.run(db, create)
+
         return db_message
         
     except HTTPException:
@@ -333,27 +809,296 @@ async def upload_voice_message(
     except Exception as e:
         if 'file_path' in locals() and file_path.exists():
             file_path.unlink()  
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to upload voice message: {str(e)}"
         )
 
+
+############################# RESUMABLE UPLOADS ############################
+# A subset of the tus 1.0 protocol (core + creation + termination) so the app
+# can resume a recording upload after a dropped connection instead of
+# re-sending the whole file:
+#   POST   /api/uploads/voice        Upload-Length, Upload-Metadata (filename, title, focus_area)
+#   HEAD   /api/uploads/voice/{id}   -> Upload-Offset: bytes received so far
+#   PATCH  /api/uploads/voice/{id}   Upload-Offset + application/offset+octet-stream body
+#   DELETE /api/uploads/voice/{id}   abandon the upload
+# The final PATCH creates the message and returns its id in Upload-Message-Id.
+
+# One PATCH at a time per upload (per worker) so appends never interleave
+_upload_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+def _tus_headers(**extra) -> dict:
+    headers = {"Tus-Resumable": TUS_VERSION, "Cache-Control": "no-store"}
+    headers.update({key.replace("_", "-"): str(value) for key, value in extra.items()})
+    return headers
+
+async def _get_user_upload(db: AsyncSession, upload_id: str, user_id: int) -> VoiceUpload:
+    upload = await db.get(VoiceUpload, upload_id)
+    if upload is None or upload.user_id != user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    return upload
+
+def _partial_path(upload_id: str) -> Path:
+    return PARTIAL_UPLOAD_DIR / f"{upload_id}.part"
+
+async def _upload_offset(upload: VoiceUpload) -> int:
+    # The partial file on disk is the source of truth for how much arrived
+    if upload.message_id is not None:
+        return upload.upload_length
+    try:
+        return (await anyio.Path(_partial_path(upload.id)).stat()).st_size
+    except FileNotFoundError:
+        return 0
+
+
+@app.post("/api/uploads/voice", status_code=status.HTTP_201_CREATED)
+async def create_voice_upload(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    try:
+        length_header = request.headers.get("upload-length", "")
+        if not length_header.isdigit():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Upload-Length header is required"
+            )
+        upload_length = int(length_header)
+        if upload_length > MAX_FILE_SIZE:
+            raise file_too_large_exception()
+
+        metadata = parse_upload_metadata(request.headers.get("upload-metadata"))
+        file_extension = audio_extension(metadata.get("filename"))
+        if file_extension is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Upload-Metadata filename must have an audio extension (.mp3/.wav/.m4a/...)"
+            )
+
+        upload = VoiceUpload(
+            id=str(uuid.uuid4()),
+            user_id=current_user.id,
+            upload_length=upload_length,
+            file_extension=file_extension,
+            title=metadata.get("title") or None,
+            focus_area=metadata.get("focus_area") or None,
+        )
+        db.add(upload)
+        await db.commit()
+        await anyio.Path(_partial_path(upload.id)).touch()
+
+        return Response(
+            status_code=status.HTTP_201_CREATED,
+            headers=_tus_headers(
+                Location=f"/api/uploads/voice/{upload.id}",
+                Upload_Offset=0,
+            ),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create upload: {str(e)}"
+        )
+
+
+@app.head("/api/uploads/voice/{upload_id}")
+async def get_voice_upload_offset(
+    upload_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    upload = await _get_user_upload(db, upload_id, current_user.id)
+    headers = _tus_headers(
+        Upload_Offset=await _upload_offset(upload),
+        Upload_Length=upload.upload_length,
+    )
+    if upload.message_id is not None:
+        headers["Upload-Message-Id"] = str(upload.message_id)
+    return Response(status_code=status.HTTP_200_OK, headers=headers)
+
+
+@app.patch("/api/uploads/voice/{upload_id}")
+async def append_voice_upload(
+    upload_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Append a chunk to a resumable upload.
+
+    The body is streamed straight to the partial file; a chunk that would
+    go past the announced Upload-Length is cut off with 413; the chunks
+    before it are kept.
+    """
+    if request.headers.get("content-type") != "application/offset+octet-stream":
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Content-Type must be application/offset+octet-stream"
+        )
+    offset_header = request.headers.get("upload-offset", "")
+    if not offset_header.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload-Offset header is required"
+        )
+
+    upload = await _get_user_upload(db, upload_id, current_user.id)
+    lock = _upload_locks.get(upload_id)
+    if lock is None:
+        lock = _upload_locks[upload_id] = asyncio.Lock()
+    async with lock:
+        try:
+            offset = await _upload_offset(upload)
+            if upload.message_id is not None or int(offset_header) != offset:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Upload-Offset mismatch, server has {offset} bytes",
+                    headers=_tus_headers(Upload_Offset=offset),
+                )
+
+            partial_path = _partial_path(upload.id)
+            received_from = offset
+            try:
+                offset += await write_stream(
+                    request.stream(), partial_path, upload.upload_length,
+                    append=True, already_written=offset,
+                    too_large=lambda: upload_length_exceeded_exception(upload.upload_length),
+                )
+            except ClientDisconnect:
+                # Keep what arrived; the client resumes from HEAD's Upload-Offset
+                offset = await _upload_offset(upload)
+            count_upload_bytes("tus", offset - received_from)
+
+            headers = _tus_headers(Upload_Offset=offset)
+            if offset == upload.upload_length:
+                voice_key = content_key(HOT_TIER, await file_digest(partial_path), upload.file_extension)
+                await get_storage().put(partial_path, voice_key)
+
+                async def finish(db: AsyncSession) -> Message:
+                    db_message = await _create_voice_message(
+                        db, current_user.id, voice_key, upload.title, upload.focus_area
+                    )
+                    (await db.get(VoiceUpload, upload.id)).message_id = db_message.id
+                    await db.flush()
+                    return db_message
+
+                try:
+                    db_message = await write_queue.run(db, finish)
+                except Exception:
+                    # If the file was already moved into storage, HEAD reports
+                    # offset 0 and the client sends it again
+                    await db.rollback()
+                    raise
+                headers["Upload-Message-Id"] = str(db_message.id)
+
+            return Response(status_code=status.HTTP_204_NO_CONTENT, headers=headers)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to append to upload: {str(e)}"
+            )
+
+
+@app.delete("/api/uploads/voice/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_voice_upload(
+    upload_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    try:
+        upload = await _get_user_upload(db, upload_id, current_user.id)
+        await anyio.Path(_partial_path(upload.id)).unlink(missing_ok=True)
+        await db.delete(upload)
+        await db.commit()
+        return Response(status_code=status.HTTP_204_NO_CONTENT, headers=_tus_headers())
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to delete upload: {str(e)}"
+        )
+
+@app.get("/api/messages/{message_id}/waveform", response_model=MessageWaveform)
+async def get_message_waveform(
+    message_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Waveform peaks and duration of a voice message, for drawing a preview
+    without downloading the audio. 404 until processing has produced them.
+    The ETag follows the peaks, so a revalidation is a 304.
+    """
+    try:
+        result = await db.execute(
+            select(Message.waveform_peaks, Message.duration_seconds).where(
+                Message.id == message_id,
+                Message.user_id == current_user.id
+            )
+        )
+        message = result.first()
+        if not message:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
+        if message.waveform_peaks is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="This message has no waveform"
+            )
+
+        etag = weak_etag("waveform", message_id, message.duration_seconds, message.waveform_peaks.hex())
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        response.headers.update(cache_headers(etag))
+        return MessageWaveform(
+            message_id=message_id,
+            duration_seconds=message.duration_seconds,
+            peaks=peaks_list(message.waveform_peaks),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch waveform: {str(e)}"
+        )
+
+
 @app.get("/api/messages/{message_id}/voice")
 async def get_voice_file(
     message_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserResponse = Depends(get_current_user)
 ):
     """
     Get voice file for a message.
-    Returns the audio file for streaming/download.
+    Returns the audio file for streaming/download, with Range (206)
+    and If-None-Match / If-Modified-Since (304) support so seeking and
+    replaying only transfer the bytes the player needs.
     """
     try:
-        message = db.query(Message).filter(
-            Message.id == message_id,
-            Message.user_id == current_user.id
-        ).first()
+        # Only the columns needed to locate the file
+        result = await db.execute(
+            select(Message.title, Message.voice_file_path).where(
+                Message.id == message_id,
+                Message.user_id == current_user.id
+            )
+        )
+        message = result.first()
         
         if not message:
             raise HTTPException(
@@ -367,18 +1112,8 @@ async def get_voice_file(
                 detail="This message has no voice file"
             )
         
-        file_path = Path(message.voice_file_path)
-        if not file_path.exists():
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Voice file not found on server"
-            )
-        
-        from fastapi.responses import FileResponse
-        return FileResponse(
-            path=file_path,
-            media_type="audio/mpeg",  
-            filename=(message.title or str(message.id)) + ".mp3"
+        return await voice_file_response(
+            request, message.voice_file_path, message.title or str(message_id)
         )
         
     except HTTPException:
@@ -393,10 +1128,10 @@ async def get_voice_file(
 
 # Registration endpoint
 @app.post("/api/auth/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     try:
         # Check if user already exists
-        existing_user = db.query(User).filter(User.email == user_data.email).first()
+        existing_user = (await db.scalars(select(User).where(User.email == user_data.email))).first()
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -404,14 +1139,14 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
             )
         
         # Hash password and Create user
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         db_user = User(
             email=user_data.email,
             hashed_password=hashed_password
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
 
          # Create token
         expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -420,8 +1155,11 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         return {"access_token": token, "token_type": "bearer"}
     except HTTPException:
         raise
+    except HashingPoolBusy:
+        await db.rollback()
+        raise hashing_busy_exception()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to register user: {str(e)}"
@@ -429,26 +1167,37 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
 # Login endpoint
 @app.post("/api/auth/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """
     Login user and return JWT token.
     
     Steps:
     1. Find user by email
-    2. Verify password
+    2. Verify password (re-hashing it if the stored hash is outdated)
     3. Create JWT token
     4. Return token
     """
     try:
         # Find user (OAuth2PasswordRequestForm uses 'username' field for email)
-        user = db.query(User).filter(User.email == form_data.username).first()
+        user = (await db.scalars(select(User).where(User.email == form_data.username))).first()
         
-        if not user or not verify_password(form_data.password, user.hashed_password):
+        verified, new_hash = False, None
+        if user:
+            verified, new_hash = await verify_password_async(form_data.password, user.hashed_password)
+        if not verified:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+
+        if new_hash:
+            # Best effort: a failed upgrade must not fail the login
+            try:
+                user.hashed_password = new_hash
+                await db.commit()
+            except Exception:
+                await db.rollback()
         
         # Create token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -460,6 +1209,8 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
         return {"access_token": access_token, "token_type": "bearer"}
     except HTTPException:
         raise
+    except HashingPoolBusy:
+        raise hashing_busy_exception()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -468,8 +1219,18 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 
 # Who I am endpoint
 @app.get("/api/auth/me", response_model=UserResponse)
-def read_me(current_user: User = Depends(get_current_user)):
+async def read_me(
+    request: Request,
+    response: Response,
+    current_user: UserResponse = Depends(get_current_user)
+):
     try:
+        # Profile fields do not change with messages; tag the snapshot itself
+        etag = weak_etag("me", current_user.id, current_user.email, current_user.is_active)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        response.headers.update(cache_headers(etag))
         return current_user
     except Exception as e:
         raise HTTPException(
@@ -506,10 +1267,15 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         content={
             "detail": exc.detail,
             "message": exc.detail  
-        }
+        },
+        headers=exc.headers,  # keep WWW-Authenticate / Retry-After
     )
 
 
+_import_seconds = time.perf_counter() - _import_started
+_IMPORT_PID = os.getpid()
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
-    import uvicorn
\ No newline at end of file
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
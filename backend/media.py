@@ -0,0 +1,153 @@
+# backend/media.py
+"""
+Conditional and byte-range responses for stored voice files.
+
+Voice files are write-once: content-addressed files are named after their
+SHA-256, which doubles as a strong ETag, and older files (every upload got
+a fresh name) use size plus mtime. That lets the player revalidate with
+If-None-Match (304, no body) and seek with Range (206, only the requested
+bytes), whichever storage backend holds the file.
+"""
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import PurePath
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
+
+from storage import resolve
+
+AUDIO_CONTENT_TYPES = {
+    "mp3": "audio/mpeg",
+    "m4a": "audio/mp4",
+    "aac": "audio/aac",
+    "wav": "audio/wav",
+    "ogg": "audio/ogg",
+    "opus": "audio/ogg",
+    "flac": "audio/flac",
+}
+
+# Per-user content, but the bytes behind a given URL + ETag never change
+VOICE_CACHE_CONTROL = "private, max-age=86400"
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def audio_content_type(path: PurePath) -> str:
+    return AUDIO_CONTENT_TYPES.get(path.suffix.lstrip(".").lower(), "application/octet-stream")
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison: W/"x" matches "x"
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == etag.removeprefix("W/") for candidate in candidates
+    )
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since when both are sent
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=start-end" range into an inclusive (start, end).
+
+    Returns:
+        None when the header should be ignored (malformed or multi-range),
+        in which case the whole file is served
+
+    Raises:
+        HTTPException(416): if the range lies outside the file
+    """
+    match = _RANGE_RE.match(header.replace(" ", ""))
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length > 0 and size > 0:
+            return max(size - length, 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start <= end:
+            return start, end
+    raise HTTPException(
+        status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        detail="Requested range not satisfiable",
+        headers={"Content-Range": f"bytes */{size}"},
+    )
+
+
+async def voice_file_response(request: Request, reference: str, download_name: str) -> Response:
+    """
+    Serve a stored voice file honouring If-None-Match / If-Modified-Since,
+    Range and If-Range.
+
+    Args:
+        request: the incoming request (for its conditional/range headers)
+        reference: the message's voice_file_path (storage key or legacy path)
+        download_name: filename without extension for Content-Disposition
+
+    Raises:
+        HTTPException(404): if the file is missing from storage
+    """
+    backend, key = resolve(reference)
+    stored = await backend.stat(key)
+    if stored is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Voice file not found on server"
+        )
+
+    etag = stored.etag
+    size = stored.size
+    path = PurePath(key)
+    filename = f"{download_name}{path.suffix.lower()}"
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stored.mtime, usegmt=True),
+        "Cache-Control": VOICE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if _not_modified(request, etag, stored.mtime):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    headers["Content-Disposition"] = f"inline; filename*=utf-8''{quote(filename)}"
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range: only honour the range if the client's copy is still current
+    if range_header and (if_range is None or if_range == etag):
+        byte_range = parse_range(range_header, size)
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, status.HTTP_200_OK
+    else:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    length = end - start + 1
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        backend.iter_bytes(key, start, length),
+        status_code=status_code,
+        headers=headers,
+        media_type=audio_content_type(path),
+    )
@@ -0,0 +1,223 @@
+# backend/metrics.py
+"""
+Request-level performance metrics, exposed on /metrics in Prometheus format.
+
+- per-route latency histograms (route template, not raw path, as the label)
+- number and total time of DB queries per request, from SQLAlchemy cursor
+  events, plus a histogram of every query's duration
+- bcrypt time in the hashing pool, and how long jobs waited for a worker
+- bytes received by the upload routes
+- each worker's cold start (import and startup time), also logged
+- read-only sessions by where they went (primary or a replica, replicas.py)
+
+With SLOW_REQUEST_MS set, requests slower than that are logged together with
+their DB time and the SQL they ran.
+
+prometheus_client is optional: without it nothing is exported, but the
+per-request accounting and the slow-request log still work.
+"""
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import prometheus_client  # optional dependency, /metrics is disabled without it
+    from prometheus_client import Counter, Gauge, Histogram
+except ImportError:
+    prometheus_client = None
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))  # 0 disables the slow-request log
+SLOW_REQUEST_MAX_STATEMENTS = 50
+
+if prometheus_client is not None:
+    REQUEST_SECONDS = Histogram(
+        "onepercent_http_request_duration_seconds",
+        "Time until the last byte of the response was sent",
+        ["method", "route", "status"],
+    )
+    REQUEST_DB_QUERIES = Histogram(
+        "onepercent_request_db_queries",
+        "DB queries issued while handling a request",
+        ["route"],
+        buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+    )
+    REQUEST_DB_SECONDS = Histogram(
+        "onepercent_request_db_seconds",
+        "Time spent in DB queries while handling a request",
+        ["route"],
+    )
+    DB_QUERY_SECONDS = Histogram(
+        "onepercent_db_query_duration_seconds",
+        "Duration of each DB query, including background work",
+    )
+    PASSWORD_HASH_SECONDS = Histogram(
+        "onepercent_password_hash_seconds",
+        "bcrypt time per operation inside the hashing pool",
+        ["operation"],
+        buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    )
+    PASSWORD_HASH_WAIT_SECONDS = Histogram(
+        "onepercent_password_hash_wait_seconds",
+        "Time a hashing job waited for a free pool worker",
+        ["operation"],
+    )
+    UPLOAD_BYTES = Counter(
+        "onepercent_upload_bytes",
+        "Bytes of voice audio received",
+        ["kind"],
+    )
+    WORKER_COLD_START_SECONDS = Gauge(
+        "onepercent_worker_cold_start_seconds",
+        "Time from importing the app to serving, per worker process",
+        ["phase"],
+        multiprocess_mode="all",
+    )
+    READ_SESSIONS = Counter(
+        "onepercent_read_sessions",
+        "Sessions opened for read-only routes, by target database",
+        ["target"],
+    )
+    JOB_SECONDS = Histogram(
+        "onepercent_job_duration_seconds",
+        "Time a background job's handler ran, by outcome",
+        ["kind", "outcome"],
+        buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+    )
+
+
+@dataclass
+class RequestStats:
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    statements: List[str] = field(default_factory=list)
+    closed: bool = False  # response sent; background tasks are not counted
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    if prometheus_client is not None:
+        DB_QUERY_SECONDS.observe(elapsed)
+    stats = _current.get()
+    if stats is None or stats.closed:
+        return
+    stats.db_queries += 1
+    stats.db_seconds += elapsed
+    if SLOW_REQUEST_MS and len(stats.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.statements.append(f"{elapsed * 1000:7.1f} ms  {' '.join(statement.split())[:500]}")
+
+
+def observe_password_hash(operation: str, compute_seconds: float, wait_seconds: float) -> None:
+    if prometheus_client is not None:
+        PASSWORD_HASH_SECONDS.labels(operation).observe(compute_seconds)
+        PASSWORD_HASH_WAIT_SECONDS.labels(operation).observe(wait_seconds)
+
+
+def count_upload_bytes(kind: str, size: int) -> None:
+    if prometheus_client is not None and size:
+        UPLOAD_BYTES.labels(kind).inc(size)
+
+
+def count_read_session(target: str) -> None:
+    if prometheus_client is not None:
+        READ_SESSIONS.labels(target).inc()
+
+
+def observe_job(kind: str, outcome: str, seconds: float) -> None:
+    if prometheus_client is not None:
+        JOB_SECONDS.labels(kind, outcome).observe(seconds)
+
+
+def observe_cold_start(import_seconds: float, startup_seconds: float) -> None:
+    """import_seconds is 0 for workers forked from a preloading master."""
+    logger.info(
+        "Worker %d ready in %.0f ms (import %.0f ms, startup %.0f ms)",
+        os.getpid(), (import_seconds + startup_seconds) * 1000,
+        import_seconds * 1000, startup_seconds * 1000,
+    )
+    if prometheus_client is not None:
+        WORKER_COLD_START_SECONDS.labels("import").set(import_seconds)
+        WORKER_COLD_START_SECONDS.labels("startup").set(startup_seconds)
+
+
+def _route_label(scope) -> str:
+    # The matched route's template keeps label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Time each HTTP request up to its last response byte and attribute the
+    DB queries it ran. Outermost middleware, so compression is included.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        def finish():
+            stats.closed = True
+            elapsed = time.perf_counter() - started
+            route = _route_label(scope)
+            if prometheus_client is not None:
+                REQUEST_SECONDS.labels(scope["method"], route, str(status_code)).observe(elapsed)
+                REQUEST_DB_QUERIES.labels(route).observe(stats.db_queries)
+                REQUEST_DB_SECONDS.labels(route).observe(stats.db_seconds)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                logger.warning(
+                    "Slow request: %s %s -> %s in %.1f ms (%d queries, %.1f ms in DB)\n%s",
+                    scope["method"], scope["path"], status_code, elapsed * 1000,
+                    stats.db_queries, stats.db_seconds * 1000, "\n".join(stats.statements),
+                )
+
+        async def timed_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            if not stats.closed:
+                # Failed or disconnected before the body was complete
+                finish()
+            _current.reset(token)
+
+
+def metrics_response_body():
+    """(body, content type) for /metrics, aggregating all workers in multiprocess mode."""
+    registry = prometheus_client.REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import CollectorRegistry, multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
@@ -1,7 +1,7 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, ForeignKey, Boolean, Index, JSON, Float, LargeBinary
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from enum import Enum as PyEnum
 from database import Base
 
@@ -11,6 +11,18 @@ class MessageType(str, PyEnum):
     VOICE = "voice"
 
 
+class ProcessingStatus(str, PyEnum):
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class JobStatus(str, PyEnum):
+    QUEUED = "queued"  # waiting, or waiting to be retried (run_after)
+    RUNNING = "running"
+    FAILED = "failed"  # out of attempts; finished jobs are deleted
+
+
 class Message(Base):
     __tablename__ = "messages"
 
@@ -22,9 +34,33 @@ class Message(Base):
     user = relationship("User", back_populates="messages")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    voice_file_path = Column(String(500), nullable=True)
+    voice_file_path = Column(String(500), nullable=True)  # storage key (storage.py) or legacy path
     focus_area = Column(String(255), nullable=True)
 
+    # Voice post-processing (transcode.py, run as a job by jobs.py); NULL for
+    # text messages. PROCESSING while the job is queued, running or retrying.
+    processing_status = Column(Enum(ProcessingStatus), nullable=True)
+    original_file_path = Column(String(500), nullable=True)  # untouched upload, in the cold tier
+    duration_seconds = Column(Float, nullable=True)
+    bitrate = Column(Integer, nullable=True)  # bits/s of the playback file
+    size_bytes = Column(Integer, nullable=True)  # size of the playback file
+    # Peaks for the waveform preview, one int8 per bucket (waveform.py); served
+    # by GET /api/messages/{id}/waveform, never loaded for lists
+    waveform_peaks = deferred(Column(LargeBinary, nullable=True))
+
+    # Per-user sequence number of the last write to this row (see sync.py)
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # Keyset pagination: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_messages_user_created_id", user_id, created_at.desc(), id.desc()),
+        # Delta sync: WHERE user_id = ? AND change_seq > ? ORDER BY change_seq
+        Index("ix_messages_user_change_seq", user_id, change_seq),
+        # Per-user filters and counts by type / focus area
+        Index("ix_messages_user_type", user_id, message_type),
+        Index("ix_messages_user_focus_area", user_id, focus_area),
+    )
+
 class User(Base):
     __tablename__ = "users"
 
@@ -35,4 +71,97 @@ class User(Base):
     is_active = Column(Boolean, default=True, nullable=False)
 
     # Relationship: one user has many Messages
-    messages = relationship("Message", back_populates="user")
\ No newline at end of file
+    messages = relationship("Message", back_populates="user")
+
+
+class MessageStats(Base):
+    """Per-user rollup behind /api/messages/stats, kept current by the message routes."""
+    __tablename__ = "message_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_messages = Column(Integer, nullable=False, default=0)
+    text_messages = Column(Integer, nullable=False, default=0)
+    voice_messages = Column(Integer, nullable=False, default=0)
+    focus_area_counts = Column(JSON, nullable=False, default=dict)  # {"health": 3, ...}
+    day_counts = Column(JSON, nullable=False, default=dict)  # {"2025-12-07": 2, ...} (UTC days)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class VoiceUpload(Base):
+    """A resumable (tus-style) voice upload that has not been turned into a Message yet."""
+    __tablename__ = "voice_uploads"
+
+    id = Column(String(36), primary_key=True)  # uuid4, also names the partial file
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    upload_length = Column(Integer, nullable=False)  # total bytes announced by the client
+    file_extension = Column(String(10), nullable=False)
+    title = Column(String(255), nullable=True)
+    focus_area = Column(String(255), nullable=True)
+    message_id = Column(Integer, ForeignKey("messages.id"), nullable=True)  # set once complete
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class IdempotencyKey(Base):
+    """Outcome of an already-applied batch operation, keyed by the client's idempotency key."""
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(64), primary_key=True)
+    operation = Column(String(10), nullable=False)
+    status_code = Column(Integer, nullable=False)
+    message_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class MessageSyncState(Base):
+    """Per-user counter bumped on every message write; the delta sync change token."""
+    __tablename__ = "message_sync_state"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class MessageTombstone(Base):
+    """Records a deleted message so delta sync can tell clients to drop it."""
+    __tablename__ = "message_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    message_id = Column(Integer, nullable=False)
+    change_seq = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_message_tombstones_user_change_seq", user_id, change_seq),
+    )
+
+
+class StoredFile(Base):
+    """Reference count of a content-addressed voice file (see storage.py)."""
+    __tablename__ = "stored_files"
+
+    key = Column(String(120), primary_key=True)  # e.g. voice/ab/cd/<sha256>.m4a
+    ref_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class Job(Base):
+    """A unit of background work, durable across restarts (see jobs.py)."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)  # e.g. "process_voice"
+    payload = Column(JSON, nullable=False, default=dict)  # keyword arguments of the handler
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_after = Column(DateTime(timezone=True), nullable=False)  # not before; pushed back on retry
+    locked_by = Column(String(100), nullable=True)  # worker running it
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Claiming: WHERE status = 'queued' AND kind = ? AND run_after <= now ORDER BY run_after, id
+        Index("ix_jobs_status_kind_run_after", status, kind, run_after),
+    )
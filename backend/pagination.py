@@ -0,0 +1,100 @@
+# backend/pagination.py
+import base64
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, func, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Message
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue."""
+
+
+def encode_cursor(created_at: datetime, message_id: int) -> str:
+    """
+    Build an opaque cursor pointing at a message.
+
+    Args:
+        created_at: created_at of the last message on the page
+        message_id: id of the last message on the page
+
+    Returns:
+        URL-safe string the client sends back to get the next page
+    """
+    raw = f"{created_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Returns:
+        (created_at, message_id) tuple
+
+    Raises:
+        InvalidCursor: if the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at, message_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def as_stored_timestamp(dialect: str, value: datetime):
+    """
+    Bind value for comparison with a created_at column.
+
+    created_at comes from server_default=func.now(), which SQLite stores as
+    "YYYY-MM-DD HH:MM:SS" text in UTC; a bound datetime renders with
+    microseconds and compares as a different string, so SQLite gets that
+    text instead. Naive values are taken as UTC.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    value = value.astimezone(timezone.utc)
+    if dialect == "sqlite":
+        return literal(value.strftime("%Y-%m-%d %H:%M:%S"))
+    return value
+
+
+async def after_cursor(db: AsyncSession, user_id: int, cursor: Optional[str]):
+    """
+    Keyset filter for user_id's messages that come after the cursor in
+    (created_at DESC, id DESC) order, or None for the first page.
+
+    The anchor created_at is read back from the cursor row itself so the
+    comparison uses the stored value (SQLite keeps server-default timestamps
+    without microseconds, which never compares equal to a bound datetime).
+    If the anchor row was deleted in the meantime we fall back to the
+    timestamp carried in the cursor.
+
+    Raises:
+        InvalidCursor: if the cursor is malformed or points at another
+            user's message (whose position must not leak into the page)
+    """
+    if not cursor:
+        return None
+    created_at, message_id = decode_cursor(cursor)
+    owner = await db.scalar(select(Message.user_id).where(Message.id == message_id))
+    if owner is not None and owner != user_id:
+        raise InvalidCursor("Cursor points at another user's message")
+    anchor = func.coalesce(
+        select(Message.created_at)
+        .where(Message.id == message_id, Message.user_id == user_id)
+        .scalar_subquery(),
+        as_stored_timestamp(db.bind.dialect.name, created_at),
+    )
+    return or_(
+        Message.created_at < anchor,
+        and_(Message.created_at == anchor, Message.id < message_id),
+    )
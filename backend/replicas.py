@@ -0,0 +1,198 @@
+# backend/replicas.py
+"""
+Read-replica routing for the read-only routes.
+
+With DATABASE_READ_URLS set, read_session() hands out sessions on one of
+the replicas, picked round-robin or by fewest sessions in use
+(READ_REPLICA_STRATEGY). Everything else, and every write, stays on the
+primary.
+
+Replicas lag behind the primary, so a user who has just written is pinned
+to the primary for READ_YOUR_WRITES_SECONDS: after creating a message, the
+next list shows it. Pins are set when a session that changed that user's
+rows commits (any object with a user_id, or the User itself). They are kept
+in-process, or in Redis with READ_PIN_BACKEND=redis so a write handled by
+one worker pins the user's reads on all of them. The commit hook is sync,
+so it starts the pin as a task (auth_cache.run_in_background), and
+ReadYourWritesMiddleware holds back every response until the pins started
+so far are stored: the client never gets the answer to a write before its
+pin exists. read_session() awaits the lookup.
+
+Two SQLite files are enough to try this out; the replica only shows what
+was copied into it:
+    DATABASE_READ_URLS=sqlite:///./replica.db
+"""
+import asyncio
+import itertools
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+import metrics
+from auth_cache import AsyncMemoryCache, run_in_background
+from database import AsyncSessionLocal, read_engines
+from models import User
+
+READ_REPLICA_STRATEGY = os.getenv("READ_REPLICA_STRATEGY", "round_robin")  # or "least_connections"
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))  # 0 disables pinning
+READ_PIN_BACKEND = os.getenv("READ_PIN_BACKEND", "memory")
+READ_PIN_REDIS_URL = os.getenv("READ_PIN_REDIS_URL", "redis://localhost:6379/0")
+# Longest a response waits for pins to be stored (a stalled Redis must not stall every response)
+READ_PIN_WAIT_SECONDS = float(os.getenv("READ_PIN_WAIT_SECONDS", "1"))
+
+
+@dataclass
+class Replica:
+    name: str
+    sessionmaker: async_sessionmaker
+    in_use: int = 0
+
+
+class ReplicaSet:
+    def __init__(self, replicas: List[Replica], strategy: str = READ_REPLICA_STRATEGY):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown READ_REPLICA_STRATEGY {strategy!r}")
+        self.replicas = replicas
+        self.strategy = strategy
+        self._turn = itertools.count()
+
+    def choose(self) -> Replica:
+        # Ties (and round robin) rotate, so idle replicas share the load
+        start = next(self._turn) % len(self.replicas)
+        rotated = self.replicas[start:] + self.replicas[:start]
+        if self.strategy == "least_connections":
+            return min(rotated, key=lambda replica: replica.in_use)
+        return rotated[0]
+
+
+class RedisPins:
+    """Pins shared by all workers (READ_PIN_BACKEND=redis)."""
+
+    def __init__(self, url: str = READ_PIN_REDIS_URL, prefix: str = "onepercent:read-pin:"):
+        import redis.asyncio as redis  # optional dependency, only needed for this backend
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, user_id: int) -> Optional[bool]:
+        return bool(await self._redis.exists(f"{self._prefix}{user_id}")) or None
+
+    async def set(self, user_id: int, value: bool, ttl: float) -> None:
+        await self._redis.set(f"{self._prefix}{user_id}", 1, px=max(1, int(ttl * 1000)))
+
+
+def _make_pins():
+    if READ_PIN_BACKEND == "redis":
+        return RedisPins()
+    return AsyncMemoryCache()
+
+
+replica_set: Optional[ReplicaSet] = None
+if read_engines:
+    replica_set = ReplicaSet([
+        Replica(
+            name=f"replica{index}",
+            sessionmaker=async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False),
+        )
+        for index, engine in enumerate(read_engines)
+    ])
+pins = _make_pins()
+
+
+async def pin_to_primary(user_ids: Iterable[int]) -> None:
+    """Send these users' reads to the primary for READ_YOUR_WRITES_SECONDS."""
+    for user_id in user_ids:
+        await pins.set(user_id, True, READ_YOUR_WRITES_SECONDS)
+
+
+async def is_pinned(user_id: int) -> bool:
+    return READ_YOUR_WRITES_SECONDS > 0 and bool(await pins.get(user_id))
+
+
+# Pins started by commits and not stored yet
+_pending_pins: Set[asyncio.Task] = set()
+
+
+async def wait_for_pins(timeout: float = READ_PIN_WAIT_SECONDS) -> None:
+    """Wait until the pins started so far are stored (or timeout)."""
+    pending = set(_pending_pins)
+    if pending:
+        await asyncio.wait(pending, timeout=timeout)
+
+
+class ReadYourWritesMiddleware:
+    """
+    Sends a response only once the pins of the writes committed before it
+    are stored. Commits may happen on the write queue's own task, so this
+    waits for all pending pins rather than the request's own; they are
+    few, and storing one is a single Redis SET.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or replica_set is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_after_pins(message):
+            if message["type"] == "http.response.start":
+                await wait_for_pins()
+            await send(message)
+
+        await self.app(scope, receive, send_after_pins)
+
+
+@asynccontextmanager
+async def read_session(user_id: Optional[int] = None) -> AsyncIterator[AsyncSession]:
+    """
+    A session for reads only: on a replica, or on the primary when there
+    are none or user_id has written within READ_YOUR_WRITES_SECONDS.
+    """
+    if replica_set is None or (user_id is not None and await is_pinned(user_id)):
+        metrics.count_read_session("primary" if replica_set is None else "primary_pinned")
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    replica = replica_set.choose()
+    metrics.count_read_session(replica.name)
+    replica.in_use += 1
+    try:
+        async with replica.sessionmaker() as db:
+            yield db
+    finally:
+        replica.in_use -= 1
+
+
+# Same shape as auth_cache's eviction hooks: note whose rows a flush touched,
+# pin them once the transaction has committed, forget them on rollback
+@event.listens_for(Session, "after_flush")
+def _track_written_users(session, flush_context):
+    if replica_set is None:
+        return
+    written = session.info.setdefault("written_users", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        user_id = obj.id if isinstance(obj, User) else getattr(obj, "user_id", None)
+        if user_id is not None:
+            written.add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _pin_written_users(session):
+    written = session.info.pop("written_users", None)
+    if written:
+        task = run_in_background(pin_to_primary(written))
+        if task is not None:
+            _pending_pins.add(task)
+            task.add_done_callback(_pending_pins.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_written_users(session):
+    session.info.pop("written_users", None)
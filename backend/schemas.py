@@ -1,6 +1,6 @@
 # backend/schemas.py
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from enum import Enum
 from pydantic import BaseModel, Field
 
@@ -10,6 +10,18 @@ class MessageType(str, Enum):
     VOICE = "voice"
 
 
+class ProcessingStatus(str, Enum):
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+    ZIP = "zip"
+
+
 class MessageBase(BaseModel):
     title: Optional[str] = Field(default=None, max_length=255)
     content: Optional[str]
@@ -33,10 +45,56 @@ class MessageResponse(MessageBase):
     created_at: datetime
     updated_at: Optional[datetime] 
     voice_file_path: Optional[str] = None  
+    processing_status: Optional[ProcessingStatus] = None
+    duration_seconds: Optional[float] = None
+    bitrate: Optional[int] = None
+    size_bytes: Optional[int] = None
 
     class Config:
         from_attributes = True  # allows returning SQLAlchemy objects directly
 
+class MessagePage(BaseModel):
+    items: List[MessageResponse]
+    next_cursor: Optional[str] = None  # None when there are no more messages
+
+class MessageWaveform(BaseModel):
+    message_id: int
+    duration_seconds: Optional[float] = None
+    peaks: List[int]  # 0..127 per bucket, evenly spaced over the recording
+
+class MessageChanges(BaseModel):
+    messages: List[MessageResponse]  # created or updated since the token
+    deleted: List[int]  # ids of messages deleted since the token
+    next_token: str  # pass as since on the next call
+    has_more: bool  # call again right away with next_token
+
+class BatchOperationType(str, Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+class MessageBatchOperation(BaseModel):
+    op: BatchOperationType
+    # Client-generated; retrying a batch with the same keys never applies an operation twice
+    idempotency_key: str = Field(..., min_length=1, max_length=64)
+    id: Optional[int] = None  # target message for update/delete
+    data: Optional[Dict[str, Any]] = None  # MessageCreate / MessageUpdate fields
+
+class MessageBatchRequest(BaseModel):
+    operations: List[MessageBatchOperation] = Field(..., min_length=1, max_length=100)
+
+class MessageBatchResult(BaseModel):
+    idempotency_key: str
+    op: BatchOperationType
+    status: int  # HTTP status this operation would have had on its own
+    id: Optional[int] = None
+    message: Optional[MessageResponse] = None
+    error: Optional[Any] = None
+    replayed: bool = False  # True if the key was already applied earlier
+
+class MessageBatchResponse(BaseModel):
+    results: List[MessageBatchResult]
+
 class UserBase(BaseModel):
     email: str = Field(..., pattern=r'^[^@]+@[^@]+\.[^@]+$')
 
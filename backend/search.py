@@ -0,0 +1,215 @@
+# backend/search.py
+"""
+Full-text search over message titles and content.
+
+- SQLite: an external-content FTS5 table (messages_fts) kept in sync with
+  messages by triggers, ranked with bm25 (title hits weigh more). user_id
+  is indexed too and matched inside the MATCH, so FTS only walks the
+  caller's postings instead of every user's hits for a common prefix.
+- Postgres: a generated tsvector column (search_vector) with a GIN index,
+  ranked with ts_rank.
+
+Both are maintained by the database itself, so every write path (single
+routes, batch, scripts) keeps the index current without extra code.
+Terms are prefix-matched, so "medit" finds "meditation". Pages are
+keyset on (score, id) rather than offsets.
+"""
+import base64
+import logging
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, func, literal, literal_column, or_, select, table, column, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Message
+from pagination import InvalidCursor, as_stored_timestamp
+
+logger = logging.getLogger(__name__)
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERMS = 8
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        title, content, user_id,
+        content='messages', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, title, content, user_id) VALUES (new.id, new.title, new.content, new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, title, content, user_id) VALUES ('delete', old.id, old.title, old.content, old.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF title, content, user_id ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, title, content, user_id) VALUES ('delete', old.id, old.title, old.content, old.user_id);
+        INSERT INTO messages_fts(rowid, title, content, user_id) VALUES (new.id, new.title, new.content, new.user_id);
+    END
+    """,
+]
+
+_POSTGRES_DDL = [
+    """
+    ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_messages_search_vector ON messages USING GIN (search_vector)",
+]
+
+_SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS messages_fts_ai",
+    "DROP TRIGGER IF EXISTS messages_fts_ad",
+    "DROP TRIGGER IF EXISTS messages_fts_au",
+    "DROP TABLE IF EXISTS messages_fts",
+]
+
+messages_fts = table("messages_fts", column("rowid"))
+
+
+def ensure_search_index(connection: Connection) -> None:
+    """
+    Create the search index for the connection's dialect if it is missing.
+    Safe to run on every startup; the first run indexes existing rows.
+    An SQLite index from before user_id was indexed is rebuilt.
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE type='table' AND name='messages_fts'")
+        ).scalar()
+        if exists and "user_id" not in exists:
+            for statement in _SQLITE_DROP:
+                connection.execute(text(statement))
+            exists = None
+        for statement in _SQLITE_DDL:
+            connection.execute(text(statement))
+        if not exists:
+            connection.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        for statement in _POSTGRES_DDL:
+            connection.execute(text(statement))
+    else:
+        logger.warning("No full-text index for %s, search will use LIKE", dialect)
+
+
+def search_terms(query: str) -> List[str]:
+    return _TERM_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def encode_search_cursor(score: float, message_id: int) -> str:
+    """Opaque cursor after a hit; repr round-trips the float exactly."""
+    raw = f"{score!r}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    """
+    Raises:
+        InvalidCursor: if the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        score, message_id = raw.rsplit("|", 1)
+        return float(score), int(message_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+async def search_messages(
+    db: AsyncSession,
+    user_id: int,
+    query: str,
+    focus_area: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Message], Optional[str]]:
+    """
+    Best matches first. Every term must match (as a word prefix).
+
+    Hits are ordered by (score, id DESC), lower scores being better
+    matches, and the cursor is the last hit's pair. Dates without a
+    timezone are taken as UTC.
+
+    Returns:
+        (up to limit messages after the cursor, cursor for the next page
+        or None)
+
+    Raises:
+        InvalidCursor: if the cursor is malformed
+    """
+    after = decode_search_cursor(cursor) if cursor else None
+    terms = search_terms(query)
+    if not terms:
+        return [], None
+
+    dialect = db.bind.dialect.name
+    filters = [Message.user_id == user_id]
+    if focus_area:
+        filters.append(Message.focus_area == focus_area)
+    if date_from:
+        filters.append(Message.created_at >= as_stored_timestamp(dialect, date_from))
+    if date_to:
+        filters.append(Message.created_at <= as_stored_timestamp(dialect, date_to))
+
+    if dialect == "sqlite":
+        # "term"* is an FTS5 prefix query; quoting keeps user input literal.
+        # The user_id filter sits in the MATCH so FTS narrows by it first.
+        prefixes = " ".join(f'"{term}"*' for term in terms)
+        match = f'user_id : "{int(user_id)}" AND {{title content}} : ({prefixes})'
+        score = func.bm25(literal_column("messages_fts"), 10.0, 1.0, 0.0)
+        hits = (
+            select(Message.id, score.label("score"))
+            .join(messages_fts, messages_fts.c.rowid == Message.id)
+            .where(literal_column("messages_fts").op("MATCH")(match), *filters)
+        )
+    elif dialect == "postgresql":
+        tsquery = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+        vector = literal_column("messages.search_vector")
+        hits = select(Message.id, (-func.ts_rank(vector, tsquery)).label("score")).where(
+            vector.op("@@")(tsquery), *filters
+        )
+    else:
+        like = [
+            (Message.title.ilike(f"%{term}%")) | (Message.content.ilike(f"%{term}%"))
+            for term in terms
+        ]
+        hits = select(Message.id, literal(0.0).label("score")).where(and_(*like), *filters)
+
+    hits = hits.subquery()
+    statement = (
+        select(Message, hits.c.score)
+        .join(hits, hits.c.id == Message.id)
+        .order_by(hits.c.score, hits.c.id.desc())
+        .limit(limit + 1)
+    )
+    if after is not None:
+        score_after, id_after = after
+        statement = statement.where(
+            or_(
+                hits.c.score > score_after,
+                and_(hits.c.score == score_after, hits.c.id < id_after),
+            )
+        )
+
+    rows = (await db.execute(statement)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_search_cursor(rows[-1].score, rows[-1].Message.id)
+    return [row.Message for row in rows], next_cursor
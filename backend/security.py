@@ -1,12 +1,29 @@
 # backend/security.py
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
 
+from metrics import observe_password_hash
+
+# bcrypt cost factor. Changing it is safe: existing hashes keep working and
+# are upgraded on the user's next successful login (see verify_password_async).
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
 # Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Hashing worker pool: bcrypt is pure CPU (~250 ms at 12 rounds), so it runs
+# in separate processes instead of the request threadpool / event loop.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Max hashes queued or running per API process before we shed load with 503
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", str(PASSWORD_HASH_WORKERS * 8)))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "2"))  # seconds
 
 # JWT Settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -38,6 +55,88 @@ def get_password_hash(password: str) -> str:
     """
     return pwd_context.hash(password)
 
+class HashingPoolBusy(Exception):
+    """Raised when the hashing pool queue is full; callers should answer 503."""
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_in_flight = 0
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+    return _hash_pool
+
+def _discard_hash_pool(pool: ProcessPoolExecutor) -> None:
+    global _hash_pool
+    pool.shutdown(wait=False, cancel_futures=True)
+    if _hash_pool is pool:
+        _hash_pool = None
+
+def _verify_and_check_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    # Runs inside a pool process
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+def _timed(fn, *args):
+    # Runs inside a pool process; only the elapsed time crosses back
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+async def _run_in_hash_pool(operation: str, fn, *args):
+    global _hash_in_flight
+    if _hash_in_flight >= PASSWORD_HASH_MAX_QUEUE:
+        raise HashingPoolBusy()
+    _hash_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        pool = _get_hash_pool()
+        try:
+            result, compute_seconds = await loop.run_in_executor(pool, _timed, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM kill, segfault) and the pool refuses new work;
+            # replace it once, unless a concurrent caller already did
+            _discard_hash_pool(pool)
+            result, compute_seconds = await loop.run_in_executor(_get_hash_pool(), _timed, fn, *args)
+        wait_seconds = time.perf_counter() - submitted - compute_seconds
+        observe_password_hash(operation, compute_seconds, max(wait_seconds, 0.0))
+        return result
+    finally:
+        _hash_in_flight -= 1
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Hash a plain password in the hashing pool.
+
+    Raises:
+        HashingPoolBusy: if PASSWORD_HASH_MAX_QUEUE hashes are already pending
+    """
+    return await _run_in_hash_pool("hash", get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password in the hashing pool.
+
+    Returns:
+        (matches, new_hash) - new_hash is set when the stored hash uses
+        outdated parameters (e.g. BCRYPT_ROUNDS changed) and should be saved
+
+    Raises:
+        HashingPoolBusy: if PASSWORD_HASH_MAX_QUEUE hashes are already pending
+    """
+    return await _run_in_hash_pool("verify", _verify_and_check_update, plain_password, hashed_password)
+
+def shutdown_hash_pool() -> None:
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Create a JWT access token.
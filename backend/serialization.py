@@ -0,0 +1,64 @@
+# backend/serialization.py
+"""
+Opt-in fast JSON path for message lists (FAST_JSON_RESPONSES=true).
+
+The default path loads ORM objects and lets FastAPI build a MessageResponse
+from each one's attributes. For long lists that dominates the request, so
+this path instead:
+
+1. selects only the MessageResponse columns, as plain rows (no ORM objects)
+2. validates them with a TypeAdapter built once at import, over a TypedDict
+   with MessageResponse's fields (no model instance per row)
+3. encodes with orjson when it is installed, pydantic-core otherwise
+
+The JSON produced is the same as the default path's.
+"""
+import os
+from typing import Any, Iterable, List, Optional, Sequence
+
+from fastapi import status
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+
+from models import Message
+from schemas import MessageResponse
+
+try:
+    import orjson  # optional dependency, pydantic-core is used without it
+except ImportError:
+    orjson = None
+
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+MESSAGE_FIELDS = tuple(MessageResponse.model_fields)
+MESSAGE_COLUMNS = tuple(Message.__table__.c[name] for name in MESSAGE_FIELDS)
+
+# Same fields and types as MessageResponse, validated into plain dicts
+MessageRow = TypedDict(
+    "MessageRow",
+    {name: field.annotation for name, field in MessageResponse.model_fields.items()},
+)
+_message_rows = TypeAdapter(List[MessageRow])
+_any = TypeAdapter(Any)
+
+
+def message_rows(rows: Iterable[Sequence]) -> List[dict]:
+    """Validate rows selected with MESSAGE_COLUMNS into MessageResponse-shaped dicts."""
+    return _message_rows.validate_python([dict(zip(MESSAGE_FIELDS, row)) for row in rows])
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        # UTC as "Z", like pydantic (and so the response_model path) writes it
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return _any.dump_json(content)
+
+
+def json_response(
+    content: Any, status_code: int = status.HTTP_200_OK, headers: Optional[dict] = None
+) -> Response:
+    """Already-validated content, encoded without going through response_model."""
+    return Response(
+        content=dumps(content), status_code=status_code, headers=headers, media_type="application/json"
+    )
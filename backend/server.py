@@ -0,0 +1,87 @@
+# backend/server.py
+"""
+Production entry point (start.sh is the single-process --reload dev server).
+
+    python server.py
+
+Runs uvicorn with WEB_CONCURRENCY worker processes, uvloop and httptools
+when they are installed (uvicorn[standard]), and no reload. One-time setup
+(upload directories, tables, search index) runs here once, before the
+workers start, instead of in every worker. Each worker logs its cold start
+time when it is ready to serve, and exports it on /metrics.
+
+Settings (environment):
+    HOST, PORT                  bind address (0.0.0.0:8000)
+    WEB_CONCURRENCY             worker processes (default: CPU count, max 8)
+    LOG_LEVEL                   info
+    KEEPALIVE_TIMEOUT           seconds an idle keep-alive connection stays open (5)
+    BACKLOG                     listen backlog (2048)
+    SQLITE_PROFILE              production (default here): WAL and the
+                                write queue, see database.py
+    JOB_WORKER_IN_APP           true: each worker also runs background jobs;
+                                false: run `python jobs.py` processes instead
+
+With gunicorn instead (preloads the app in the master and forks workers):
+    gunicorn -c gunicorn.conf.py main:app
+
+For /metrics across workers set PROMETHEUS_MULTIPROC_DIR to an empty
+directory; gunicorn.conf.py cleans up after exited workers.
+"""
+import copy
+import importlib.util
+import os
+
+import uvicorn
+from uvicorn.config import LOGGING_CONFIG
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(min(os.cpu_count() or 1, 8))))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+KEEPALIVE_TIMEOUT = int(os.getenv("KEEPALIVE_TIMEOUT", "5"))
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+
+# Before database.py is imported; no effect unless DATABASE_URL is SQLite
+os.environ.setdefault("SQLITE_PROFILE", "production")
+
+
+def event_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_protocol() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def log_config() -> dict:
+    # uvicorn's own config, plus the app's loggers (slow requests, cold start, GC)
+    config = copy.deepcopy(LOGGING_CONFIG)
+    config["root"] = {"handlers": ["default"], "level": LOG_LEVEL.upper()}
+    return config
+
+
+def run() -> None:
+    import main
+
+    main.setup()
+    # Inherited by the workers, whose lifespan then skips setup()
+    os.environ[main.SETUP_DONE_ENV] = "1"
+
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        loop=event_loop(),
+        http=http_protocol(),
+        log_level=LOG_LEVEL,
+        log_config=log_config(),
+        timeout_keep_alive=KEEPALIVE_TIMEOUT,
+        backlog=BACKLOG,
+        proxy_headers=True,
+        access_log=LOG_LEVEL == "debug",
+    )
+
+
+if __name__ == "__main__":
+    run()
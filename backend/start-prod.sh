@@ -0,0 +1,4 @@
+#!/bin/bash
+# Production: worker processes, no reload (settings in server.py)
+source venv/bin/activate
+exec python server.py
@@ -0,0 +1,286 @@
+# backend/stats.py
+"""
+Per-user message rollup behind /api/messages/stats.
+
+Rows are built lazily, from the messages table, the first time a user's
+rollup is needed (INSERT ... ON CONFLICT DO NOTHING, so concurrent first
+writes agree on one row). Afterwards every write adjusts it with a single
+UPDATE whose new values are computed from the stored ones, never a read
+followed by a write, so concurrent writes cannot lose each other's counts.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import Integer, case, cast, func, insert, select, update
+from sqlalchemy.dialects.postgresql import JSONB, insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Message, MessageStats, MessageType
+
+
+def _type_value(message_type) -> str:
+    # Routes hand us either the models or the schemas enum (or a plain string)
+    return getattr(message_type, "value", message_type)
+
+
+def _day_key(created_at: Optional[datetime]) -> str:
+    # created_at is still None for a message that has not been flushed yet;
+    # the server default will stamp it with the current UTC time.
+    if created_at is None:
+        return datetime.now(timezone.utc).date().isoformat()
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date().isoformat()
+
+
+async def _count_messages(db: AsyncSession, user_id: int) -> dict:
+    """
+    A user's rollup columns as the messages table has them now.
+
+    One grouped aggregate query gives counts per (type, focus area, day);
+    everything else is folded in Python.
+    """
+    day = func.date(Message.created_at)
+    result = await db.execute(
+        select(Message.message_type, Message.focus_area, day, func.count(Message.id))
+        .where(Message.user_id == user_id)
+        .group_by(Message.message_type, Message.focus_area, day)
+    )
+    rows = result.all()
+
+    total = text = voice = 0
+    focus_counts, day_counts = {}, {}
+    for message_type, focus_area, day_value, count in rows:
+        total += count
+        if _type_value(message_type) == MessageType.VOICE.value:
+            voice += count
+        else:
+            text += count
+        if focus_area:
+            focus_counts[focus_area] = focus_counts.get(focus_area, 0) + count
+        if day_value:
+            key = str(day_value)[:10]
+            day_counts[key] = day_counts.get(key, 0) + count
+
+    return {
+        "total_messages": total,
+        "text_messages": text,
+        "voice_messages": voice,
+        "focus_area_counts": focus_counts,
+        "day_counts": day_counts,
+    }
+
+
+async def _load(db: AsyncSession, user_id: int) -> Optional[MessageStats]:
+    # populate_existing: the rollup is changed by UPDATE statements, so a
+    # copy already in the session may be stale
+    query = select(MessageStats).where(MessageStats.user_id == user_id)
+    return (await db.execute(query.execution_options(populate_existing=True))).scalars().first()
+
+
+async def ensure_stats(db: AsyncSession, user_id: int) -> None:
+    """
+    Build a user's rollup from the messages table if it does not exist yet.
+
+    Call before this transaction changes any of the user's messages: the
+    row counts what is in the table, and apply_changes() then adds the
+    transaction's own changes. A concurrent build of the same row is left
+    alone (ON CONFLICT DO NOTHING); its transaction created or committed the
+    row before any of its changes, so both count the same messages.
+    """
+    exists = await db.scalar(select(MessageStats.user_id).where(MessageStats.user_id == user_id))
+    if exists is not None:
+        return
+    values = {"user_id": user_id, **await _count_messages(db, user_id)}
+    dialect = db.bind.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        upsert = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(MessageStats).values(**values)
+        await db.execute(upsert.on_conflict_do_nothing(index_elements=[MessageStats.user_id]))
+    else:
+        await db.execute(insert(MessageStats).values(**values))
+
+
+async def rebuild_stats(db: AsyncSession, user_id: int) -> MessageStats:
+    """
+    Recompute a user's rollup from the messages table, replacing what is
+    stored. Only for repairs: the routes keep rollups current.
+    """
+    values = await _count_messages(db, user_id)
+    await ensure_stats(db, user_id)
+    await db.execute(
+        update(MessageStats)
+        .where(MessageStats.user_id == user_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return await _load(db, user_id)
+
+
+async def get_stats(db: AsyncSession, user_id: int) -> MessageStats:
+    """Load a user's rollup, building it on first use."""
+    rollup = await _load(db, user_id)
+    if rollup is None:
+        await ensure_stats(db, user_id)
+        rollup = await _load(db, user_id)
+    return rollup
+
+
+def counted(message: Message) -> Tuple[str, Optional[str], str]:
+    """
+    What the rollup counts a message under: (type, focus area, UTC day).
+    Take this before changing a message, and before anything may flush it.
+    """
+    return (
+        _type_value(message.message_type),
+        message.focus_area,
+        _day_key(message.created_at),
+    )
+
+
+async def apply_changes(
+    db: AsyncSession,
+    user_id: int,
+    added: Iterable[tuple] = (),
+    removed: Iterable[tuple] = (),
+) -> None:
+    """
+    Adjust a user's rollup for any number of messages with one UPDATE.
+
+    Call before the changes are flushed (see ensure_stats).
+
+    Args:
+        added: counted() keys of messages being created (or their new state)
+        removed: counted() keys of messages being deleted (or their old state)
+    """
+    changes = [(key, +1) for key in added] + [(key, -1) for key in removed]
+    if not changes:
+        return
+
+    columns = Counter()
+    focus_counts, day_counts = Counter(), Counter()
+    for (message_type, focus_area, day), sign in changes:
+        columns["total_messages"] += sign
+        if message_type == MessageType.VOICE.value:
+            columns["voice_messages"] += sign
+        else:
+            columns["text_messages"] += sign
+        if focus_area:
+            focus_counts[focus_area] += sign
+        day_counts[day] += sign
+
+    await ensure_stats(db, user_id)
+    dialect = db.bind.dialect.name
+    values = {
+        name: getattr(MessageStats, name) + delta
+        for name, delta in columns.items() if delta
+    }
+    for name, deltas in (("focus_area_counts", focus_counts), ("day_counts", day_counts)):
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if deltas:
+            values[name] = _add_to_counts(dialect, getattr(MessageStats, name), deltas)
+    if not values:
+        return  # e.g. an update that kept the type, focus area and day
+    if dialect not in ("sqlite", "postgresql"):
+        await _apply_in_python(db, user_id, values, focus_counts, day_counts)
+        return
+    await db.execute(
+        update(MessageStats)
+        .where(MessageStats.user_id == user_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _add_to_counts(dialect: str, column, deltas: Dict[str, int]):
+    """
+    SQL for a JSON {key: count} column with deltas added to it, read from
+    the stored value; keys that drop to zero are removed.
+    """
+    if dialect == "sqlite":
+        # A JSON merge patch: a null member removes the key
+        patch = []
+        for key, delta in deltas.items():
+            members = func.json_each(column).table_valued("key", "value")
+            stored = select(members.c.value).where(members.c.key == key).scalar_subquery()
+            count = func.coalesce(stored, 0) + delta
+            patch += [key, case((count > 0, count), else_=None)]
+        return func.json_patch(column, func.json_object(*patch))
+    if dialect == "postgresql":
+        patch = []
+        for key, delta in deltas.items():
+            count = func.coalesce(cast(column.op("->>")(key), Integer), 0) + delta
+            patch += [key, case((count > 0, count), else_=None)]
+        merged = cast(column, JSONB).op("||")(func.jsonb_build_object(*patch))
+        return cast(func.jsonb_strip_nulls(merged), column.type)
+    return None
+
+
+async def _apply_in_python(db: AsyncSession, user_id: int, values: dict, focus_counts, day_counts) -> None:
+    # Other databases: lock the row, then write the JSON columns from Python
+    rollup = (await db.execute(
+        select(MessageStats).where(MessageStats.user_id == user_id)
+        .with_for_update().execution_options(populate_existing=True)
+    )).scalars().one()
+    for name in ("total_messages", "text_messages", "voice_messages"):
+        if name in values:
+            setattr(rollup, name, values[name])
+    # JSON columns are not mutation-tracked, so always assign fresh dicts
+    for name, deltas in (("focus_area_counts", focus_counts), ("day_counts", day_counts)):
+        counts = dict(getattr(rollup, name) or {})
+        for key, delta in deltas.items():
+            value = counts.get(key, 0) + delta
+            if value > 0:
+                counts[key] = value
+            else:
+                counts.pop(key, None)
+        setattr(rollup, name, counts)
+
+
+async def add_message(db: AsyncSession, message: Message) -> None:
+    """Count a message that is being created (call before commit)."""
+    await apply_changes(db, message.user_id, added=[counted(message)])
+
+
+async def remove_message(db: AsyncSession, message: Message) -> None:
+    """Uncount a message that is being deleted or is about to change type/focus area."""
+    await apply_changes(db, message.user_id, removed=[counted(message)])
+
+
+def current_streak(day_counts: dict, today: date) -> int:
+    """
+    Number of consecutive days with at least one entry, ending today.
+    A streak is still alive if the last entry was yesterday.
+    """
+    day = today
+    if day.isoformat() not in day_counts:
+        day -= timedelta(days=1)
+    streak = 0
+    while day.isoformat() in day_counts:
+        streak += 1
+        day -= timedelta(days=1)
+    return streak
+
+
+def stats_payload(rollup: MessageStats, today: Optional[date] = None) -> dict:
+    """Shape a rollup into the /api/messages/stats response."""
+    today = today or datetime.now(timezone.utc).date()
+    day_counts = rollup.day_counts or {}
+
+    def count_since(start: date) -> int:
+        return sum(
+            day_counts.get((start + timedelta(days=i)).isoformat(), 0)
+            for i in range((today - start).days + 1)
+        )
+
+    return {
+        "total_messages": rollup.total_messages,
+        "text_messages": rollup.text_messages,
+        "voice_messages": rollup.voice_messages,
+        "focus_areas": rollup.focus_area_counts or {},
+        "current_streak": current_streak(day_counts, today),
+        "today": day_counts.get(today.isoformat(), 0),
+        "this_week": count_since(today - timedelta(days=today.weekday())),
+        "this_month": count_since(today.replace(day=1)),
+    }
@@ -0,0 +1,446 @@
+# backend/storage.py
+"""
+Content-addressed storage for voice files.
+
+Every file is named after the SHA-256 of its bytes and fanned out over two
+levels of subdirectories, under a tier:
+
+    voice/ab/cd/abcd1234...<64 hex>.m4a     playback files and fresh uploads
+    cold/ab/cd/abcd1234...<64 hex>.wav      originals kept after transcoding
+
+That string (the key) is what Message.voice_file_path / original_file_path
+hold. No directory grows past 65,536 entries per level, and a retried or
+repeated upload maps onto the file that is already there instead of adding
+a copy.
+
+Since several messages can share a file, stored_files counts references to
+each key. A Session before_flush hook keeps the counts in step with the
+messages' path columns, so every write path (routes, batch, background
+processing) is covered without extra code. Files whose count reached zero
+are removed with delete_unreferenced, right after the delete that released
+them or later by the garbage collector (file_gc.py).
+
+Backends (VOICE_STORAGE_BACKEND):
+- local: UPLOAD_DIR for the voice tier, COLD_STORAGE_DIR for the cold tier
+- s3: any S3-compatible bucket (AWS, or MinIO via S3_ENDPOINT_URL); needs
+  boto3, credentials come from the usual AWS_* variables
+
+Messages saved before content addressing keep plain file paths; resolve()
+serves those from disk as before and they are not reference counted.
+"""
+import errno
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+import anyio
+from sqlalchemy import delete, event, func, insert, inspect, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import AsyncSessionLocal
+from models import Message, StoredFile
+from uploads import CHUNK_SIZE, UPLOAD_DIR
+
+try:
+    import boto3  # optional dependency, only for VOICE_STORAGE_BACKEND=s3
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+
+VOICE_STORAGE_BACKEND = os.getenv("VOICE_STORAGE_BACKEND", "local")  # "local" or "s3"
+COLD_STORAGE_DIR = Path(os.getenv("COLD_STORAGE_DIR", "uploads/cold"))
+
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_PREFIX = os.getenv("S3_PREFIX", "")  # e.g. "onepercent/"
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "")  # e.g. http://localhost:9000 for MinIO
+S3_REGION = os.getenv("S3_REGION", "")
+S3_COLD_STORAGE_CLASS = os.getenv("S3_COLD_STORAGE_CLASS", "")  # e.g. STANDARD_IA on AWS
+# Files written more recently are never deleted as unreferenced: an upload
+# stores its file before the write that references it (see delete_unreferenced)
+STORE_GRACE_SECONDS = int(os.getenv("STORE_GRACE_SECONDS", "600"))
+
+HOT_TIER = "voice"
+COLD_TIER = "cold"
+
+_KEY_RE = re.compile(r"^(voice|cold)/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.[a-z0-9]{1,10}$")
+_SHARD_RE = re.compile(r"^[0-9a-f]{2}$")
+_REFERENCE_COLUMNS = ("voice_file_path", "original_file_path")
+_MISSING_CODES = {"404", "NoSuchKey", "NotFound"}
+
+
+def content_key(tier: str, digest: str, extension: str) -> str:
+    return f"{tier}/{digest[:2]}/{digest[2:4]}/{digest}.{extension.lower()}"
+
+
+def is_storage_key(value: Optional[str]) -> bool:
+    return bool(value) and _KEY_RE.match(value) is not None
+
+
+def key_digest(key: Optional[str]) -> Optional[str]:
+    """The SHA-256 a storage key was named after, or None for a legacy path."""
+    match = _KEY_RE.match(key or "")
+    return match.group(2) if match else None
+
+
+def in_tier(key: str, tier: str) -> str:
+    """The key the same bytes have in another tier."""
+    return tier + key[key.index("/"):]
+
+
+async def file_digest(path: Path) -> str:
+    def digest():
+        with open(path, "rb") as source:
+            return hashlib.file_digest(source, "sha256").hexdigest()
+    return await anyio.to_thread.run_sync(digest)
+
+
+@dataclass
+class StoredObject:
+    size: int
+    mtime: float  # seconds since the epoch
+    etag: str
+
+
+def _etag(key: str, size: int, mtime_ns: int) -> str:
+    # The content hash is the ideal validator; legacy files fall back to size + mtime
+    digest = key_digest(key)
+    return f'"{digest}"' if digest else f'"{size:x}-{mtime_ns:x}"'
+
+
+def _place(source: Path, target: Path, keep_source: bool) -> None:
+    # Same name means same bytes, so replacing a copy that is already there is harmless
+    if not keep_source:
+        try:
+            os.replace(source, target)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    # Copy next to the target first so readers never see a half-written file
+    partial_target = target.with_name(f".{target.name}.{uuid.uuid4().hex}")
+    try:
+        shutil.copyfile(source, partial_target)
+        os.replace(partial_target, target)
+    except BaseException:
+        partial_target.unlink(missing_ok=True)
+        raise
+    if not keep_source:
+        source.unlink()
+
+
+def list_directory(directory: Path) -> List[Tuple[str, int, float, bool]]:
+    """(name, size, mtime, is_dir) of a directory's entries, sorted by name; empty if it does not exist."""
+    listing = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    stat_result = entry.stat()
+                except FileNotFoundError:
+                    continue  # removed while we were listing
+                listing.append((entry.name, stat_result.st_size, stat_result.st_mtime, entry.is_dir()))
+    except FileNotFoundError:
+        return []
+    return sorted(listing)
+
+
+class LocalFiles:
+    """Files on local disk addressed by their path: messages stored before content addressing."""
+
+    def path(self, key: str) -> Path:
+        return Path(key)
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            stat_result = await anyio.Path(self.path(key)).stat()
+        except FileNotFoundError:
+            return None
+        return StoredObject(
+            stat_result.st_size, stat_result.st_mtime,
+            _etag(key, stat_result.st_size, stat_result.st_mtime_ns),
+        )
+
+    async def iter_bytes(self, key: str, start: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        async with await anyio.open_file(self.path(key), "rb") as source:
+            await source.seek(start)
+            remaining = length
+            while remaining is None or remaining > 0:
+                chunk = await source.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    @asynccontextmanager
+    async def local_path(self, key: str) -> AsyncIterator[Path]:
+        """A path on local disk with the file's bytes, e.g. for ffmpeg."""
+        yield self.path(key)
+
+    async def delete(self, key: str) -> None:
+        await anyio.Path(self.path(key)).unlink(missing_ok=True)
+
+
+class LocalStorage(LocalFiles):
+    """Content-addressed files on local disk, one root directory per tier."""
+
+    def __init__(self, roots: Dict[str, Path]):
+        self.roots = roots
+
+    def path(self, key: str) -> Path:
+        tier, _, rest = key.partition("/")
+        return self.roots[tier] / rest
+
+    async def put(self, source: Path, key: str, keep_source: bool = False) -> None:
+        """Store source under key; it is moved unless keep_source is set."""
+        target = self.path(key)
+        await anyio.Path(target.parent).mkdir(parents=True, exist_ok=True)
+        await anyio.to_thread.run_sync(_place, source, target, keep_source)
+
+    async def iter_keys(self, tier: str) -> AsyncIterator[Tuple[str, int, float]]:
+        """(key, size, mtime) of every file stored in a tier, in key order."""
+        root = self.roots[tier]
+        for first, *_ in await anyio.to_thread.run_sync(list_directory, root):
+            if not _SHARD_RE.match(first):
+                continue
+            for second, *_ in await anyio.to_thread.run_sync(list_directory, root / first):
+                if not _SHARD_RE.match(second):
+                    continue
+                shard = root / first / second
+                for name, size, mtime, _ in await anyio.to_thread.run_sync(list_directory, shard):
+                    key = f"{tier}/{first}/{second}/{name}"
+                    # Skips anything else, such as a copy still being written
+                    if is_storage_key(key):
+                        yield key, size, mtime
+
+
+class S3Storage:
+    """Content-addressed files in an S3-compatible bucket; boto3 calls run in worker threads."""
+
+    def __init__(self, bucket: str, prefix: str = "", client=None, cold_storage_class: str = ""):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("VOICE_STORAGE_BACKEND=s3 needs the boto3 package")
+            client = boto3.client(
+                "s3", endpoint_url=S3_ENDPOINT_URL or None, region_name=S3_REGION or None
+            )
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cold_storage_class = cold_storage_class
+
+    def _call(self, method, **kwargs):
+        return anyio.to_thread.run_sync(partial(method, Bucket=self.bucket, **kwargs))
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            head = await self._call(self.client.head_object, Key=self.prefix + key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in _MISSING_CODES:
+                return None
+            raise
+        mtime = head["LastModified"].timestamp()
+        return StoredObject(head["ContentLength"], mtime, _etag(key, head["ContentLength"], int(mtime * 1e9)))
+
+    async def iter_bytes(self, key: str, start: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        kwargs = {"Key": self.prefix + key}
+        if start or length is not None:
+            end = "" if length is None else str(start + length - 1)
+            kwargs["Range"] = f"bytes={start}-{end}"
+        body = (await self._call(self.client.get_object, **kwargs))["Body"]
+        try:
+            while chunk := await anyio.to_thread.run_sync(body.read, CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    @asynccontextmanager
+    async def local_path(self, key: str) -> AsyncIterator[Path]:
+        descriptor, name = tempfile.mkstemp(suffix=Path(key).suffix)
+        os.close(descriptor)
+        try:
+            await anyio.to_thread.run_sync(
+                self.client.download_file, self.bucket, self.prefix + key, name
+            )
+            yield Path(name)
+        finally:
+            await anyio.Path(name).unlink(missing_ok=True)
+
+    async def put(self, source: Path, key: str, keep_source: bool = False) -> None:
+        extra_args = {}
+        if key.startswith(COLD_TIER + "/") and self.cold_storage_class:
+            extra_args["StorageClass"] = self.cold_storage_class
+        # Uploaded even when the key exists, which refreshes LastModified for the GC grace period
+        await anyio.to_thread.run_sync(partial(
+            self.client.upload_file, str(source), self.bucket, self.prefix + key,
+            ExtraArgs=extra_args or None,
+        ))
+        if not keep_source:
+            await anyio.Path(source).unlink(missing_ok=True)
+
+    async def delete(self, key: str) -> None:
+        await self._call(self.client.delete_object, Key=self.prefix + key)
+
+    async def iter_keys(self, tier: str) -> AsyncIterator[Tuple[str, int, float]]:
+        """(key, size, mtime) of every object stored in a tier, in key order."""
+        pages = iter(self.client.get_paginator("list_objects_v2").paginate(
+            Bucket=self.bucket, Prefix=f"{self.prefix}{tier}/"
+        ))
+        while page := await anyio.to_thread.run_sync(next, pages, None):
+            for item in page.get("Contents", []):
+                key = item["Key"][len(self.prefix):]
+                if is_storage_key(key):
+                    yield key, item["Size"], item["LastModified"].timestamp()
+
+
+legacy_files = LocalFiles()
+_storage = None
+
+
+def get_storage():
+    """The configured backend, created on first use."""
+    global _storage
+    if _storage is None:
+        if VOICE_STORAGE_BACKEND == "s3":
+            if not S3_BUCKET:
+                raise RuntimeError("VOICE_STORAGE_BACKEND=s3 needs S3_BUCKET")
+            _storage = S3Storage(S3_BUCKET, S3_PREFIX, cold_storage_class=S3_COLD_STORAGE_CLASS)
+        else:
+            _storage = LocalStorage({HOT_TIER: UPLOAD_DIR, COLD_TIER: COLD_STORAGE_DIR})
+    return _storage
+
+
+def resolve(reference: str) -> Tuple[object, str]:
+    """(backend, key) for a stored voice_file_path / original_file_path value."""
+    if is_storage_key(reference):
+        return get_storage(), reference
+    return legacy_files, reference
+
+
+############################# REFERENCE COUNTS ############################
+
+def _add_references(session: Session, deltas: Counter) -> None:
+    connection = session.connection()
+    dialect = connection.dialect.name
+    # Sorted, so concurrent flushes lock rows in the same order
+    for key in sorted(deltas):
+        delta = deltas[key]
+        if not delta:
+            continue
+        if dialect in ("sqlite", "postgresql"):
+            upsert = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(StoredFile).values(
+                key=key, ref_count=delta
+            )
+            connection.execute(upsert.on_conflict_do_update(
+                index_elements=[StoredFile.key],
+                set_={"ref_count": StoredFile.ref_count + delta, "updated_at": func.now()},
+            ))
+            continue
+        updated = connection.execute(
+            update(StoredFile)
+            .where(StoredFile.key == key)
+            .values(ref_count=StoredFile.ref_count + delta, updated_at=func.now())
+        )
+        if not updated.rowcount:
+            connection.execute(insert(StoredFile).values(key=key, ref_count=delta))
+
+
+@event.listens_for(Session, "before_flush")
+def _count_file_references(session, flush_context, instances):
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Message):
+            for column in _REFERENCE_COLUMNS:
+                value = getattr(obj, column)
+                if is_storage_key(value):
+                    deltas[value] += 1
+    for obj in session.dirty:
+        if isinstance(obj, Message):
+            attributes = inspect(obj).attrs
+            for column in _REFERENCE_COLUMNS:
+                history = attributes[column].history
+                for value in history.added:
+                    if is_storage_key(value):
+                        deltas[value] += 1
+                for value in history.deleted:
+                    if is_storage_key(value):
+                        deltas[value] -= 1
+    released = session.info.setdefault("released_files", set())
+    for obj in session.deleted:
+        if isinstance(obj, Message):
+            attributes = inspect(obj).attrs
+            for column in _REFERENCE_COLUMNS:
+                history = attributes[column].history
+                for value in (*history.unchanged, *history.deleted):
+                    if is_storage_key(value):
+                        deltas[value] -= 1
+                    elif value:
+                        # Legacy paths belong to exactly one message
+                        released.add(value)
+    released.update(key for key, delta in deltas.items() if delta < 0)
+    if deltas:
+        _add_references(session, deltas)
+
+
+def released_files(db) -> Set[str]:
+    """
+    Storage keys whose count went down and legacy paths of deleted messages,
+    flushed by this session since the last call. Take them inside the
+    write_queue.run callback, after its last flush (the writer session may
+    be shared by several callbacks), and return them from it; hand them to
+    file_gc.release_files only once write_queue.run has returned, i.e. the
+    write has committed.
+    """
+    return db.info.pop("released_files", set())
+
+
+async def delete_unreferenced(keys: Iterable[str], grace_seconds: int = STORE_GRACE_SECONDS) -> List[str]:
+    """
+    Delete the files of keys no message references any more.
+
+    Uploads store the file first and only then commit the row that counts a
+    reference to it, so that no storage I/O happens inside the (SQLite,
+    single writer) write transaction. A file stored within grace_seconds may
+    belong to such an upload of the same bytes and is left alone, with its
+    zero count, for file_gc.collect() to remove later. Each file is removed
+    while its stored_files row delete is still uncommitted, so an upload
+    that commits its reference meanwhile waits for the delete and keeps the
+    row from disappearing under it.
+
+    Returns:
+        The keys whose files were deleted
+    """
+    deleted = []
+    storage = get_storage()
+    async with AsyncSessionLocal() as db:
+        for key in keys:
+            result = await db.execute(
+                delete(StoredFile).where(StoredFile.key == key, StoredFile.ref_count <= 0)
+            )
+            if not result.rowcount:
+                await db.rollback()
+                continue
+            try:
+                stored = await storage.stat(key)
+                if stored is not None and stored.mtime > time.time() - grace_seconds:
+                    await db.rollback()
+                    continue
+                await storage.delete(key)
+            except Exception:
+                await db.rollback()
+                raise
+            await db.commit()
+            deleted.append(key)
+    return deleted
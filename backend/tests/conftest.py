@@ -0,0 +1,65 @@
+# backend/tests/conftest.py
+"""
+Run from backend/:
+    python -m pytest tests
+
+The app modules are imported from backend/, against a throwaway SQLite
+database and upload directory so onepercent.db is never touched.
+"""
+import os
+import sys
+import tempfile
+
+WORKDIR = tempfile.mkdtemp(prefix="onepercent-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORKDIR}/test.db")
+os.environ.setdefault("JOB_WORKER_IN_APP", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(WORKDIR)  # main.setup() creates the upload directories here
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import database  # noqa: E402
+import main  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def app_setup():
+    main.setup()
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def dispose_engines() -> None:
+    # Pooled connections belong to the event loop that opened them; each test has its own
+    await database.async_engine.dispose()
+    writer_engine = getattr(database, "writer_engine", None)  # SQLITE_PROFILE=production only
+    if writer_engine is not None:
+        await writer_engine.dispose()
+
+
+@pytest.fixture
+async def engines():
+    """For async tests that use the database without async_client."""
+    yield
+    await dispose_engines()
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+        client.portal.call(dispose_engines)
+
+
+@pytest.fixture
+async def async_client():
+    """For tests that send requests concurrently, on the test's own event loop."""
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        yield client
+    await dispose_engines()
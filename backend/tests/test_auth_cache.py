@@ -0,0 +1,73 @@
+# backend/tests/test_auth_cache.py
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import select
+
+import auth_cache
+from auth_cache import MemoryCache
+from database import AsyncSessionLocal
+from models import User
+
+
+def register(client) -> tuple:
+    email = f"auth-{uuid.uuid4().hex[:12]}@example.com"
+    response = client.post("/api/auth/register", json={"email": email, "password": "password1"})
+    return email, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def set_active(client, email: str, is_active: bool, commit: bool = True) -> None:
+    async def change():
+        async with AsyncSessionLocal() as db:
+            user = await db.scalar(select(User).where(User.email == email))
+            user.is_active = is_active
+            await db.flush()
+            if commit:
+                await db.commit()
+            else:
+                await db.rollback()
+        # Evictions are sent from a task once the commit has happened
+        await asyncio.gather(*auth_cache._pending)
+    client.portal.call(change)
+
+
+def test_memory_cache_expires_and_evicts_least_recent():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")
+    cache.set("c", 3, ttl=60)
+    cache.set("short", 4, ttl=0.01)
+    time.sleep(0.02)
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c"), cache.get("short")) == (None, None, 3, None)
+    cache.set("ignored", 5, ttl=0)
+    assert cache.get("ignored") is None
+
+
+def test_token_is_not_cached_past_its_expiry():
+    auth_cache.cache_token("expired-token", 1, expires_at=time.time() - 1)
+    auth_cache.cache_token("live-token", 2, expires_at=time.time() + 3600)
+
+    assert auth_cache.get_cached_user_id("expired-token") is None
+    assert auth_cache.get_cached_user_id("live-token") == 2
+
+
+def test_committed_deactivation_is_seen_on_the_next_request(client):
+    email, headers = register(client)
+    assert client.get("/api/auth/me", headers=headers).json()["is_active"] is True
+
+    set_active(client, email, False)
+
+    assert client.get("/api/auth/me", headers=headers).json()["is_active"] is False
+
+
+def test_rolled_back_change_keeps_the_cached_user(client):
+    email, headers = register(client)
+    me = client.get("/api/auth/me", headers=headers).json()
+
+    set_active(client, email, False, commit=False)
+
+    cached = client.portal.call(auth_cache.get_cached_user, me["id"])
+    assert cached is not None and cached.is_active
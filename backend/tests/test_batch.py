@@ -0,0 +1,84 @@
+# backend/tests/test_batch.py
+import uuid
+
+
+def register(client) -> dict:
+    response = client.post(
+        "/api/auth/register",
+        json={"email": f"batch-{uuid.uuid4().hex[:12]}@example.com", "password": "password1"},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def send(client, headers, *operations) -> list:
+    response = client.post("/api/messages/batch", json={"operations": list(operations)}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["results"]
+
+
+def create(key: str, content: str = "offline entry") -> dict:
+    return {"op": "create", "idempotency_key": key, "data": {"content": content, "message_type": "text"}}
+
+
+def listed(client, headers) -> list:
+    return client.get("/api/messages", headers=headers).json()
+
+
+def test_resent_batch_is_not_applied_twice(client):
+    headers = register(client)
+    operations = [create("a"), create("b")]
+
+    first = send(client, headers, *operations)
+    again = send(client, headers, *operations)
+
+    assert [result["status"] for result in first] == [201, 201]
+    assert [(result["id"], result["replayed"]) for result in again] == [
+        (result["id"], True) for result in first
+    ]
+    assert len(listed(client, headers)) == 2
+    assert client.get("/api/messages/stats", headers=headers).json()["total_messages"] == 2
+
+
+def test_repeated_key_inside_one_batch_applies_once(client):
+    headers = register(client)
+
+    results = send(client, headers, create("same"), create("same"))
+
+    assert results[0]["id"] == results[1]["id"]
+    assert results[1]["replayed"]
+    assert len(listed(client, headers)) == 1
+
+
+def test_failed_operations_do_not_abort_the_batch_and_can_be_retried(client):
+    headers = register(client)
+    other = register(client)
+    foreign = send(client, other, create("theirs"))[0]["id"]
+
+    results = send(
+        client, headers,
+        create("ok"),
+        {"op": "delete", "idempotency_key": "foreign", "id": foreign},
+        {"op": "create", "idempotency_key": "invalid", "data": {"message_type": "text"}},
+    )
+    retried = send(client, headers, create("invalid", "fixed"))
+
+    assert [result["status"] for result in results] == [201, 404, 422]
+    assert (retried[0]["status"], retried[0]["replayed"]) == (201, False)
+    assert len(listed(client, other)) == 1
+
+
+def test_updates_and_deletes_apply_in_order(client):
+    headers = register(client)
+    created = send(client, headers, create("c1"), create("c2"))
+    first, second = created[0]["id"], created[1]["id"]
+
+    results = send(
+        client, headers,
+        {"op": "update", "idempotency_key": "u1", "id": first, "data": {"content": "edited"}},
+        {"op": "delete", "idempotency_key": "d2", "id": second},
+        {"op": "update", "idempotency_key": "u2", "id": second, "data": {"content": "too late"}},
+    )
+
+    assert [result["status"] for result in results] == [200, 204, 404]
+    assert results[0]["message"]["content"] == "edited"
+    assert [message["id"] for message in listed(client, headers)] == [first]
@@ -0,0 +1,80 @@
+# backend/tests/test_export.py
+import csv
+import io
+import json
+import os
+import uuid
+import zipfile
+
+import export
+
+
+def register(client) -> dict:
+    response = client.post(
+        "/api/auth/register",
+        json={"email": f"export-{uuid.uuid4().hex[:12]}@example.com", "password": "password1"},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def create(client, headers, count: int) -> list:
+    return [
+        client.post("/api/messages", json={"content": f"entry {n}, \"quoted\"", "message_type": "text"}, headers=headers).json()["id"]
+        for n in range(count)
+    ]
+
+
+def ndjson(client, headers, **params) -> list:
+    response = client.get("/api/messages/export", params=params, headers=headers)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_ndjson_streams_every_message_across_batches(client, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+    headers = register(client)
+    ids = create(client, headers, 5)
+    create(client, register(client), 1)
+
+    rows = ndjson(client, headers)
+
+    assert [row["id"] for row in rows] == sorted(ids, reverse=True)
+
+
+def test_export_resumes_after_the_last_complete_row(client):
+    headers = register(client)
+    ids = create(client, headers, 4)
+    rows = ndjson(client, headers)
+
+    resumed = ndjson(client, headers, cursor=rows[1]["cursor"])
+
+    assert [row["id"] for row in resumed] == sorted(ids, reverse=True)[2:]
+
+
+def test_csv_has_a_header_and_quotes_values(client):
+    headers = register(client)
+    ids = create(client, headers, 2)
+
+    response = client.get("/api/messages/export", params={"format": "csv"}, headers=headers)
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+
+    assert [int(row["id"]) for row in rows] == sorted(ids, reverse=True)
+    assert rows[-1]["content"] == 'entry 0, "quoted"'
+
+
+def test_zip_holds_the_messages_and_voice_notes(client):
+    headers = register(client)
+    audio = os.urandom(1024)
+    voice = client.post(
+        "/api/messages/upload-voice",
+        files={"file": ("note.wav", audio, "audio/wav")},
+        headers=headers,
+    ).json()
+    create(client, headers, 1)
+
+    response = client.get("/api/messages/export", params={"format": "zip"}, headers=headers)
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+
+    lines = archive.read("messages.ndjson").decode().splitlines()
+    assert len(lines) == 2
+    assert archive.read(f"voice/{voice['id']}.wav") == audio
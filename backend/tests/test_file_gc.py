@@ -0,0 +1,143 @@
+# backend/tests/test_file_gc.py
+import base64
+import hashlib
+import os
+import time
+import uuid
+
+from sqlalchemy import delete, select, update
+
+import file_gc
+from database import AsyncSessionLocal
+from models import Message, StoredFile
+from storage import HOT_TIER, content_key, get_storage
+from uploads import PARTIAL_UPLOAD_DIR, UPLOAD_DIR
+
+
+def register(client) -> dict:
+    response = client.post(
+        "/api/auth/register",
+        json={"email": f"gc-{uuid.uuid4().hex[:12]}@example.com", "password": "password1"},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def upload(client, headers) -> dict:
+    return client.post(
+        "/api/messages/upload-voice",
+        files={"file": ("note.wav", os.urandom(2048), "audio/wav")},
+        headers=headers,
+    ).json()
+
+
+def stray_file() -> str:
+    """A stored file with no stored_files row and no message, as left by a crash."""
+    audio = os.urandom(2048)
+    key = content_key(HOT_TIER, hashlib.sha256(audio).hexdigest(), "wav")
+    path = get_storage().path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(audio)
+    return key
+
+
+def execute(client, statement):
+    async def run():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(statement)
+            await db.commit()
+            return result
+    return client.portal.call(run)
+
+
+def ref_count(client, key: str):
+    return execute(client, select(StoredFile.ref_count).where(StoredFile.key == key)).scalar()
+
+
+def collect(client, **options) -> dict:
+    async def run():
+        return await file_gc.collect(max_deletes_per_second=0, **options)
+    return client.portal.call(run)
+
+
+def test_unreferenced_and_stray_files_are_deleted(client):
+    headers = register(client)
+    released = upload(client, headers)
+    kept = upload(client, headers)
+    client.delete(f"/api/messages/{released['id']}", headers=headers)
+    stray = stray_file()
+    storage = get_storage()
+    # Stored long enough ago that no upload of the same bytes can still be pending
+    an_hour_ago = time.time() - 3600
+    os.utime(storage.path(released["voice_file_path"]), (an_hour_ago, an_hour_ago))
+
+    report = collect(client, grace_seconds=0)
+
+    assert not storage.path(released["voice_file_path"]).exists()
+    assert ref_count(client, released["voice_file_path"]) is None
+    assert not storage.path(stray).exists()
+    assert storage.path(kept["voice_file_path"]).exists()
+    assert ref_count(client, kept["voice_file_path"]) == 1
+    assert report["files_deleted"] >= 2 and not report["dry_run"]
+
+
+def test_missing_count_is_repaired_not_deleted(client):
+    headers = register(client)
+    key = upload(client, headers)["voice_file_path"]
+    execute(client, delete(StoredFile).where(StoredFile.key == key))
+
+    report = collect(client, grace_seconds=0)
+
+    assert get_storage().path(key).exists()
+    assert ref_count(client, key) == 1
+    assert report["counts_repaired"] >= 1
+
+
+def test_recent_files_and_dry_runs_keep_everything(client):
+    stray = stray_file()
+    leftover = PARTIAL_UPLOAD_DIR / f"{uuid.uuid4()}.wav"
+    leftover.write_bytes(b"x" * 10)
+
+    within_grace = collect(client, grace_seconds=3600)
+    dry_run = collect(client, grace_seconds=0, dry_run=True)
+
+    assert get_storage().path(stray).exists() and leftover.exists()
+    assert dry_run["dry_run"] and dry_run["files_deleted"] >= 2
+    collect(client, grace_seconds=0)
+    assert not get_storage().path(stray).exists() and not leftover.exists()
+
+
+def test_partial_files_of_live_resumable_uploads_are_kept(client):
+    headers = register(client)
+    filename = base64.b64encode(b"note.wav").decode()
+    location = client.post(
+        "/api/uploads/voice",
+        headers={**headers, "Upload-Length": "100", "Upload-Metadata": f"filename {filename}"},
+    ).headers["Location"]
+    client.patch(
+        location,
+        content=b"x" * 10,
+        headers={**headers, "Content-Type": "application/offset+octet-stream", "Upload-Offset": "0"},
+    )
+    part = PARTIAL_UPLOAD_DIR / f"{location.rsplit('/', 1)[-1]}.part"
+    orphan = PARTIAL_UPLOAD_DIR / f"{uuid.uuid4().hex}.part"
+    orphan.write_bytes(b"x" * 10)
+
+    collect(client, grace_seconds=0)
+
+    assert part.exists()
+    assert not orphan.exists()
+
+
+def test_legacy_files_are_kept_only_while_a_message_uses_them(client):
+    headers = register(client)
+    message = client.post("/api/messages", json={"content": "old", "message_type": "text"}, headers=headers).json()
+    referenced = UPLOAD_DIR / f"legacy-{uuid.uuid4().hex}.wav"
+    unreferenced = UPLOAD_DIR / f"legacy-{uuid.uuid4().hex}.wav"
+    for path in (referenced, unreferenced):
+        path.write_bytes(b"x" * 10)
+    execute(client, update(Message).where(Message.id == message["id"]).values(voice_file_path=str(referenced)))
+
+    collect(client, grace_seconds=0)
+
+    assert referenced.exists()
+    assert not unreferenced.exists()
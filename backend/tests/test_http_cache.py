@@ -0,0 +1,92 @@
+# backend/tests/test_http_cache.py
+import uuid
+
+
+def register(client) -> dict:
+    response = client.post(
+        "/api/auth/register",
+        json={"email": f"cache-{uuid.uuid4().hex[:12]}@example.com", "password": "password1"},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def create(client, headers, content: str = "entry") -> dict:
+    return client.post("/api/messages", json={"content": content, "message_type": "text"}, headers=headers).json()
+
+
+def test_unchanged_list_revalidates_to_304(client):
+    headers = register(client)
+    create(client, headers)
+    first = client.get("/api/messages", headers=headers)
+    etag = first.headers["ETag"]
+
+    again = client.get("/api/messages", headers={**headers, "If-None-Match": etag})
+
+    assert etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    assert (again.status_code, again.content) == (304, b"")
+    assert again.headers["ETag"] == etag
+
+
+def test_writes_and_query_change_the_list_etag(client):
+    headers = register(client)
+    create(client, headers)
+    etag = client.get("/api/messages", headers=headers).headers["ETag"]
+    paged = client.get("/api/messages", params={"limit": 1}, headers=headers).headers["ETag"]
+
+    create(client, headers)
+    after_write = client.get("/api/messages", headers={**headers, "If-None-Match": etag})
+
+    assert paged != etag
+    assert after_write.status_code == 200
+    assert after_write.headers["ETag"] != etag
+    assert len(after_write.json()) == 2
+
+
+def test_etag_is_per_user(client):
+    headers = register(client)
+    other = register(client)
+    etag = client.get("/api/messages", headers=headers).headers["ETag"]
+
+    response = client.get("/api/messages", headers={**other, "If-None-Match": etag})
+
+    assert response.status_code == 200
+
+
+def test_message_and_stats_etags_follow_updates(client):
+    headers = register(client)
+    message = create(client, headers)
+    url = f"/api/messages/{message['id']}"
+    message_etag = client.get(url, headers=headers).headers["ETag"]
+    stats_etag = client.get("/api/messages/stats", headers=headers).headers["ETag"]
+    assert client.get(url, headers={**headers, "If-None-Match": message_etag}).status_code == 304
+    assert client.get("/api/messages/stats", headers={**headers, "If-None-Match": stats_etag}).status_code == 304
+
+    client.put(url, json={"content": "edited"}, headers=headers)
+
+    assert client.get(url, headers={**headers, "If-None-Match": message_etag}).status_code == 200
+    assert client.get("/api/messages/stats", headers={**headers, "If-None-Match": stats_etag}).status_code == 200
+
+
+def test_large_responses_are_compressed_by_preference(client):
+    headers = register(client)
+    for n in range(20):
+        create(client, headers, f"a longer journal entry number {n} " * 4)
+
+    brotli = client.get("/api/messages", headers={**headers, "Accept-Encoding": "gzip, br"})
+    gzip = client.get("/api/messages", headers={**headers, "Accept-Encoding": "gzip"})
+    identity = client.get("/api/messages", headers={**headers, "Accept-Encoding": "identity"})
+
+    assert brotli.headers["Content-Encoding"] == "br"
+    assert gzip.headers["Content-Encoding"] == "gzip"
+    assert "Content-Encoding" not in identity.headers
+    assert brotli.json() == gzip.json() == identity.json()
+    assert "Accept-Encoding" in brotli.headers["Vary"]
+
+
+def test_small_responses_are_sent_as_is(client):
+    headers = register(client)
+
+    response = client.get("/api/auth/me", headers={**headers, "Accept-Encoding": "br, gzip"})
+
+    assert "Content-Encoding" not in response.headers
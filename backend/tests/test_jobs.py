@@ -0,0 +1,109 @@
+# backend/tests/test_jobs.py
+from datetime import datetime, timedelta, timezone
+
+import anyio
+import pytest
+from sqlalchemy import select
+
+import jobs
+from database import AsyncSessionLocal
+from models import Job, JobStatus
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("engines")]
+
+calls = []
+failures = []
+
+
+@jobs.job("test_sleep", concurrency=2)
+async def sleep_job(n: int, seconds: float) -> None:
+    calls.append(("sleep", n))
+    await anyio.sleep(seconds)
+
+
+@jobs.job("test_flaky", max_attempts=3, on_failure=lambda n: _record_failure("flaky", n))
+async def flaky_job(n: int) -> None:
+    calls.append(("flaky", n))
+    raise RuntimeError("boom")
+
+
+@jobs.job("test_crash", max_attempts=2, on_failure=lambda n: _record_failure("crash", n))
+async def crash_job(n: int) -> None:
+    pass
+
+
+async def _record_failure(kind: str, n: int) -> None:
+    failures.append((kind, n))
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    calls.clear()
+    failures.clear()
+
+
+async def add_job(kind: str, **values) -> int:
+    async with AsyncSessionLocal() as db:
+        queued = jobs.enqueue(db, kind, **values.pop("payload"))
+        for name, value in values.items():
+            setattr(queued, name, value)
+        await db.commit()
+        return queued.id
+
+
+async def load(job_id: int):
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(Job).where(Job.id == job_id))
+
+
+async def drain(kind: str, **options) -> None:
+    worker = jobs.Worker(kinds=[kind], poll_seconds=0.05, **options)
+    try:
+        with anyio.fail_after(20):
+            await worker.run(drain=True)
+    finally:
+        await worker.close()
+
+
+async def test_failing_job_is_retried_then_failed(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_RETRY_BASE_SECONDS", 0.01)
+    job_id = await add_job("test_flaky", payload={"n": 1})
+
+    await drain("test_flaky")
+
+    assert calls == [("flaky", 1)] * 3
+    assert failures == [("flaky", 1)]
+    job = await load(job_id)
+    assert (job.status, job.attempts) == (JobStatus.FAILED, 3)
+    assert "boom" in job.last_error
+
+
+async def test_lost_job_is_requeued_until_its_last_attempt():
+    expired = datetime.now(timezone.utc) - timedelta(hours=1)
+    retry_id = await add_job(
+        "test_crash", payload={"n": 1}, status=JobStatus.RUNNING, attempts=1, locked_by="gone", locked_at=expired,
+    )
+    last_id = await add_job(
+        "test_crash", payload={"n": 2}, status=JobStatus.RUNNING, attempts=2, locked_by="gone", locked_at=expired,
+    )
+
+    assert await jobs.requeue_lost_jobs(lease_seconds=60) == 2
+
+    retried, last = await load(retry_id), await load(last_id)
+    assert (retried.status, retried.locked_by) == (JobStatus.QUEUED, None)
+    assert last.status == JobStatus.FAILED
+    assert last.last_error == "Worker lost while running the job"
+    assert failures == [("crash", 2)]
+    await drain("test_crash")
+    assert await load(retry_id) is None  # ran and finished
+
+
+async def test_running_job_keeps_its_lease():
+    job_id = await add_job("test_sleep", payload={"n": 1, "seconds": 1.5})
+
+    # Without the lease being renewed, the job would be requeued after 0.4s
+    # and claimed a second time by the worker's free slot
+    await drain("test_sleep", lease_seconds=0.4)
+
+    assert calls == [("sleep", 1)]
+    assert await load(job_id) is None
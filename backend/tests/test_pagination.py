@@ -0,0 +1,86 @@
+# backend/tests/test_pagination.py
+import uuid
+from datetime import datetime, timezone
+
+from pagination import decode_cursor, encode_cursor
+
+
+def register(client) -> dict:
+    response = client.post(
+        "/api/auth/register",
+        json={"email": f"page-{uuid.uuid4().hex[:12]}@example.com", "password": "password1"},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def create(client, headers, count: int) -> list:
+    # Created within the same second, so pages break inside equal created_at values
+    return [
+        client.post("/api/messages", json={"content": f"entry {n}", "message_type": "text"}, headers=headers).json()["id"]
+        for n in range(count)
+    ]
+
+
+def all_pages(client, headers, limit: int) -> list:
+    ids, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/messages", params=params, headers=headers).json()
+        ids += [message["id"] for message in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_pages_cover_every_message_once_newest_first(client):
+    headers = register(client)
+    ids = create(client, headers, 7)
+
+    assert all_pages(client, headers, limit=3) == sorted(ids, reverse=True)
+
+
+def test_deleting_the_anchor_does_not_break_paging(client):
+    headers = register(client)
+    ids = create(client, headers, 5)
+    first = client.get("/api/messages", params={"limit": 2}, headers=headers).json()
+    client.delete(f"/api/messages/{first['items'][-1]['id']}", headers=headers)
+
+    rest = client.get("/api/messages", params={"limit": 10, "cursor": first["next_cursor"]}, headers=headers).json()
+
+    assert [message["id"] for message in rest["items"]] == sorted(ids, reverse=True)[2:]
+
+
+def test_cursor_on_another_users_message_is_rejected(client):
+    other = register(client)
+    foreign_id = create(client, other, 1)[0]
+    headers = register(client)
+    create(client, headers, 2)
+    cursor = encode_cursor(datetime.now(timezone.utc), foreign_id)
+
+    listed = client.get("/api/messages", params={"limit": 10, "cursor": cursor}, headers=headers)
+    exported = client.get("/api/messages/export", params={"cursor": cursor}, headers=headers)
+
+    assert (listed.status_code, listed.json()["detail"]) == (400, "Invalid cursor")
+    assert exported.status_code == 400
+
+
+def test_cursor_on_an_unknown_message_uses_its_timestamp(client):
+    headers = register(client)
+    ids = create(client, headers, 3)
+    newest = client.get("/api/messages", params={"limit": 1}, headers=headers).json()
+    created_at, _ = decode_cursor(newest["next_cursor"])
+
+    before_all = encode_cursor(datetime(2000, 1, 1), 10 ** 9)
+    after_all = encode_cursor(created_at.replace(year=created_at.year + 1), 10 ** 9)
+
+    assert client.get("/api/messages", params={"limit": 10, "cursor": before_all}, headers=headers).json()["items"] == []
+    page = client.get("/api/messages", params={"limit": 10, "cursor": after_all}, headers=headers).json()
+    assert [message["id"] for message in page["items"]] == sorted(ids, reverse=True)
+
+
+def test_malformed_cursor_is_rejected(client):
+    headers = register(client)
+
+    response = client.get("/api/messages", params={"cursor": "not-a-cursor"}, headers=headers)
+
+    assert response.status_code == 400
@@ -0,0 +1,54 @@
+# backend/tests/test_replicas.py
+import os
+import uuid
+
+import anyio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import replicas
+from auth_cache import AsyncMemoryCache
+from database import Base
+
+pytestmark = pytest.mark.anyio
+
+
+class SlowPins(AsyncMemoryCache):
+    """Stores pins after a delay, like a Redis round trip under load."""
+
+    async def set(self, key, value, ttl: float) -> None:
+        await anyio.sleep(0.2)
+        await super().set(key, value, ttl)
+
+
+@pytest.fixture
+async def empty_replica(monkeypatch):
+    # A replica that has not caught up with anything
+    path = os.path.join(os.getcwd(), f"replica-{uuid.uuid4().hex[:8]}.db")
+    Base.metadata.create_all(create_engine(f"sqlite:///{path}"))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    replica = replicas.Replica(
+        name="replica0",
+        sessionmaker=async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False),
+    )
+    monkeypatch.setattr(replicas, "replica_set", replicas.ReplicaSet([replica]))
+    monkeypatch.setattr(replicas, "pins", SlowPins())
+    yield replica
+    await engine.dispose()
+
+
+async def test_read_right_after_a_write_uses_the_primary(async_client, empty_replica):
+    response = await async_client.post(
+        "/api/auth/register",
+        json={"email": f"pin-{uuid.uuid4().hex[:12]}@example.com", "password": "password1"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    created = await async_client.post(
+        "/api/messages", json={"content": "just written", "message_type": "text"}, headers=headers,
+    )
+
+    listed = await async_client.get("/api/messages", headers=headers)
+
+    assert created.status_code == 201
+    assert [message["id"] for message in listed.json()] == [created.json()["id"]]
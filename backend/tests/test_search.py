@@ -0,0 +1,82 @@
+# backend/tests/test_search.py
+import uuid
+from datetime import datetime, timedelta, timezone
+
+
+def register(client) -> dict:
+    response = client.post(
+        "/api/auth/register",
+        json={"email": f"search-{uuid.uuid4().hex[:12]}@example.com", "password": "password1"},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def create(client, headers, content: str, title: str = "entry") -> dict:
+    body = {"title": title, "content": content, "message_type": "text"}
+    return client.post("/api/messages", json=body, headers=headers).json()
+
+
+def search(client, headers, **params):
+    return client.get("/api/messages/search", params=params, headers=headers)
+
+
+def test_only_the_callers_messages_match(client):
+    other = register(client)
+    create(client, other, "meditation before work")
+    headers = register(client)
+    mine = create(client, headers, "meditation after work")
+
+    page = search(client, headers, q="medit").json()
+
+    assert [message["id"] for message in page["items"]] == [mine["id"]]
+
+
+def test_cursor_pages_through_equal_scores_without_repeats(client):
+    headers = register(client)
+    ids = [create(client, headers, "gratitude journal")["id"] for _ in range(5)]
+    create(client, headers, "something else")
+
+    seen, cursor = [], None
+    while True:
+        params = {"q": "gratitude", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = search(client, headers, **params).json()
+        seen += [message["id"] for message in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_title_hits_rank_first(client):
+    headers = register(client)
+    in_content = create(client, headers, "an evening walk", title="notes")
+    in_title = create(client, headers, "notes", title="evening walk")
+
+    page = search(client, headers, q="walk").json()
+
+    assert [message["id"] for message in page["items"]] == [in_title["id"], in_content["id"]]
+
+
+def test_dates_are_compared_in_utc(client):
+    headers = register(client)
+    message = create(client, headers, "running log")
+    created_at = datetime.fromisoformat(message["created_at"]).replace(tzinfo=timezone.utc)
+    plus_five = timezone(timedelta(hours=5))
+
+    def hits(**params):
+        return [m["id"] for m in search(client, headers, q="running", **params).json()["items"]]
+
+    # The exact stored second is inside both bounds
+    assert hits(date_from=created_at.isoformat(), date_to=created_at.isoformat()) == [message["id"]]
+    # Same instants written in another offset
+    assert hits(date_from=created_at.astimezone(plus_five).isoformat()) == [message["id"]]
+    assert hits(date_to=(created_at - timedelta(seconds=1)).astimezone(plus_five).isoformat()) == []
+
+
+def test_malformed_cursor_is_rejected(client):
+    headers = register(client)
+
+    response = search(client, headers, q="anything", cursor="12")
+
+    assert (response.status_code, response.json()["detail"]) == (400, "Invalid cursor")
@@ -0,0 +1,31 @@
+# backend/tests/test_security.py
+import asyncio
+import os
+import signal
+
+import pytest
+
+import security
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_hash_pool_is_replaced_after_a_worker_dies():
+    first = await security.get_password_hash_async("password1")
+    pool = security._hash_pool
+    for process in list(pool._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+    for _ in range(100):
+        if pool._broken:
+            break
+        await asyncio.sleep(0.05)
+    assert pool._broken
+
+    second = await security.get_password_hash_async("password1")
+
+    assert security.verify_password("password1", first)
+    assert security.verify_password("password1", second)
+    assert security._hash_pool is not pool
+    matches, _ = await security.verify_password_async("password1", second)
+    assert matches
+    security.shutdown_hash_pool()
@@ -0,0 +1,48 @@
+# backend/tests/test_serialization.py
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+import serialization
+from schemas import MessageResponse
+
+ROW = {
+    "title": "Morning",
+    "content": "Ran 5 km – felt great",
+    "message_type": "text",
+    "focus_area": "health",
+    "id": 7,
+    "user_id": 3,
+    "created_at": datetime(2026, 10, 18, 7, 30, 12, 345678, tzinfo=timezone.utc),
+    "updated_at": datetime(2026, 10, 18, 9, 0, tzinfo=timezone(timedelta(hours=2))),
+    "voice_file_path": None,
+    "processing_status": None,
+    "duration_seconds": 12.5,
+    "bitrate": None,
+    "size_bytes": None,
+}
+
+
+def response_model_body(rows) -> bytes:
+    # What FastAPI sends for response_model=List[MessageResponse]
+    content = TypeAdapter(List[MessageResponse]).dump_python(
+        TypeAdapter(List[MessageResponse]).validate_python(rows), mode="json"
+    )
+    return JSONResponse(content).body
+
+
+@pytest.mark.parametrize("encoder", ["orjson", "pydantic-core"])
+def test_fast_path_matches_response_model_for_aware_datetimes(monkeypatch, encoder):
+    if encoder == "orjson" and serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    if encoder == "pydantic-core":
+        monkeypatch.setattr(serialization, "orjson", None)
+    row = tuple(ROW[name] for name in serialization.MESSAGE_FIELDS)
+
+    body = serialization.dumps(serialization.message_rows([row]))
+
+    assert body == response_model_body([ROW])
+    assert b'"created_at":"2026-10-18T07:30:12.345678Z"' in body
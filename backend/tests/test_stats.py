@@ -0,0 +1,120 @@
+# backend/tests/test_stats.py
+import uuid
+
+import anyio
+import pytest
+
+import stats
+from database import AsyncSessionLocal
+from models import MessageStats
+
+pytestmark = pytest.mark.anyio
+
+ROLLUP_COLUMNS = ("total_messages", "text_messages", "voice_messages", "focus_area_counts", "day_counts")
+
+
+async def register(client) -> dict:
+    response = await client.post(
+        "/api/auth/register",
+        json={"email": f"stats-{uuid.uuid4().hex[:12]}@example.com", "password": "password1"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    user = (await client.get("/api/auth/me", headers=headers)).json()
+    return {"headers": headers, "id": user["id"]}
+
+
+async def gather(*calls):
+    results = [None] * len(calls)
+
+    async def run(index, call):
+        results[index] = await call()
+
+    async with anyio.create_task_group() as tasks:
+        for index, call in enumerate(calls):
+            tasks.start_soon(run, index, call)
+    return results
+
+
+def create(client, headers, n: int):
+    focus_area = ("health", "work", None)[n % 3]
+    return lambda: client.post(
+        "/api/messages",
+        json={"content": f"entry {n}", "message_type": "text", "focus_area": focus_area},
+        headers=headers,
+    )
+
+
+def delete(client, headers, message_id: int):
+    return lambda: client.delete(f"/api/messages/{message_id}", headers=headers)
+
+
+async def stored_and_rebuilt(user_id: int):
+    async with AsyncSessionLocal() as db:
+        stored = await db.get(MessageStats, user_id)
+        stored = {name: getattr(stored, name) for name in ROLLUP_COLUMNS}
+        rebuilt = await stats.rebuild_stats(db, user_id)
+        rebuilt = {name: getattr(rebuilt, name) for name in ROLLUP_COLUMNS}
+        await db.rollback()
+    return stored, rebuilt
+
+
+async def test_concurrent_first_writes_share_one_rollup(async_client):
+    user = await register(async_client)
+
+    responses = await gather(*(create(async_client, user["headers"], n) for n in range(40)))
+
+    assert [response.status_code for response in responses] == [201] * 40
+    stored, rebuilt = await stored_and_rebuilt(user["id"])
+    assert stored == rebuilt
+    assert stored["total_messages"] == 40
+
+
+async def test_rollup_matches_rebuild_after_concurrent_creates_and_deletes(async_client):
+    user = await register(async_client)
+    headers = user["headers"]
+    created = await gather(*(create(async_client, headers, n) for n in range(30)))
+    ids = [response.json()["id"] for response in created]
+
+    responses = await gather(
+        *(delete(async_client, headers, message_id) for message_id in ids[:20]),
+        *(create(async_client, headers, n) for n in range(30, 50)),
+    )
+
+    assert sorted({response.status_code for response in responses}) == [201, 204]
+    stored, rebuilt = await stored_and_rebuilt(user["id"])
+    assert stored == rebuilt
+    assert stored["total_messages"] == 30
+
+
+async def test_counts_that_reach_zero_are_dropped(async_client):
+    user = await register(async_client)
+    headers = user["headers"]
+    message = (await async_client.post(
+        "/api/messages", json={"content": "once", "message_type": "text", "focus_area": 'say "hi"'}, headers=headers,
+    )).json()
+    assert (await async_client.get("/api/messages/stats", headers=headers)).json()["focus_areas"] == {'say "hi"': 1}
+
+    await async_client.delete(f"/api/messages/{message['id']}", headers=headers)
+
+    body = (await async_client.get("/api/messages/stats", headers=headers)).json()
+    assert body["total_messages"] == 0
+    assert body["focus_areas"] == {}
+    stored, _ = await stored_and_rebuilt(user["id"])
+    assert stored["day_counts"] == {}
+
+
+async def test_batch_for_a_user_without_rollup_counts_once(async_client):
+    user = await register(async_client)
+    operations = [
+        {"op": "create", "idempotency_key": f"k{n}", "data": {"content": f"b{n}", "message_type": "text"}}
+        for n in range(5)
+    ]
+
+    response = await async_client.post(
+        "/api/messages/batch", json={"operations": operations}, headers=user["headers"],
+    )
+
+    assert response.status_code == 200
+    stored, rebuilt = await stored_and_rebuilt(user["id"])
+    assert stored == rebuilt
+    assert stored["total_messages"] == 5
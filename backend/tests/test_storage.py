@@ -0,0 +1,75 @@
+# backend/tests/test_storage.py
+import hashlib
+import os
+import uuid
+
+from sqlalchemy import select
+
+from database import AsyncSessionLocal
+from models import StoredFile
+from storage import HOT_TIER, content_key, delete_unreferenced, get_storage
+
+
+def register(client) -> dict:
+    response = client.post(
+        "/api/auth/register",
+        json={"email": f"storage-{uuid.uuid4().hex[:12]}@example.com", "password": "password1"},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def upload(client, headers, audio: bytes) -> dict:
+    return client.post(
+        "/api/messages/upload-voice",
+        files={"file": ("note.wav", audio, "audio/wav")},
+        headers=headers,
+    ).json()
+
+
+def ref_count(client, key: str):
+    async def read():
+        async with AsyncSessionLocal() as db:
+            return await db.scalar(select(StoredFile.ref_count).where(StoredFile.key == key))
+    return client.portal.call(read)
+
+
+def test_identical_uploads_share_one_counted_file(client):
+    audio = os.urandom(2048)
+    first = upload(client, register(client), audio)
+    second = upload(client, register(client), audio)
+    other = upload(client, register(client), os.urandom(2048))
+
+    key = content_key(HOT_TIER, hashlib.sha256(audio).hexdigest(), "wav")
+    assert first["voice_file_path"] == second["voice_file_path"] == key
+    assert other["voice_file_path"] != key
+    assert ref_count(client, key) == 2
+    assert get_storage().path(key).read_bytes() == audio
+
+
+def test_file_outlives_all_but_the_last_reference(client):
+    audio = os.urandom(2048)
+    headers = register(client)
+    first, second = upload(client, headers, audio), upload(client, headers, audio)
+    key = first["voice_file_path"]
+
+    client.delete(f"/api/messages/{first['id']}", headers=headers)
+    assert ref_count(client, key) == 1
+    assert get_storage().path(key).exists()
+
+    client.delete(f"/api/messages/{second['id']}", headers=headers)
+    # Stored moments ago, so the release leaves it to the grace period
+    assert ref_count(client, key) == 0
+    assert get_storage().path(key).exists()
+
+    assert client.portal.call(delete_unreferenced, [key], 0) == [key]
+    assert ref_count(client, key) is None
+    assert not get_storage().path(key).exists()
+
+
+def test_referenced_files_are_never_deleted(client):
+    headers = register(client)
+    key = upload(client, headers, os.urandom(2048))["voice_file_path"]
+
+    assert client.portal.call(delete_unreferenced, [key], 0) == []
+    assert ref_count(client, key) == 1
+    assert get_storage().path(key).exists()
@@ -0,0 +1,72 @@
+# backend/tests/test_sync.py
+import uuid
+
+import anyio
+import pytest
+from sqlalchemy import select
+
+from database import AsyncSessionLocal
+from models import Message
+
+pytestmark = pytest.mark.anyio
+
+
+async def register(client) -> dict:
+    response = await client.post(
+        "/api/auth/register",
+        json={"email": f"sync-{uuid.uuid4().hex[:12]}@example.com", "password": "password1"},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def create_many(client, headers, count: int) -> list:
+    responses = []
+
+    async def create(n):
+        responses.append(await client.post(
+            "/api/messages", json={"content": f"entry {n}", "message_type": "text"}, headers=headers,
+        ))
+
+    async with anyio.create_task_group() as tasks:
+        for n in range(count):
+            tasks.start_soon(create, n)
+    return responses
+
+
+async def test_concurrent_first_writes_get_distinct_versions(async_client):
+    headers = await register(async_client)
+
+    responses = await create_many(async_client, headers, 30)
+
+    assert [response.status_code for response in responses] == [201] * 30
+    ids = [response.json()["id"] for response in responses]
+    async with AsyncSessionLocal() as db:
+        seqs = (await db.scalars(select(Message.change_seq).where(Message.id.in_(ids)))).all()
+    assert sorted(seqs) == list(range(1, 31))
+    changes = (await async_client.get("/api/messages/changes", headers=headers)).json()
+    assert changes["next_token"] == "30"
+    assert sorted(message["id"] for message in changes["messages"]) == sorted(ids)
+
+
+async def test_deletes_after_a_token_come_back_as_tombstones(async_client):
+    headers = await register(async_client)
+    ids = [response.json()["id"] for response in await create_many(async_client, headers, 3)]
+    token = (await async_client.get("/api/messages/changes", headers=headers)).json()["next_token"]
+
+    await async_client.delete(f"/api/messages/{ids[0]}", headers=headers)
+    await async_client.put(f"/api/messages/{ids[1]}", json={"content": "edited"}, headers=headers)
+    changes = (await async_client.get("/api/messages/changes", params={"since": token}, headers=headers)).json()
+
+    assert changes["deleted"] == [ids[0]]
+    assert [(message["id"], message["content"]) for message in changes["messages"]] == [(ids[1], "edited")]
+    assert changes["has_more"] is False
+    again = await async_client.get("/api/messages/changes", params={"since": changes["next_token"]}, headers=headers)
+    assert again.json()["messages"] == [] and again.json()["deleted"] == []
+
+
+async def test_token_ahead_of_the_counter_is_gone(async_client):
+    headers = await register(async_client)
+
+    response = await async_client.get("/api/messages/changes", params={"since": "999"}, headers=headers)
+
+    assert response.status_code == 410
@@ -0,0 +1,32 @@
+# backend/tests/test_uploads.py
+import base64
+
+
+def auth_headers(client, email: str) -> dict:
+    response = client.post("/api/auth/register", json={"email": email, "password": "password1"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_chunk_past_upload_length_is_rejected(client):
+    headers = auth_headers(client, "tus-overflow@example.com")
+    filename = base64.b64encode(b"note.wav").decode()
+    created = client.post(
+        "/api/uploads/voice",
+        headers={**headers, "Upload-Length": "10", "Upload-Metadata": f"filename {filename}"},
+    )
+    assert created.status_code == 201
+    location = created.headers["Location"]
+
+    response = client.patch(
+        location,
+        content=b"x" * 11,
+        headers={
+            **headers,
+            "Content-Type": "application/offset+octet-stream",
+            "Upload-Offset": "0",
+        },
+    )
+
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Upload exceeded its declared Upload-Length of 10 bytes"
+    assert client.head(location, headers=headers).headers["Upload-Offset"] == "0"
@@ -0,0 +1,81 @@
+# backend/tests/test_voice_playback.py
+import os
+import uuid
+
+import pytest
+
+AUDIO = os.urandom(4096)
+
+
+@pytest.fixture
+def voice(client):
+    response = client.post(
+        "/api/auth/register",
+        json={"email": f"voice-{uuid.uuid4().hex[:12]}@example.com", "password": "password1"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    message = client.post(
+        "/api/messages/upload-voice",
+        files={"file": ("note.wav", AUDIO, "audio/wav")},
+        data={"title": "note"},
+        headers=headers,
+    ).json()
+    return f"/api/messages/{message['id']}/voice", headers
+
+
+def test_full_file_has_a_strong_etag(client, voice):
+    url, headers = voice
+
+    response = client.get(url, headers=headers)
+
+    assert response.status_code == 200
+    assert response.content == AUDIO
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.headers["ETag"].startswith('"')
+
+
+def test_range_returns_only_those_bytes(client, voice):
+    url, headers = voice
+
+    middle = client.get(url, headers={**headers, "Range": "bytes=100-199"})
+    suffix = client.get(url, headers={**headers, "Range": "bytes=-10"})
+    open_ended = client.get(url, headers={**headers, "Range": "bytes=4000-"})
+
+    assert middle.status_code == 206
+    assert middle.content == AUDIO[100:200]
+    assert middle.headers["Content-Range"] == f"bytes 100-199/{len(AUDIO)}"
+    assert suffix.content == AUDIO[-10:]
+    assert open_ended.content == AUDIO[4000:]
+
+
+def test_range_past_the_end_is_416(client, voice):
+    url, headers = voice
+
+    response = client.get(url, headers={**headers, "Range": f"bytes={len(AUDIO)}-"})
+
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(AUDIO)}"
+
+
+def test_conditional_requests(client, voice):
+    url, headers = voice
+    first = client.get(url, headers=headers)
+    etag = first.headers["ETag"]
+
+    not_modified = client.get(url, headers={**headers, "If-None-Match": etag})
+    since = client.get(url, headers={**headers, "If-Modified-Since": first.headers["Last-Modified"]})
+    stale_range = client.get(url, headers={**headers, "Range": "bytes=0-9", "If-Range": '"stale"'})
+    current_range = client.get(url, headers={**headers, "Range": "bytes=0-9", "If-Range": etag})
+
+    assert (not_modified.status_code, not_modified.content) == (304, b"")
+    assert since.status_code == 304
+    assert (stale_range.status_code, stale_range.content) == (200, AUDIO)
+    assert (current_range.status_code, current_range.content) == (206, AUDIO[:10])
+
+
+def test_audio_is_not_recompressed(client, voice):
+    url, headers = voice
+
+    response = client.get(url, headers={**headers, "Accept-Encoding": "br, gzip"})
+
+    assert "Content-Encoding" not in response.headers
@@ -0,0 +1,125 @@
+# backend/tests/test_write_queue.py
+import uuid
+
+import anyio
+import pytest
+from sqlalchemy import select
+
+from database import AsyncSessionLocal
+from models import User
+from write_queue import WriteQueue
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("engines")]
+
+
+class CountingSessions:
+    """Session factory that counts the sessions (and so groups) it opens."""
+
+    def __init__(self):
+        self.opened = 0
+
+    def __call__(self):
+        self.opened += 1
+        return AsyncSessionLocal()
+
+
+def add_user(email: str, fail: bool = False):
+    async def work(db):
+        db.add(User(email=email, hashed_password="x"))
+        await db.flush()
+        if fail:
+            raise ValueError(email)
+        return email
+    return work
+
+
+async def stored(emails) -> set:
+    async with AsyncSessionLocal() as db:
+        return set(await db.scalars(select(User.email).where(User.email.in_(emails))))
+
+
+async def run_all(queue: WriteQueue, works) -> list:
+    outcomes = [None] * len(works)
+
+    async def one(index, work):
+        async with AsyncSessionLocal() as db:
+            try:
+                outcomes[index] = await queue.run(db, work)
+            except ValueError as e:
+                outcomes[index] = e
+
+    async with anyio.create_task_group() as group:
+        for index, work in enumerate(works):
+            group.start_soon(one, index, work)
+    await queue.close()
+    return outcomes
+
+
+def emails(count: int) -> list:
+    prefix = uuid.uuid4().hex[:8]
+    return [f"queue-{prefix}-{n}@example.com" for n in range(count)]
+
+
+async def test_concurrent_writes_commit_as_one_group():
+    sessions = CountingSessions()
+    queue = WriteQueue(sessions, batch_size=64, window_seconds=0.05)
+    addresses = emails(10)
+
+    outcomes = await run_all(queue, [add_user(email) for email in addresses])
+
+    assert outcomes == addresses
+    assert sessions.opened == 1
+    assert await stored(addresses) == set(addresses)
+
+
+async def test_groups_are_capped_at_batch_size():
+    sessions = CountingSessions()
+    queue = WriteQueue(sessions, batch_size=4, window_seconds=0.05)
+    addresses = emails(10)
+
+    await run_all(queue, [add_user(email) for email in addresses])
+
+    assert sessions.opened == 3
+    assert await stored(addresses) == set(addresses)
+
+
+async def test_failed_write_rolls_back_only_itself():
+    queue = WriteQueue(CountingSessions(), batch_size=64, window_seconds=0.05)
+    addresses = emails(5)
+
+    outcomes = await run_all(
+        queue, [add_user(email, fail=(n == 2)) for n, email in enumerate(addresses)]
+    )
+
+    assert isinstance(outcomes[2], ValueError)
+    assert await stored(addresses) == set(addresses) - {addresses[2]}
+
+
+async def test_session_info_of_a_failed_write_is_discarded():
+    seen = []
+
+    async def succeeding(db):
+        db.info.setdefault("released", []).append("kept")
+
+    async def failing(db):
+        db.info.setdefault("released", []).append("failed")
+        raise ValueError("rolled back")
+
+    async def following(db):
+        seen.append(list(db.info.get("released", [])))
+
+    queue = WriteQueue(CountingSessions(), batch_size=64, window_seconds=0.05)
+
+    await run_all(queue, [succeeding, failing, following])
+
+    assert seen == [["kept"]]
+
+
+async def test_disabled_queue_commits_on_the_request_session():
+    queue = WriteQueue(None, batch_size=64, window_seconds=0)
+    [address] = emails(1)
+
+    async with AsyncSessionLocal() as db:
+        assert await queue.run(db, add_user(address)) == address
+
+    assert await stored([address]) == {address}
@@ -0,0 +1,234 @@
+# backend/transcode.py
+"""
+Post-upload processing for voice messages.
+
+Uploads are stored exactly as the phone recorded them (m4a/wav/flac, up to
+10 MB). The upload enqueues a "process_voice" job (jobs.py), which:
+
+1. transcodes the file to a small, loudness-normalised mono rendition
+   (AAC in .m4a by default, or Opus in .ogg) which becomes the playback file
+2. moves the original into the cold storage tier (see storage.py)
+3. reduces the playback file to waveform peaks for previews (waveform.py)
+4. records duration, bitrate, size and peaks on the Message and marks it ready
+
+A failed attempt is retried with backoff; once the job is out of attempts
+the message is marked FAILED.
+
+ffmpeg/ffprobe are optional: without them the original is kept as the
+playback file and only what can be read cheaply (size, WAV duration) is
+recorded.
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+import uuid
+import wave
+from pathlib import Path
+from typing import Optional
+
+import anyio
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import jobs
+from database import AsyncSessionLocal
+from models import Message, ProcessingStatus
+from storage import (
+    COLD_TIER, HOT_TIER, content_key, delete_unreferenced, file_digest,
+    get_storage, in_tier, is_storage_key, resolve,
+)
+from uploads import PARTIAL_UPLOAD_DIR
+from waveform import compute_peaks
+from write_queue import write_queue
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+FFPROBE_BIN = os.getenv("FFPROBE_BIN", "ffprobe")
+TRANSCODE_FORMAT = os.getenv("TRANSCODE_FORMAT", "aac")  # "aac" (.m4a) or "opus" (.ogg)
+TRANSCODE_BITRATE = os.getenv("TRANSCODE_BITRATE", "32k")
+TRANSCODE_SAMPLE_RATE = os.getenv("TRANSCODE_SAMPLE_RATE", "24000")
+TRANSCODE_CONCURRENCY = int(os.getenv("TRANSCODE_CONCURRENCY", "2"))
+
+_CODECS = {
+    "aac": ("m4a", ["-c:a", "aac"]),
+    "opus": ("ogg", ["-c:a", "libopus", "-application", "voip"]),
+}
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG_BIN) is not None and shutil.which(FFPROBE_BIN) is not None
+
+
+async def _run(*args: str) -> bytes:
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"{args[0]} failed: {stderr.decode(errors='replace').strip()[-500:]}")
+    return stdout
+
+
+async def probe(path: Path) -> dict:
+    """
+    Duration (seconds) and bitrate (bits/s) of an audio file.
+    Falls back to the wave module for WAV files when ffprobe is missing.
+    """
+    if shutil.which(FFPROBE_BIN):
+        output = await _run(
+            FFPROBE_BIN, "-v", "error", "-show_entries", "format=duration,bit_rate",
+            "-of", "json", str(path),
+        )
+        info = json.loads(output or b"{}").get("format", {})
+        return {
+            "duration_seconds": float(info["duration"]) if info.get("duration") else None,
+            "bitrate": int(info["bit_rate"]) if info.get("bit_rate") else None,
+        }
+    if path.suffix.lower() == ".wav":
+        def read_wav():
+            with wave.open(str(path), "rb") as wav:
+                frames, rate = wav.getnframes(), wav.getframerate()
+                bits = rate * wav.getnchannels() * wav.getsampwidth() * 8
+                return {"duration_seconds": frames / rate if rate else None, "bitrate": bits}
+        try:
+            return await anyio.to_thread.run_sync(read_wav)
+        except (wave.Error, EOFError):
+            pass
+    return {"duration_seconds": None, "bitrate": None}
+
+
+async def transcode(source: Path) -> Path:
+    """Write the compact playback rendition of source to a scratch file and return its path."""
+    extension, codec_args = _CODECS.get(TRANSCODE_FORMAT, _CODECS["aac"])
+    await anyio.Path(PARTIAL_UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
+    target = PARTIAL_UPLOAD_DIR / f"{uuid.uuid4()}.{extension}"
+    try:
+        await _run(
+            FFMPEG_BIN, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+            "-i", str(source), "-vn",
+            "-af", "loudnorm=I=-16:TP=-1.5:LRA=11",
+            "-ac", "1", "-ar", TRANSCODE_SAMPLE_RATE,
+            *codec_args, "-b:a", TRANSCODE_BITRATE,
+            str(target),
+        )
+    except BaseException:
+        await anyio.Path(target).unlink(missing_ok=True)
+        raise
+    return target
+
+
+async def mark_voice_failed(message_id: int) -> None:
+    """The last attempt of process_voice_message failed."""
+    async def mark_failed(db: AsyncSession) -> None:
+        message = await db.get(Message, message_id)
+        if message is not None:
+            message.processing_status = ProcessingStatus.FAILED
+
+    async with AsyncSessionLocal() as db:
+        await write_queue.run(db, mark_failed)
+
+
+# ffmpeg is CPU heavy; TRANSCODE_CONCURRENCY caps how many run at once per worker
+@jobs.job("process_voice", concurrency=TRANSCODE_CONCURRENCY, on_failure=mark_voice_failed)
+async def process_voice_message(message_id: int) -> None:
+    """
+    Job run after a voice upload has been saved.
+    Raises on failure, so the job is retried; nothing is recorded until it succeeds.
+    """
+    async with AsyncSessionLocal() as db:
+        message = await db.get(Message, message_id)
+        if message is None or not message.voice_file_path:
+            return
+        source_key = message.voice_file_path
+        backend, key = resolve(source_key)
+        compact: Optional[Path] = None
+        try:
+            async with backend.local_path(key) as source:
+                if ffmpeg_available():
+                    compact = await transcode(source)
+                    playback = compact
+                else:
+                    playback = source
+                info = await probe(playback)
+                peaks, decoded_seconds = await compute_peaks(playback, FFMPEG_BIN if compact else None)
+                size_bytes = (await anyio.Path(playback).stat()).st_size
+                cold_key = compact_key = None
+                if compact is not None:
+                    # Stored before the write, which only records the keys
+                    # (see storage.delete_unreferenced); a message deleted
+                    # meanwhile leaves them to file_gc.
+                    storage = get_storage()
+                    if is_storage_key(source_key):
+                        cold_key = in_tier(source_key, COLD_TIER)
+                    else:
+                        # Older uploads have a plain path; they move into storage here
+                        cold_key = content_key(COLD_TIER, await file_digest(source), source.suffix.lstrip("."))
+                    compact_key = content_key(HOT_TIER, await file_digest(compact), compact.suffix.lstrip("."))
+                    await storage.put(compact, compact_key)
+                    compact = None
+                    # Copied: other messages may share the uploaded file
+                    await storage.put(source, cold_key, keep_source=True)
+
+                async def record(db: AsyncSession) -> Optional[Message]:
+                    # The message may have been deleted while we were busy
+                    message = await db.get(Message, message_id)
+                    if message is None:
+                        return None
+                    if compact_key is not None:
+                        message.original_file_path = cold_key
+                        message.voice_file_path = compact_key
+                    message.duration_seconds = info["duration_seconds"] or decoded_seconds
+                    message.bitrate = info["bitrate"]
+                    message.size_bytes = size_bytes
+                    message.waveform_peaks = peaks
+                    message.processing_status = ProcessingStatus.READY
+                    await db.flush()
+                    return message
+
+                message = await write_queue.run(db, record)
+        except BaseException:
+            await db.rollback()
+            raise
+        finally:
+            if compact is not None:
+                await anyio.Path(compact).unlink(missing_ok=True)
+        if message is None:
+            return
+
+    if message.voice_file_path != source_key:
+        # Only once the new keys are committed, so playback never points at a removed file
+        try:
+            if is_storage_key(source_key):
+                await delete_unreferenced([source_key])
+            else:
+                await anyio.Path(source_key).unlink(missing_ok=True)
+        except Exception:
+            logger.exception("Removing the upload of voice message %s failed", message_id)
+
+
+@jobs.job("voice_waveform", concurrency=TRANSCODE_CONCURRENCY)
+async def compute_voice_waveform(message_id: int) -> None:
+    """Waveform peaks for a voice message processed before they were computed."""
+    async with AsyncSessionLocal() as db:
+        message = await db.get(Message, message_id)
+        if message is None or not message.voice_file_path:
+            return
+        voice_key = message.voice_file_path
+        backend, key = resolve(voice_key)
+        async with backend.local_path(key) as playback:
+            peaks, decoded_seconds = await compute_peaks(playback, FFMPEG_BIN if ffmpeg_available() else None)
+        await db.rollback()
+
+        async def record(db: AsyncSession) -> None:
+            message = await db.get(Message, message_id)
+            # Deleted, or re-processed with another file meanwhile
+            if message is None or message.voice_file_path != voice_key:
+                return
+            message.waveform_peaks = peaks
+            if message.duration_seconds is None:
+                message.duration_seconds = decoded_seconds
+            await db.flush()
+
+        await write_queue.run(db, record)
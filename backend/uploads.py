@@ -0,0 +1,174 @@
+# backend/uploads.py
+import base64
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Optional
+
+import anyio
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+
+UPLOAD_DIR = Path("uploads/voice")
+PARTIAL_UPLOAD_DIR = UPLOAD_DIR / "partial"  # resumable uploads in progress
+
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+CHUNK_SIZE = 256 * 1024
+# Room for multipart boundaries and the title/focus_area form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+AUDIO_EXTENSIONS = {"mp3", "wav", "m4a", "aac", "ogg", "flac"}
+TUS_VERSION = "1.0.0"
+
+
+def file_too_large_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail="File too large. Maximum size is 10MB"
+    )
+
+
+def upload_length_exceeded_exception(upload_length: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Upload exceeded its declared Upload-Length of {upload_length} bytes",
+        headers={"Tus-Resumable": TUS_VERSION},
+    )
+
+
+def audio_extension(filename: Optional[str]) -> Optional[str]:
+    """Lowercase extension of an audio filename, or None if it is not one we accept."""
+    if filename and "." in filename:
+        extension = filename.rsplit(".", 1)[-1].lower()
+        if extension in AUDIO_EXTENSIONS:
+            return extension
+    return None
+
+
+async def write_stream(
+    chunks: AsyncIterator[bytes],
+    dest: Path,
+    max_size: int,
+    append: bool = False,
+    already_written: int = 0,
+    digest=None,
+    too_large: Callable[[], HTTPException] = file_too_large_exception,
+) -> int:
+    """
+    Write chunks to dest without holding the whole file in memory.
+
+    File writes go through anyio's thread-backed file object so the event
+    loop is never blocked on disk I/O. Stops at the first chunk that would
+    push the file past max_size. On any error a new file is removed, while
+    an appended one keeps the chunks already written so the client can
+    resume from there.
+
+    A hashlib object passed as digest is fed every chunk written, so the
+    content hash is ready without reading the file back.
+
+    too_large builds the error raised when max_size would be exceeded.
+
+    Returns:
+        Number of bytes written by this call
+
+    Raises:
+        HTTPException(413): if the limit was exceeded (too_large())
+    """
+    written = 0
+    async with await anyio.open_file(dest, "ab" if append else "wb") as out:
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                if already_written + written + len(chunk) > max_size:
+                    raise too_large()
+                await out.write(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+                written += len(chunk)
+        except BaseException:
+            if not append:
+                await out.aclose()
+                await anyio.Path(dest).unlink(missing_ok=True)
+            raise
+    return written
+
+
+async def iter_upload_file(file, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Read a Starlette UploadFile chunk by chunk."""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def parse_upload_metadata(header: Optional[str]) -> Dict[str, str]:
+    """
+    Parse a tus Upload-Metadata header: comma-separated "key base64value" pairs.
+    """
+    metadata = {}
+    if not header:
+        return metadata
+    for pair in header.split(","):
+        parts = pair.strip().split(" ", 1)
+        if not parts[0]:
+            continue
+        value = ""
+        if len(parts) == 2:
+            try:
+                value = base64.b64decode(parts[1]).decode()
+            except (ValueError, UnicodeDecodeError):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid Upload-Metadata value for '{parts[0]}'"
+                )
+        metadata[parts[0]] = value
+    return metadata
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject oversized request bodies for the given paths before they are parsed.
+
+    Requests announcing a larger Content-Length are answered with 413 right
+    away; bodies without one (chunked) are counted while the multipart parser
+    reads them and aborted with 413 as soon as they cross the limit.
+    """
+
+    def __init__(self, app, paths: Dict[str, int]):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        limit = self.paths.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                await self._reject(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside the route's body parsing, so the app's
+                    # HTTPException handler renders it
+                    raise file_too_large_exception()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, scope, receive, send):
+        detail = file_too_large_exception().detail
+        response = JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"detail": detail, "message": detail},
+            headers={"Connection": "close"},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,133 @@
+# backend/waveform.py
+"""
+Waveform previews for voice messages.
+
+The list screen draws a small waveform for each recording. Downloading the
+audio for that is wasteful, so while a voice message is processed
+(transcode.py) its playback file is decoded once and reduced to
+WAVEFORM_BUCKETS peak amplitudes, stored on the message as one int8 per
+bucket (0..127, 127 is full scale): 256 bytes per message by default.
+GET /api/messages/{id}/waveform serves them.
+
+Decoding uses ffmpeg (mono, 8 kHz PCM, streamed, so memory stays flat for
+long recordings). Without ffmpeg only PCM WAV files get a waveform.
+"""
+import asyncio
+import sys
+import wave
+from array import array
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import anyio
+
+WAVEFORM_BUCKETS = 256
+DECODE_SAMPLE_RATE = 8000
+_READ_SIZE = 64 * 1024
+
+# WAV sample width -> (array typecode, full scale); 8-bit WAV is unsigned
+_WAV_FORMATS = {1: ("b", 128), 2: ("h", 32768), 4: ("i", 2 ** 31)}
+_UNSIGNED_TO_SIGNED = bytes(byte ^ 0x80 for byte in range(256))
+
+
+class _BlockPeaks:
+    """Peak absolute sample per block of block_size samples, fed in chunks."""
+
+    def __init__(self, typecode: str, block_size: int):
+        self.typecode = typecode
+        self.block_size = max(1, block_size)
+        self.peaks: List[int] = []
+        self.samples = 0
+        self._pending = array(typecode)
+        self._leftover = b""
+
+    def feed(self, data: bytes) -> None:
+        data = self._leftover + data
+        usable = len(data) - len(data) % self._pending.itemsize
+        self._leftover = data[usable:]
+        samples = array(self.typecode, data[:usable])
+        if sys.byteorder == "big":
+            samples.byteswap()  # PCM here is little-endian
+        self._pending.extend(samples)
+        self.samples += len(samples)
+        whole = len(self._pending) - len(self._pending) % self.block_size
+        for start in range(0, whole, self.block_size):
+            self._add(self._pending[start:start + self.block_size])
+        del self._pending[:whole]
+
+    def finish(self) -> List[int]:
+        if self._pending:
+            self._add(self._pending)
+            del self._pending[:]
+        return self.peaks
+
+    def _add(self, block: array) -> None:
+        self.peaks.append(max(max(block), -min(block)))
+
+
+def buckets(block_peaks: List[int], full_scale: int, count: int = WAVEFORM_BUCKETS) -> Optional[bytes]:
+    """Reduce block peaks to count int8 peaks (max per bucket); None without any audio."""
+    if not block_peaks:
+        return None
+    total = len(block_peaks)
+    values = []
+    for bucket in range(count):
+        start = bucket * total // count
+        end = max(start + 1, (bucket + 1) * total // count)
+        values.append(min(127, round(max(block_peaks[start:end]) * 127 / full_scale)))
+    return bytes(values)  # 0..127 reads the same as int8
+
+
+def peaks_list(blob: bytes) -> List[int]:
+    return array("b", blob).tolist()
+
+
+async def _ffmpeg_peaks(ffmpeg_bin: str, path: Path) -> Tuple[Optional[bytes], Optional[float]]:
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg_bin, "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", str(path), "-vn", "-ac", "1", "-ar", str(DECODE_SAMPLE_RATE), "-f", "s16le", "-",
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    # 10 ms blocks: 6,000 numbers for a 60 second recording
+    blocks = _BlockPeaks("h", DECODE_SAMPLE_RATE // 100)
+    try:
+        while chunk := await process.stdout.read(_READ_SIZE):
+            blocks.feed(chunk)
+        stderr = await process.stderr.read()
+        await process.wait()
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+        raise
+    if process.returncode != 0:
+        raise RuntimeError(f"{ffmpeg_bin} failed: {stderr.decode(errors='replace').strip()[-500:]}")
+    return buckets(blocks.finish(), 32768), blocks.samples / DECODE_SAMPLE_RATE
+
+
+def _wav_peaks(path: Path) -> Tuple[Optional[bytes], Optional[float]]:
+    try:
+        with wave.open(str(path), "rb") as wav:
+            rate, channels, width = wav.getframerate(), wav.getnchannels(), wav.getsampwidth()
+            if width not in _WAV_FORMATS or not rate:
+                return None, None
+            typecode, full_scale = _WAV_FORMATS[width]
+            blocks = _BlockPeaks(typecode, rate * channels // 100)
+            while frames := wav.readframes(_READ_SIZE // (width * channels)):
+                if width == 1:
+                    frames = frames.translate(_UNSIGNED_TO_SIGNED)
+                blocks.feed(frames)
+    except (wave.Error, EOFError):
+        return None, None
+    return buckets(blocks.finish(), full_scale), blocks.samples / channels / rate
+
+
+async def compute_peaks(path: Path, ffmpeg_bin: Optional[str] = None) -> Tuple[Optional[bytes], Optional[float]]:
+    """
+    (peaks, duration in seconds) of an audio file, decoded with ffmpeg_bin
+    when given. (None, None) when it cannot be decoded without ffmpeg.
+    """
+    if ffmpeg_bin:
+        return await _ffmpeg_peaks(ffmpeg_bin, path)
+    if path.suffix.lower() == ".wav":
+        return await anyio.to_thread.run_sync(_wav_peaks, path)
+    return None, None
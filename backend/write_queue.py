@@ -0,0 +1,146 @@
+# backend/write_queue.py
+"""
+Serialized, group-committed writes for SQLite (SQLITE_PROFILE=production).
+
+SQLite allows one writer at a time. With a pool of connections each request
+starts its own write transaction, they queue up on the file lock, and under
+load some give up with "database is locked"; each commit also pays for its
+own fsync. Here the message routes hand their writes to a single writer task
+instead. It takes whatever writes are waiting (up to SQLITE_WRITE_BATCH_SIZE),
+runs each in its own SAVEPOINT on one connection, and commits them together:
+one lock acquisition and one WAL sync for the whole group.
+
+A write is an async function of a session that does its reads and changes,
+flushes, and returns what the route needs (loaded, since the session is
+closed afterwards). An exception in one write rolls back only its savepoint
+and is raised to its caller; the rest of the group still commits.
+
+Other databases, and SQLite outside the production profile, run the write
+on the request's own session and commit it straight away.
+
+    message = await write_queue.run(db, create)
+"""
+import asyncio
+import contextvars
+import copy
+import logging
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import WriterSessionLocal
+
+logger = logging.getLogger(__name__)
+
+SQLITE_WRITE_BATCH_SIZE = int(os.getenv("SQLITE_WRITE_BATCH_SIZE", "64"))
+# How long the writer waits for more writes to join a group; 0 only takes what is already queued
+SQLITE_WRITE_BATCH_WINDOW_MS = float(os.getenv("SQLITE_WRITE_BATCH_WINDOW_MS", "1"))
+
+T = TypeVar("T")
+Write = Callable[[AsyncSession], Awaitable[T]]
+
+
+@dataclass
+class _Job:
+    work: Write
+    future: asyncio.Future
+
+
+class WriteQueue:
+    def __init__(self, session_factory, batch_size: int, window_seconds: float):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.window_seconds = window_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.session_factory is not None
+
+    async def run(self, db: AsyncSession, work: Write) -> T:
+        """
+        Apply work and commit it; returns what work returned.
+
+        db is the request's session, used directly when the queue is off.
+        """
+        if not self.enabled:
+            result = await work(db)
+            await db.commit()
+            return result
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Job(work, future))
+        return await future
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        # First write on this event loop (tests and scripts may use several)
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        # A fresh context: the writer must not count its queries towards
+        # whichever request happened to start it (metrics.py)
+        self._task = loop.create_task(self._writer(), context=contextvars.Context())
+
+    async def close(self) -> None:
+        """Finish queued writes and stop the writer (app shutdown)."""
+        if self._task is None or self._task.done():
+            return
+        while not self._queue.empty():
+            await asyncio.sleep(0.01)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _writer(self) -> None:
+        while True:
+            jobs = [await self._queue.get()]
+            if self.window_seconds and len(jobs) < self.batch_size and self._queue.empty():
+                await asyncio.sleep(self.window_seconds)
+            while len(jobs) < self.batch_size and not self._queue.empty():
+                jobs.append(self._queue.get_nowait())
+            try:
+                await self._commit_group(jobs)
+            except Exception as e:
+                logger.exception("Write group of %d failed", len(jobs))
+                for job in jobs:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+
+    async def _commit_group(self, jobs: List[_Job]) -> None:
+        done = []
+        async with self.session_factory() as db:
+            for job in jobs:
+                if job.future.done():  # caller went away
+                    continue
+                # Per-write bookkeeping that hooks keep in session.info
+                # (released files, auth cache evictions) must not outlive a
+                # write that is rolled back
+                info = {key: copy.copy(value) for key, value in db.info.items()}
+                try:
+                    async with db.begin_nested():
+                        result = await job.work(db)
+                except BaseException as e:
+                    db.info.clear()
+                    db.info.update(info)
+                    if isinstance(e, asyncio.CancelledError):
+                        raise
+                    job.future.set_exception(e)
+                else:
+                    done.append((job, result))
+            if done:
+                await db.commit()
+        for job, result in done:
+            if not job.future.done():
+                job.future.set_result(result)
+
+
+write_queue = WriteQueue(WriterSessionLocal, SQLITE_WRITE_BATCH_SIZE, SQLITE_WRITE_BATCH_WINDOW_MS / 1000)
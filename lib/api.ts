@@ -76,6 +76,23 @@ export interface MessageResponse extends MessagePayload {
   created_at: string;
   updated_at?: string | null;
   voice_file_path?: string | null;
+  processing_status?: "processing" | "ready" | "failed" | null;
+  duration_seconds?: number | null;
+  bitrate?: number | null;
+  size_bytes?: number | null;
+}
+
+export interface MessageWaveformResponse {
+  message_id: number;
+  duration_seconds?: number | null;
+  peaks: number[]; // 0..127 per bucket, evenly spaced over the recording
+}
+
+export interface MessageChangesResponse {
+  messages: MessageResponse[];
+  deleted: number[];
+  next_token: string;
+  has_more: boolean;
 }
 
 export interface VoiceMessagePayload {
@@ -100,6 +117,11 @@ export interface MessageStatsResponse {
   total_messages: number;
   text_messages: number;
   voice_messages: number;
+  focus_areas?: Record<string, number>;
+  current_streak?: number;
+  today?: number;
+  this_week?: number;
+  this_month?: number;
 }
 
 // ###############################################################################
@@ -256,6 +278,15 @@ export async function getMessages(): Promise<ApiResponse<MessageResponse[]>> {
   return apiRequest<MessageResponse[]>("/api/messages");
 }
 
+// Messages created/updated/deleted since a change token (omit it for a full sync).
+// A 410 means the token is stale: drop local state and sync again without it.
+export async function getMessageChanges(
+  since?: string | null,
+): Promise<ApiResponse<MessageChangesResponse>> {
+  const query = since ? `?since=${encodeURIComponent(since)}` : "";
+  return apiRequest<MessageChangesResponse>(`/api/messages/changes${query}`);
+}
+
 // Create message
 export async function createMessage(
   payload: MessagePayload,
@@ -360,8 +391,82 @@ export async function uploadVoiceMessage(
   }
 }
 
+// Waveform preview of a voice message, without downloading the audio.
+// Fails (404) until processing_status is "ready".
+export async function getMessageWaveform(
+  id: number,
+): Promise<ApiResponse<MessageWaveformResponse>> {
+  return apiRequest<MessageWaveformResponse>(`/api/messages/${id}/waveform`);
+}
+
 export async function getMessageStats(): Promise<
   ApiResponse<MessageStatsResponse>
 > {
   return apiRequest<MessageStatsResponse>("/api/messages/stats");
 }
+
+// ################################## LIVE UPDATES #####################################
+
+// Pushed by the server as messages change, from this device or any other
+export type MessageEvent =
+  | { type: "hello"; version: string; stats: MessageStatsResponse | null }
+  | {
+      type: "message.created" | "message.updated";
+      version: string;
+      message: MessageResponse;
+    }
+  | { type: "message.deleted"; version: string; id: number }
+  | { type: "stats"; changes: Partial<MessageStatsResponse> }
+  | { type: "resync" } // fell behind: reload everything
+  | { type: "ping" };
+
+// Live message changes over a WebSocket, reconnecting with backoff until the
+// returned function is called. onOpen/onClose tell whether updates are live.
+export function subscribeToMessageEvents(handlers: {
+  onEvent: (event: MessageEvent) => void;
+  onOpen?: () => void;
+  onClose?: () => void;
+}): () => void {
+  let socket: WebSocket | null = null;
+  let stopped = false;
+  let retryDelay = 1000;
+  let retryTimer: ReturnType<typeof setTimeout> | null = null;
+
+  const connect = async () => {
+    const token = await tokenStorage.getToken();
+    if (stopped || !token) return;
+
+    const url = `${API_BASE_URL.replace(/^http/, "ws")}/api/messages/ws`;
+    // React Native's WebSocket takes headers as a third argument
+    const ws: WebSocket = new (WebSocket as any)(url, undefined, {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    socket = ws;
+    ws.onopen = () => {
+      retryDelay = 1000;
+      handlers.onOpen?.();
+    };
+    ws.onmessage = (message) => {
+      try {
+        handlers.onEvent(JSON.parse(message.data));
+      } catch (error) {
+        console.error("Bad live update", error);
+      }
+    };
+    ws.onclose = () => {
+      socket = null;
+      handlers.onClose?.();
+      if (!stopped) {
+        retryTimer = setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 30000);
+      }
+    };
+  };
+
+  connect();
+  return () => {
+    stopped = true;
+    if (retryTimer) clearTimeout(retryTimer);
+    socket?.close();
+  };
+}
@@ -1,6 +1,7 @@
 // lib/hooks/useMessages.ts
 
 import type {
+  MessageEvent,
   MessagePayload,
   MessageResponse,
   MessageStatsResponse,
@@ -11,10 +12,19 @@ import {
   deleteMessage,
   getMessages,
   getMessageStats,
+  subscribeToMessageEvents,
   updateMessage,
   uploadVoiceMessage,
 } from "@/lib/api";
-import { useCallback, useEffect, useState } from "react";
+import { useCallback, useEffect, useRef, useState } from "react";
+
+// Newest first; replaces the message if it is already in the list
+function upsertMessage(messages: MessageResponse[], message: MessageResponse) {
+  if (messages.some((existing) => existing.id === message.id)) {
+    return messages.map((existing) => (existing.id === message.id ? message : existing));
+  }
+  return [message, ...messages];
+}
 
 export function useMessages() {
   const [messages, setMessages] = useState<MessageResponse[]>([]);
@@ -62,6 +72,46 @@ export function useMessages() {
     loadStats();
   }, [loadMessages, loadStats]);
 
+  // While the live connection is up the server pushes changes (from this
+  // device and others), so nothing needs re-fetching after a save
+  const isLive = useRef(false);
+  useEffect(() => {
+    let connectedBefore = false;
+    const handleEvent = (event: MessageEvent) => {
+      switch (event.type) {
+        case "hello":
+          if (event.stats) setStats(event.stats);
+          // Reconnected: catch up on what changed while offline
+          if (connectedBefore) loadMessages();
+          connectedBefore = true;
+          break;
+        case "message.created":
+        case "message.updated":
+          setMessages((prev) => upsertMessage(prev, event.message));
+          break;
+        case "message.deleted":
+          setMessages((prev) => prev.filter((message) => message.id !== event.id));
+          break;
+        case "stats":
+          setStats((prev) => (prev ? { ...prev, ...event.changes } : prev));
+          break;
+        case "resync":
+          loadMessages();
+          loadStats();
+          break;
+      }
+    };
+    return subscribeToMessageEvents({
+      onEvent: handleEvent,
+      onOpen: () => {
+        isLive.current = true;
+      },
+      onClose: () => {
+        isLive.current = false;
+      },
+    });
+  }, [loadMessages, loadStats]);
+
   const createMessageHandler = async (payload: MessagePayload) => {
     const response = await createMessage(payload);
     if (!response.success || !response.data) {
@@ -73,10 +123,9 @@ export function useMessages() {
       return { success: false, error: errorMsg };
     }
     const newMessage: MessageResponse = response.data;
-    setMessages((prev) => [newMessage, ...prev]);
-
+    setMessages((prev) => upsertMessage(prev, newMessage));
 
-    await loadStats();
+    if (!isLive.current) await loadStats();
 
     return { success: true };
   };
@@ -89,9 +138,9 @@ export function useMessages() {
     }
     
     const newVoiceMessage: MessageResponse = response.data;
-    setMessages((prev) => [newVoiceMessage, ...prev])
+    setMessages((prev) => upsertMessage(prev, newVoiceMessage))
 
-    await loadStats();
+    if (!isLive.current) await loadStats();
 
     return {success: true}
   }
@@ -106,7 +155,7 @@ export function useMessages() {
         prev.map((message) => (message.id === id ? response.data! : message)),
       );
 
-      await loadStats();
+      if (!isLive.current) await loadStats();
       return { success: true };
     }
     // Ensure error is always a string
@@ -122,7 +171,7 @@ export function useMessages() {
     if (response.success) {
       setMessages((prev) => prev.filter((message) => message.id !== id));
 
-      await loadStats();
+      if (!isLive.current) await loadStats();
       return { success: true };
     }
     // Ensure error is always a string